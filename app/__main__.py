@@ -5,31 +5,34 @@ import logging
 import sys
 
 from app.orchestrator.pipeline import process_files_in_bulk
+from app.file.tables import is_supported_file
 
 log_level = os.getenv("LOG_LEVEL", "INFO")
 logging.basicConfig(format='%(asctime)s - %(levelname)s - %(module)s - %(lineno)d - %(message)s', level=log_level, handlers=[logging.StreamHandler(), logging.FileHandler(f"{__name__}.log")])
 
-def main(directory_path: str):
+def main(directory_path: str, workers: int = None):
     """
     Process all files in a directory
 
     Args:
         directory_path (str): The path to the directory
+        workers (int): The number of processes the files are spread across. If None, WORKERS is used
     """
-    # find excel and csv files in the samples directory
-    file_paths = [os.path.join(directory_path, file) for file in os.listdir(directory_path) if file.endswith(".csv") or file.endswith(".xlsx")]
+    # find excel, csv and trace store files in the directory, possibly compressed or in zip archives
+    file_paths = [os.path.join(directory_path, file) for file in os.listdir(directory_path) if is_supported_file(file)]
     logging.info(f"Found {len(file_paths)} files in the samples directory")
     for file_path in file_paths:
         logging.info(f"Processing file {file_path}")
     # load logging level from environment variable
     
-    # process files in bulk
-    result, all_populations_summary = process_files_in_bulk(file_paths, save_to_file=True)
+    # process files in bulk, writing the results of each file as it is processed
+    result, all_populations_summary = process_files_in_bulk(file_paths, save_to_file=True, workers=workers, keep_results=False)
     return result, all_populations_summary
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        logging.error("Please provide the directory path as argument")
+    if len(sys.argv) not in [2, 3]:
+        logging.error("Please provide the directory path as argument, and optionally the number of workers")
         sys.exit(1)
     directory_path = sys.argv[1]
-    main(directory_path)
\ No newline at end of file
+    workers = int(sys.argv[2]) if len(sys.argv) == 3 else None
+    main(directory_path, workers)
\ No newline at end of file
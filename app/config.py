@@ -19,7 +19,18 @@ logging.basicConfig(**LOGGING_CONFIG)
 
 PEAK_THRESHOLD = os.getenv("PEAK_THRESHOLD", 0.4)
 PEAK_WINDOW = os.getenv("PEAK_WINDOW", 5)
+PEAK_DETECTOR = os.getenv("PEAK_DETECTOR", "argrelmax")
+CHUNK_SIZE = os.getenv("CHUNK_SIZE", None)
+WORKERS = os.getenv("WORKERS", 1)
+SHARDS = os.getenv("SHARDS", 1)
+SHARD_BACKEND = os.getenv("SHARD_BACKEND", "threads")
+CACHE_DIRECTORY = os.getenv("CACHE_DIRECTORY", None)
+CACHE_SIZE_LIMIT = os.getenv("CACHE_SIZE_LIMIT", 1024)
 TIME_UNIT = os.getenv("TIME_UNIT", "s")
+TIME_AXIS = os.getenv("TIME_AXIS", "datetime")
+OUTPUT_DTYPES = os.getenv("OUTPUT_DTYPES", "default")
+PRECISION = os.getenv("PRECISION", "float64")
+PREFETCH_DEPTH = os.getenv("PREFETCH_DEPTH", 0)
 IGNORE_PEAKS_BEFORE_CRITERIA = os.getenv("IGNORE_PEAKS_BEFORE_CRITERIA", "samples")
 IGNORE_PEAKS_BEFORE = os.getenv("IGNORE_PEAKS_BEFORE", 1)
 OUTPUT_DIRECTORY = os.getenv("OUTPUT_DIRECTORY", "output") 
@@ -35,7 +46,12 @@ class AppConfig:
     _supported_time_units = ["s", "ms", "us", "ns"]
     _supported_ignore_peaks_before_criteria = ["samples", "time"]
     _supported_log_levels = ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
-    _supported_filters = ["above", "below"]
+    _supported_filters = ["above", "below", "nan_ratio", "range"]
+    _supported_peak_detectors = ["argrelmax", "running_max"]
+    _supported_shard_backends = ["threads", "processes"]
+    _supported_time_axes = ["datetime", "numeric"]
+    _supported_output_dtypes = ["default", "compact"]
+    _supported_precisions = ["float64", "float32"]
 
     def __init__(self, custom_filters = None, time_unit = None, 
                     ignore_peaks_criteria = None,
@@ -43,7 +59,18 @@ class AppConfig:
                     output_directory = None,
                     peak_threshold = None,
                     peak_window = None,
-                    log_level = None
+                    log_level = None,
+                    peak_detector = None,
+                    chunk_size = None,
+                    workers = None,
+                    shards = None,
+                    shard_backend = None,
+                    cache_directory = None,
+                    cache_size_limit = None,
+                    time_axis = None,
+                    output_dtypes = None,
+                    precision = None,
+                    prefetch_depth = None
                  ) -> None:
         
         if custom_filters is not None:
@@ -54,7 +81,7 @@ class AppConfig:
         if not self.check_if_filters_are_valid(filters=filters):
             # no filters are set
             self._filters = []
-            logging.warning("No filters are set. Please set filters in the format 'value,type' where type is either 'above' or 'below'")
+            logging.warning(f"No filters are set. Please set filters in the format 'value,type' where type is one of {self._supported_filters}")
             logging.warning("Assuming no filters are set")
         else:
             self._filters = filters
@@ -89,10 +116,69 @@ class AppConfig:
         else:
             self._log_level = LOGGING_CONFIG["level"]
         
+        if peak_detector is None:
+            peak_detector = PEAK_DETECTOR
+
+        if not self.check_if_peak_detector_is_valid(peak_detector):
+            logging.warning(f"Peak detector {peak_detector} is not supported. Supported peak detectors are {self._supported_peak_detectors}")
+            logging.warning("Assuming peak detector is set to 'argrelmax'")
+            self._peak_detector = "argrelmax"
+        else:
+            self._peak_detector = peak_detector
+
+        if shard_backend is None:
+            shard_backend = SHARD_BACKEND
+
+        if shard_backend not in self._supported_shard_backends:
+            logging.warning(f"Shard backend {shard_backend} is not supported. Supported shard backends are {self._supported_shard_backends}")
+            logging.warning("Assuming shard backend is set to 'threads'")
+            self._shard_backend = "threads"
+        else:
+            self._shard_backend = shard_backend
+
+        if time_axis is None:
+            time_axis = TIME_AXIS
+
+        if time_axis not in self._supported_time_axes:
+            logging.warning(f"Time axis {time_axis} is not supported. Supported time axes are {self._supported_time_axes}")
+            logging.warning("Assuming time axis is set to 'datetime'")
+            self._time_axis = "datetime"
+        else:
+            self._time_axis = time_axis
+
+        if output_dtypes is None:
+            output_dtypes = OUTPUT_DTYPES
+
+        if output_dtypes not in self._supported_output_dtypes:
+            logging.warning(f"Output dtypes {output_dtypes} are not supported. Supported output dtypes are {self._supported_output_dtypes}")
+            logging.warning("Assuming output dtypes are set to 'default'")
+            self._output_dtypes = "default"
+        else:
+            self._output_dtypes = output_dtypes
+
+        if precision is None:
+            precision = PRECISION
+
+        if precision not in self._supported_precisions:
+            logging.warning(f"Precision {precision} is not supported. Supported precisions are {self._supported_precisions}")
+            logging.warning("Assuming precision is set to 'float64'")
+            self._precision = "float64"
+        else:
+            self._precision = precision
+
         self._peak_threshold = peak_threshold if peak_threshold is not None else PEAK_THRESHOLD
         self._peak_window = peak_window if peak_window is not None else PEAK_WINDOW
         self._ignore_peaks_before = ignore_peaks_before if ignore_peaks_before is not None else IGNORE_PEAKS_BEFORE
         self._output_directory = output_directory if output_directory is not None else OUTPUT_DIRECTORY
+        self._chunk_size = chunk_size if chunk_size is not None else CHUNK_SIZE
+        self._workers = workers if workers is not None else WORKERS
+        self._shards = shards if shards is not None else SHARDS
+        self._cache_directory = cache_directory if cache_directory is not None else CACHE_DIRECTORY
+        self._cache_size_limit = cache_size_limit if cache_size_limit is not None else CACHE_SIZE_LIMIT
+        self._prefetch_depth = prefetch_depth if prefetch_depth is not None else PREFETCH_DEPTH
+
+        if self.chunk_size and self.cache_directory:
+            logging.warning("Chunk size is set with a cache directory: csv files read in chunks are not stored in the cache, only the files already in it are read from it")
 
     def check_if_filters_are_valid(self, filters: list) -> bool:
         # check if first tuple element is a number (int, float)
@@ -108,9 +194,12 @@ class AppConfig:
     
     def check_if_log_level_is_valid(self, log_level: str) -> bool:
         return log_level in self._supported_log_levels
+
+    def check_if_peak_detector_is_valid(self, peak_detector: str) -> bool:
+        return peak_detector in self._supported_peak_detectors
     
     def __repr__(self) -> str:
-        return f"AppConfig(peak_threshold={self.threshold}, peak_window={self.n_neighbors}, time_unit={self.time_unit}, ignore_peaks_before_criteria={self.ignore_peaks_before_criteria}, ignore_peaks_before={self.ignore_peaks_before}, output_directory={self.output_directory}, filters={self.filters})"
+        return f"AppConfig(peak_threshold={self.threshold}, peak_window={self.n_neighbors}, peak_detector={self.peak_detector}, time_unit={self.time_unit}, ignore_peaks_before_criteria={self.ignore_peaks_before_criteria}, ignore_peaks_before={self.ignore_peaks_before}, output_directory={self.output_directory}, filters={self.filters}, chunk_size={self.chunk_size}, workers={self.workers}, shards={self.shards}, shard_backend={self.shard_backend}, cache_directory={self.cache_directory}, cache_size_limit={self.cache_size_limit}, time_axis={self.time_axis}, output_dtypes={self.output_dtypes}, precision={self.precision}, prefetch_depth={self.prefetch_depth})"
     
     @property
     def log_level(self) -> str:
@@ -124,10 +213,26 @@ class AppConfig:
     def n_neighbors(self) -> int:
         return int(self._peak_window)
     
+    @property
+    def peak_detector(self) -> str:
+        return self._peak_detector
+
     @property
     def time_unit(self) -> str:
         return self._time_unit
     
+    @property
+    def time_axis(self) -> str:
+        return self._time_axis
+
+    @property
+    def output_dtypes(self) -> str:
+        return self._output_dtypes
+
+    @property
+    def precision(self) -> str:
+        return self._precision
+
     @property
     def ignore_peaks_before_criteria(self) -> str:
         return self._ignore_peaks_before_criteria
@@ -143,6 +248,38 @@ class AppConfig:
     @property
     def filters(self) -> list:
         return self._filters
+
+    @property
+    def chunk_size(self) -> int:
+        # None means files are read at once
+        return int(self._chunk_size) if self._chunk_size else None
+
+    @property
+    def workers(self) -> int:
+        return int(self._workers)
+
+    @property
+    def shards(self) -> int:
+        return int(self._shards)
+
+    @property
+    def shard_backend(self) -> str:
+        return self._shard_backend
+
+    @property
+    def cache_directory(self) -> str:
+        # None means files are not cached
+        return self._cache_directory or None
+
+    @property
+    def cache_size_limit(self) -> float:
+        # in megabytes
+        return float(self._cache_size_limit)
+
+    @property
+    def prefetch_depth(self) -> int:
+        # 0 means files are read when they are processed
+        return max(0, int(self._prefetch_depth))
     
     def to_dict(self) -> dict:
         return self.__dict__
@@ -154,11 +291,22 @@ class AppConfig:
 logging.info("Initializing AppConfig")
 logging.info(f"Peak threshold: {PEAK_THRESHOLD}")
 logging.info(f"Peak window: {PEAK_WINDOW}")
+logging.info(f"Peak detector: {PEAK_DETECTOR}")
 logging.info(f"Time unit: {TIME_UNIT}")
+logging.info(f"Time axis: {TIME_AXIS}")
 logging.info(f"Ignore peaks before criteria: {IGNORE_PEAKS_BEFORE_CRITERIA}")
 logging.info(f"Ignore peaks before: {IGNORE_PEAKS_BEFORE}")
 logging.info(f"Output directory: {OUTPUT_DIRECTORY}")
 logging.info(f"Filters: {FILTERS}")
+logging.info(f"Chunk size: {CHUNK_SIZE}")
+logging.info(f"Workers: {WORKERS}")
+logging.info(f"Shards: {SHARDS}")
+logging.info(f"Shard backend: {SHARD_BACKEND}")
+logging.info(f"Cache directory: {CACHE_DIRECTORY}")
+logging.info(f"Cache size limit: {CACHE_SIZE_LIMIT}")
+logging.info(f"Output dtypes: {OUTPUT_DTYPES}")
+logging.info(f"Precision: {PRECISION}")
+logging.info(f"Prefetch depth: {PREFETCH_DEPTH}")
 
 if __name__=="__main__":
     config = AppConfig()
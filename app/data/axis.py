@@ -0,0 +1,127 @@
+import os
+import logging
+import numpy as np
+import pandas as pd
+
+log_level = os.getenv("LOG_LEVEL", "INFO")
+logging.basicConfig(format='%(asctime)s - %(levelname)s - %(module)s - %(lineno)d - %(message)s', level=log_level, handlers=[logging.StreamHandler(), logging.FileHandler(f"{__name__}.log")])
+
+DATETIME_TIME_AXIS = "datetime"
+NUMERIC_TIME_AXIS = "numeric"
+TIME_UNIT_IN_SECONDS = {"s": 1.0, "ms": 1e-3, "us": 1e-6, "ns": 1e-9}
+
+class TimeAxis:
+    """
+    Time of each sample of a recording, kept as numbers in the unit of the time column instead of timestamps,
+    so there is no conversion to and from dates and no wrapping after 24 hours. When the sampling is uniform,
+    only the first time and the time between samples are stored, and the time of any sample, the position
+    of a time and the time of the peaks are computed from the positions of the samples.
+    """
+    def __init__(self, values: np.ndarray = None, t0: float = 0.0, dt: float = None, length: int = 0, unit: str = "s", name: str = None):
+        """
+        Args:
+            values (np.ndarray): The time of each sample. If None, the sampling is uniform
+            t0 (float): The time of the first sample, if the sampling is uniform
+            dt (float): The time between two samples, if the sampling is uniform
+            length (int): The number of samples, if the sampling is uniform
+            unit (str): The unit of the time, one of "s", "ms", "us" or "ns"
+            name (str): The name of the time column
+        """
+        if unit not in TIME_UNIT_IN_SECONDS:
+            error = ValueError(f"Time unit must be one of {list(TIME_UNIT_IN_SECONDS)}")
+            logging.error(error)
+            raise error
+        self._values = values
+        self.t0 = t0
+        self.dt = dt
+        self.length = len(values) if values is not None else int(length)
+        self.unit = unit
+        self.name = name
+
+    @classmethod
+    def from_values(cls, values, unit: str = "s", name: str = None, rtol: float = 1e-9) -> "TimeAxis":
+        """
+        Build the axis of the time of each sample, stored as (t0, dt) if the time increases by the same step
+
+        Args:
+            values (array-like): The time of each sample
+            unit (str): The unit of the time
+            name (str): The name of the time column
+            rtol (float): The tolerance, relative to the step, for the time between two samples to be the same
+
+        Returns:
+            TimeAxis: The axis
+        """
+        values = np.asarray(values)
+        if not (np.issubdtype(values.dtype, np.integer) or np.issubdtype(values.dtype, np.floating)):
+            error = ValueError("Time column must be numeric")
+            logging.error(error)
+            raise error
+        if len(values) > 1:
+            dt = (values[-1] - values[0]) / (len(values) - 1)
+            if dt > 0 and np.all(np.abs(np.diff(values) - dt) <= rtol * dt):
+                return cls(t0=values[0].item(), dt=float(dt), length=len(values), unit=unit, name=name)
+        return cls(values, unit=unit, name=name)
+
+    @property
+    def is_uniform(self) -> bool:
+        return self._values is None
+
+    @property
+    def values(self) -> np.ndarray:
+        """
+        The time of each sample, in the unit of the axis
+        """
+        if self.is_uniform:
+            return self.t0 + np.arange(self.length) * self.dt
+        return self._values
+
+    @property
+    def is_monotonic_increasing(self) -> bool:
+        if self.is_uniform:
+            return True
+        return bool(np.all(self._values[1:] >= self._values[:-1]))
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, key) -> "TimeAxis":
+        """
+        Select samples: a slice of a uniform axis is still uniform, any other selection keeps the time of each sample
+        """
+        if self.is_uniform and isinstance(key, slice):
+            start, stop, step = key.indices(self.length)
+            return TimeAxis(t0=self.t0 + start * self.dt, dt=self.dt * step, length=len(range(start, stop, step)), unit=self.unit, name=self.name)
+        return TimeAxis(self.values[key], unit=self.unit, name=self.name)
+
+    def searchsorted(self, value: float, side: str = "left") -> int:
+        """
+        Find the position of a time, as `np.searchsorted`. The axis must be sorted
+        """
+        if not self.is_uniform:
+            return int(np.searchsorted(self._values, value, side=side))
+        # times equal up to rounding errors count as equal
+        position = (value - self.t0) / self.dt
+        position = np.ceil(position - 1e-9) if side == "left" else np.floor(position + 1e-9) + 1
+        return int(min(max(position, 0), self.length))
+
+    def get_seconds(self, positions: np.ndarray = None) -> np.ndarray:
+        """
+        Get the time, in seconds, of some samples
+
+        Args:
+            positions (np.ndarray): The positions of the samples. If None, all samples
+
+        Returns:
+            np.ndarray: The time of each sample, in seconds
+        """
+        if positions is None:
+            positions = np.arange(self.length)
+        if self.is_uniform:
+            times = self.t0 + np.asarray(positions) * self.dt
+        else:
+            times = self._values[positions].astype(float)
+        return times * TIME_UNIT_IN_SECONDS[self.unit]
+
+    def to_index(self) -> pd.Index:
+        return pd.Index(self.values, name=self.name)
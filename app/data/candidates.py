@@ -0,0 +1,141 @@
+import os
+import logging
+import numpy as np
+
+from app.data.cell import CellActivityBatch
+
+log_level = os.getenv("LOG_LEVEL", "INFO")
+logging.basicConfig(format='%(asctime)s - %(levelname)s - %(module)s - %(lineno)d - %(message)s', level=log_level, handlers=[logging.StreamHandler(), logging.FileHandler(f"{__name__}.log")])
+
+class PeakCandidateIndex:
+    """
+    The local maxima (peak candidates) of every cell of a population, regardless of the threshold,
+    sorted by cell and by value. Since the threshold only decides which candidates are peaks,
+    the features for any threshold are obtained with a binary search per cell, without
+    detecting the local maxima again.
+    """
+    def __init__(self, cell_ids, idx_samples: np.ndarray, idx_cells: np.ndarray, peak_values: np.ndarray, seconds: np.ndarray, means: np.ndarray = None):
+        """
+        Args:
+            cell_ids (array-like): The ID of each cell. If it is a pandas Index, its name is kept
+            idx_samples (np.ndarray): The sample of each candidate
+            idx_cells (np.ndarray): The position, in cell_ids, of the cell of each candidate
+            peak_values (np.ndarray): The value of each candidate
+            seconds (np.ndarray): The time, in seconds, of each sample
+            means (np.ndarray): The mean of each cell, used as threshold when none is given
+        """
+        self.cell_ids = cell_ids
+        self.seconds = np.asarray(seconds)
+        self.means = means
+        nr_cells = len(cell_ids)
+        nr_samples = max(len(self.seconds), 1)
+        idx_samples = np.asarray(idx_samples, dtype=np.int64)
+        idx_cells = np.asarray(idx_cells, dtype=np.int64)
+        peak_values = np.asarray(peak_values)
+
+        # sort by cell, then by increasing value and then by decreasing sample, so that the last
+        # candidate of each cell is its max peak, with ties broken by the earliest sample
+        order = np.lexsort((-idx_samples, peak_values, idx_cells))
+        self._cells = idx_cells[order]
+        self._samples = idx_samples[order]
+        self._values = peak_values[order]
+        self._cell_end = np.searchsorted(self._cells, np.arange(nr_cells), side="right")
+
+        # rank of each value among all the distinct candidate values, so that (cell, value) pairs
+        # can be searched for all cells at once in a single sorted integer key
+        self._distinct_values = np.unique(self._values)
+        self._key_stride = len(self._distinct_values) + 1
+        self._keys = self._cells * self._key_stride + np.searchsorted(self._distinct_values, self._values)
+
+        # earliest candidate from each position up to the end of its cell. Offsetting by cell
+        # keeps the running min from crossing cells, as cells decrease in reversed order
+        cell_offset = self._cells * nr_samples
+        earliest = np.minimum.accumulate((self._samples + cell_offset)[::-1])[::-1] - cell_offset
+        # position, in the sorted candidates, of the earliest candidate from each position on
+        by_sample = np.lexsort((self._samples, self._cells))
+        self._earliest = by_sample[np.searchsorted(cell_offset[by_sample] + self._samples[by_sample], earliest + cell_offset)]
+
+        logging.info(f"Peak candidate index built with {len(self._values)} candidates for {nr_cells} cells")
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def count_peaks(self, threshold = None) -> np.ndarray:
+        """
+        Count the candidates at or above the threshold, for each cell
+
+        Args:
+            threshold (float or np.ndarray): A single threshold or one per cell. If None, the mean of each cell is used
+
+        Returns:
+            np.ndarray: The number of peaks of each cell
+        """
+        return self._cell_end - self._get_first_peak_position(threshold)
+
+    def features(self, threshold = None) -> CellActivityBatch:
+        """
+        Get the activity features of each cell for a threshold
+
+        Args:
+            threshold (float or np.ndarray): A single threshold or one per cell. If None, the mean of each cell is used
+
+        Returns:
+            CellActivityBatch: The activity features of each cell
+        """
+        position = self._get_first_peak_position(threshold)
+        nr_peaks = self._cell_end - position
+        is_active = nr_peaks > 0
+        active_cells = np.flatnonzero(is_active)
+        first_peaks = self._earliest[position[is_active]]
+        max_peaks = self._cell_end[is_active] - 1
+
+        time_to_first_peak = np.full(len(nr_peaks), np.nan)
+        value_at_first_peak = np.full(len(nr_peaks), np.nan)
+        time_to_max_peak = np.full(len(nr_peaks), np.nan)
+        value_at_max_peak = np.full(len(nr_peaks), np.nan)
+        time_to_first_peak[active_cells] = self.seconds[self._samples[first_peaks]]
+        value_at_first_peak[active_cells] = self._values[first_peaks]
+        time_to_max_peak[active_cells] = self.seconds[self._samples[max_peaks]]
+        value_at_max_peak[active_cells] = self._values[max_peaks]
+
+        return CellActivityBatch(
+            cell_id=np.asarray(self.cell_ids),
+            time_to_first_peak=time_to_first_peak,
+            value_at_first_peak=value_at_first_peak,
+            time_to_max_peak=time_to_max_peak,
+            value_at_max_peak=value_at_max_peak,
+            is_active=is_active,
+            nr_peaks=nr_peaks,
+            name=getattr(self.cell_ids, "name", None),
+        )
+
+    def get_peaks(self, threshold = None):
+        """
+        Get the positions of the candidates at or above the threshold
+
+        Args:
+            threshold (float or np.ndarray): A single threshold or one per cell. If None, the mean of each cell is used
+
+        Returns:
+            tuple: The sample and the cell of each peak, sorted by cell and by value
+        """
+        first_peak_position = self._get_first_peak_position(threshold)
+        is_peak = np.arange(len(self._values)) >= first_peak_position[self._cells]
+        return self._samples[is_peak], self._cells[is_peak]
+
+    def _get_first_peak_position(self, threshold) -> np.ndarray:
+        """
+        Position, in the sorted candidates, of the first candidate of each cell at or above the threshold
+        """
+        if threshold is None:
+            if self.means is None:
+                error = ValueError("A threshold is required when the means of the cells are not known")
+                logging.error(error)
+                raise error
+            threshold = self.means
+        if np.issubdtype(self._distinct_values.dtype, np.floating):
+            # compared in the type of the values, as in `ActivityProcessor.get_local_maxima_per_population`
+            threshold = np.asarray(threshold).astype(self._distinct_values.dtype)
+        cells = np.arange(len(self._cell_end))
+        threshold_rank = np.searchsorted(self._distinct_values, np.broadcast_to(threshold, cells.shape), side="left")
+        return np.searchsorted(self._keys, cells * self._key_stride + threshold_rank, side="left")
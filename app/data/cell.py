@@ -1,7 +1,10 @@
 from dataclasses import dataclass
+import numpy as np
 import pandas as pd
 import os
 import logging
+
+from app.data.axis import TimeAxis, TIME_UNIT_IN_SECONDS
 # load logging level from environment variable
 log_level = os.getenv("LOG_LEVEL", "INFO")
 logging.basicConfig(format='%(asctime)s - %(levelname)s - %(module)s - %(lineno)d - %(message)s', level=log_level, handlers=[logging.StreamHandler(), logging.FileHandler(f"{__name__}.log")])
@@ -50,7 +53,47 @@ class CellActivity:
     def _get_second_of_timestamp(timestamp: pd.Timestamp):
         if timestamp is None:
             return None
+        # rows of a CellActivityBatch already hold the time in seconds
+        if not isinstance(timestamp, pd.Timestamp):
+            return float(timestamp)
         return timestamp.hour * 3600 + timestamp.minute * 60 + timestamp.second + timestamp.microsecond / 1e6
+
+    @staticmethod
+    def _get_seconds_of_timestamps(timestamps: pd.DatetimeIndex) -> np.ndarray:
+        """
+        Vectorized counterpart of `_get_second_of_timestamp`, converting a whole index at once
+
+        Args:
+            timestamps (pd.DatetimeIndex): The timestamps to convert
+
+        Returns:
+            np.ndarray: The second of the day of each timestamp, with microsecond resolution
+        """
+        nanoseconds = np.asarray(timestamps, dtype="datetime64[ns]").view("i8")
+        nanoseconds_of_day = np.mod(nanoseconds, 86_400_000_000_000)
+        seconds = nanoseconds_of_day // 1_000_000_000
+        microseconds = (nanoseconds_of_day % 1_000_000_000) // 1_000
+        return seconds.astype(float) + microseconds / 1e6
+
+    @staticmethod
+    def _get_seconds_of_index(index, time_unit: str = "s"):
+        """
+        Get the time, in seconds, of each sample of the index of the data
+
+        Args:
+            index (pd.Index or TimeAxis): A datetime index, a numeric index in the time unit, or a time axis
+            time_unit (str): The unit of a numeric index
+
+        Returns:
+            np.ndarray or TimeAxis: The time of each sample, in seconds. A time axis is returned as is, so
+                the time of the peaks is computed from their positions
+        """
+        if isinstance(index, TimeAxis):
+            return index
+        if isinstance(index, pd.DatetimeIndex):
+            return CellActivity._get_seconds_of_timestamps(index)
+        # numeric time, in the time unit, which does not wrap after 24 hours
+        return np.asarray(index, dtype=float) * TIME_UNIT_IN_SECONDS[time_unit]
     
     def to_df(self):
         
@@ -88,4 +131,183 @@ class CellActivity:
         Returns:
             tuple: The index and value of the first peak
         """
-        return (peaks.index[0], peaks.iloc[0])
\ No newline at end of file
+        return (peaks.index[0], peaks.iloc[0])
+
+
+@dataclass
+class CellActivityBatch:
+    """
+    Activity features of a whole population of cells, stored as one array per feature.
+    The time features are stored in seconds. Indexing the batch returns a `CellActivity` for that cell.
+    """
+    cell_id: np.ndarray
+    time_to_first_peak: np.ndarray
+    value_at_first_peak: np.ndarray
+    time_to_max_peak: np.ndarray
+    value_at_max_peak: np.ndarray
+    is_active: np.ndarray
+    nr_peaks: np.ndarray
+    # name of the index of the DataFrame returned by `to_df`
+    name: str = None
+
+    @classmethod
+    def from_peak_indices(cls, cell_ids, idx_samples: np.ndarray, idx_cells: np.ndarray, peak_values: np.ndarray, seconds: np.ndarray) -> "CellActivityBatch":
+        """
+        Initialize the class from the positions of the peaks of all cells
+
+        Args:
+            cell_ids (array-like): The ID of each cell. If it is a pandas Index, its name is kept
+            idx_samples (np.ndarray): The sample of each peak
+            idx_cells (np.ndarray): The position, in cell_ids, of the cell of each peak
+            peak_values (np.ndarray): The value of each peak
+            seconds (np.ndarray or TimeAxis): The time, in seconds, of each sample, or the time axis of the samples
+
+        Returns:
+            CellActivityBatch: The activity features of each cell
+        """
+        nr_cells = len(cell_ids)
+        idx_samples = np.asarray(idx_samples)
+        idx_cells = np.asarray(idx_cells)
+        peak_values = np.asarray(peak_values)
+        if isinstance(seconds, TimeAxis):
+            get_seconds = seconds.get_seconds
+        else:
+            get_seconds = np.asarray(seconds).__getitem__
+
+        nr_peaks = np.bincount(idx_cells, minlength=nr_cells)
+        is_active = nr_peaks > 0
+        time_to_first_peak = np.full(nr_cells, np.nan)
+        value_at_first_peak = np.full(nr_cells, np.nan)
+        time_to_max_peak = np.full(nr_cells, np.nan)
+        value_at_max_peak = np.full(nr_cells, np.nan)
+
+        # sort the peaks by cell and then by sample, so the first of each cell is its first peak
+        order = np.lexsort((idx_samples, idx_cells))
+        first_of_cell = cls._get_first_of_each_group(idx_cells[order])
+        cells, first_peaks = idx_cells[order][first_of_cell], order[first_of_cell]
+        time_to_first_peak[cells] = get_seconds(idx_samples[first_peaks])
+        value_at_first_peak[cells] = peak_values[first_peaks]
+
+        # sort the peaks by cell, then by decreasing value and then by sample, so that ties
+        # are broken by the earliest peak
+        order = np.lexsort((idx_samples, -peak_values, idx_cells))
+        first_of_cell = cls._get_first_of_each_group(idx_cells[order])
+        cells, max_peaks = idx_cells[order][first_of_cell], order[first_of_cell]
+        time_to_max_peak[cells] = get_seconds(idx_samples[max_peaks])
+        value_at_max_peak[cells] = peak_values[max_peaks]
+
+        return cls(
+            cell_id=np.asarray(cell_ids),
+            time_to_first_peak=time_to_first_peak,
+            value_at_first_peak=value_at_first_peak,
+            time_to_max_peak=time_to_max_peak,
+            value_at_max_peak=value_at_max_peak,
+            is_active=is_active,
+            nr_peaks=nr_peaks,
+            name=getattr(cell_ids, "name", None),
+        )
+
+    @staticmethod
+    def _get_first_of_each_group(sorted_groups: np.ndarray) -> np.ndarray:
+        """
+        Get the positions where a new group starts in an array sorted by group
+        """
+        is_first = np.ones(len(sorted_groups), dtype=bool)
+        is_first[1:] = sorted_groups[1:] != sorted_groups[:-1]
+        return np.flatnonzero(is_first)
+
+    @classmethod
+    def inactive(cls, cell_ids) -> "CellActivityBatch":
+        """
+        Initialize the class for cells without any peak
+
+        Args:
+            cell_ids (array-like): The ID of each cell. If it is a pandas Index, its name is kept
+
+        Returns:
+            CellActivityBatch: The activity features of each cell
+        """
+        return cls.from_peak_indices(cell_ids, np.array([], dtype=int), np.array([], dtype=int), np.array([]), np.array([]))
+
+    @classmethod
+    def concatenate(cls, batches: list, name: str = None) -> "CellActivityBatch":
+        """
+        Concatenate the features of different cells into a single batch
+
+        Args:
+            batches (list): The batches to concatenate, in order
+            name (str): The name of the index of the DataFrame returned by `to_df`
+
+        Returns:
+            CellActivityBatch: The activity features of the cells of all batches
+        """
+        return cls(
+            cell_id=np.concatenate([batch.cell_id for batch in batches]),
+            time_to_first_peak=np.concatenate([batch.time_to_first_peak for batch in batches]),
+            value_at_first_peak=np.concatenate([batch.value_at_first_peak for batch in batches]),
+            time_to_max_peak=np.concatenate([batch.time_to_max_peak for batch in batches]),
+            value_at_max_peak=np.concatenate([batch.value_at_max_peak for batch in batches]),
+            is_active=np.concatenate([batch.is_active for batch in batches]),
+            nr_peaks=np.concatenate([batch.nr_peaks for batch in batches]),
+            name=name,
+        )
+
+    def combine(self, later: "CellActivityBatch") -> "CellActivityBatch":
+        """
+        Combine the features of the same cells obtained from two consecutive parts of the recording
+
+        Args:
+            later (CellActivityBatch): The features of the part of the recording after the one of this batch
+
+        Returns:
+            CellActivityBatch: The features of each cell over both parts of the recording
+        """
+        if len(later) != len(self):
+            error = ValueError("Batches must have the same cells to be combined")
+            logging.error(error)
+            raise error
+        # the first peak is only taken from the later part if there was none before, and the max
+        # peak only if strictly greater, so ties are still broken by the earliest peak
+        use_later_first_peak = ~self.is_active & later.is_active
+        use_later_max_peak = later.is_active & (~self.is_active | (later.value_at_max_peak > self.value_at_max_peak))
+        return CellActivityBatch(
+            cell_id=self.cell_id,
+            time_to_first_peak=np.where(use_later_first_peak, later.time_to_first_peak, self.time_to_first_peak),
+            value_at_first_peak=np.where(use_later_first_peak, later.value_at_first_peak, self.value_at_first_peak),
+            time_to_max_peak=np.where(use_later_max_peak, later.time_to_max_peak, self.time_to_max_peak),
+            value_at_max_peak=np.where(use_later_max_peak, later.value_at_max_peak, self.value_at_max_peak),
+            is_active=self.is_active | later.is_active,
+            nr_peaks=self.nr_peaks + later.nr_peaks,
+            name=self.name,
+        )
+
+    def __len__(self) -> int:
+        return len(self.cell_id)
+
+    def __getitem__(self, position: int) -> CellActivity:
+        if not self.is_active[position]:
+            return CellActivity(str(self.cell_id[position]))
+        return CellActivity(
+            cell_id=str(self.cell_id[position]),
+            time_to_first_peak=float(self.time_to_first_peak[position]),
+            value_at_first_peak=float(self.value_at_first_peak[position]),
+            time_to_max_peak=float(self.time_to_max_peak[position]),
+            value_at_max_peak=float(self.value_at_max_peak[position]),
+            is_active=True,
+            nr_peaks=int(self.nr_peaks[position]),
+        )
+
+    def to_df(self) -> pd.DataFrame:
+        """
+        Build a DataFrame where each row is a cell and each column is a feature, with the
+        same columns and dtypes as `CellActivity.to_df`
+        """
+        data = {
+            "time_to_first_peak": self.time_to_first_peak.astype(float),
+            "value_at_first_peak": self.value_at_first_peak.astype(float),
+            "time_to_max_peak": self.time_to_max_peak.astype(float),
+            "value_at_max_peak": self.value_at_max_peak.astype(float),
+            "is_active": self.is_active.astype(bool),
+            "nr_peaks": self.nr_peaks.astype(int),
+        }
+        return pd.DataFrame(data, index=pd.Index(self.cell_id, name=self.name))
@@ -0,0 +1,100 @@
+import os
+import logging
+import numpy as np
+
+log_level = os.getenv("LOG_LEVEL", "INFO")
+logging.basicConfig(format='%(asctime)s - %(levelname)s - %(module)s - %(lineno)d - %(message)s', level=log_level, handlers=[logging.StreamHandler(), logging.FileHandler(f"{__name__}.log")])
+
+class ValueFilters:
+    """
+    The filters of a population, given as (value, type) pairs, turned into a single pass over the values.
+    The min and max (ignoring NaN), the number of NaN and the number of rows of each column are reduced
+    a block of rows at a time, and each filter is then a comparison on these statistics, combined in a
+    single mask of the columns to keep. Statistics are accumulated over calls to `update`, so the
+    values can also be given in blocks of frames.
+
+    Supported types:
+        - "above": remove the columns with a value above the value, or a NaN
+        - "below": remove the columns with a value below the value, or a NaN
+        - "nan_ratio": remove the columns whose ratio of NaN values is above the value
+        - "range": remove the columns whose range (max - min, ignoring NaN) is below the value
+    """
+    _supported_filters = ["above", "below", "nan_ratio", "range"]
+
+    def __init__(self, filters: list, block_size: int = 4096):
+        """
+        Args:
+            filters (list): The (value, type) pairs. Filters of an unknown type are skipped
+            block_size (int): The number of rows reduced at a time
+        """
+        self.filters = []
+        for threshold, filter_type in filters if filters is not None else []:
+            if filter_type.lower() not in self._supported_filters:
+                logging.warning(f"Filter type {filter_type} not recognized. Skipping filter")
+                continue
+            self.filters.append((threshold, filter_type.lower()))
+        self.block_size = max(1, int(block_size))
+        self.min: np.ndarray = None
+        self.max: np.ndarray = None
+        self.nr_nan: np.ndarray = None
+        self.nr_rows = 0
+
+    def update(self, values: np.ndarray) -> None:
+        """
+        Add rows to the statistics of the columns
+
+        Args:
+            values (np.ndarray): 2D array where each row is a sample and each column is a cell
+        """
+        if self.min is None:
+            self.min = np.full(values.shape[1], np.inf)
+            self.max = np.full(values.shape[1], -np.inf)
+            self.nr_nan = np.zeros(values.shape[1], dtype=np.int64)
+        self.nr_rows += values.shape[0]
+        if not self.filters:
+            return
+        can_be_nan = np.issubdtype(values.dtype, np.floating)
+        for start in range(0, values.shape[0], self.block_size):
+            block = values[start:start + self.block_size]
+            # fmin and fmax ignore NaN, which are counted apart
+            np.fmin(self.min, np.fmin.reduce(block, axis=0), out=self.min)
+            np.fmax(self.max, np.fmax.reduce(block, axis=0), out=self.max)
+            if can_be_nan:
+                self.nr_nan += np.isnan(block).sum(axis=0)
+
+    @property
+    def is_kept(self) -> np.ndarray:
+        """
+        Whether each column passes all the filters, given the rows added so far
+        """
+        if self.min is None:
+            error = ValueError("No values were added to the filters")
+            logging.error(error)
+            raise error
+        is_kept = np.ones(len(self.min), dtype=bool)
+        has_nan = self.nr_nan > 0
+        for threshold, filter_type in self.filters:
+            if filter_type == "above":
+                is_kept &= (self.max <= threshold) & ~has_nan
+            elif filter_type == "below":
+                is_kept &= (self.min >= threshold) & ~has_nan
+            elif filter_type == "nan_ratio":
+                is_kept &= self.nr_nan <= threshold * self.nr_rows
+            elif filter_type == "range":
+                # columns without values have no range and are kept
+                has_values = self.nr_nan < self.nr_rows
+                is_kept &= ~has_values | (self.max - self.min >= threshold)
+        return is_kept
+
+    def get_mask(self, values: np.ndarray) -> np.ndarray:
+        """
+        Add the values to the statistics and get whether each column passes all the filters
+
+        Args:
+            values (np.ndarray): 2D array where each row is a sample and each column is a cell
+
+        Returns:
+            np.ndarray: Boolean array with one value per column
+        """
+        self.update(values)
+        return self.is_kept
@@ -1,22 +1,87 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field, InitVar
 import os
+import numpy as np
 import pandas as pd
 import logging
 
+from app.data.filters import ValueFilters
+from app.data.axis import TimeAxis, DATETIME_TIME_AXIS, NUMERIC_TIME_AXIS
+
 # load logging level from environment variable
 log_level = os.getenv("LOG_LEVEL", "INFO")
 logging.basicConfig(format='%(asctime)s - %(levelname)s - %(module)s - %(lineno)d - %(message)s', level=log_level, handlers=[logging.StreamHandler(), logging.FileHandler(f"{__name__}.log")])
 
+class CellPopulationView:
+    """
+    Lazy view of the traces of a population: the raw block of values read from the DataFrame, the time
+    of each sample, a row offset and a boolean mask of the columns which are cells and pass the filters.
+    Dropping rows and filtering columns only update the offset and the masks; the values are copied
+    when the view is materialised with `to_df`, or when the kept columns are not all the columns of the block.
+    """
+    def __init__(self, values: np.ndarray, time_index, columns: pd.Index, column_mask: np.ndarray):
+        """
+        Args:
+            values (np.ndarray): 2D array where each row is a sample, not copied
+            time_index (pd.DatetimeIndex or TimeAxis): The time of each sample
+            columns (pd.Index): The name of each column of values
+            column_mask (np.ndarray): Whether each column of values is a cell
+        """
+        self.values = values
+        self.time_index = time_index
+        self.columns = columns
+        self.column_mask = column_mask
+        self.row_offset = 0
+        # rows kept after the offset, only used when rows are dropped by time and the time is not sorted
+        self.row_mask: np.ndarray = None
+
+    @property
+    def shape(self) -> tuple:
+        return len(self.get_index()), int(self.column_mask.sum())
+
+    def get_index(self):
+        index = self.time_index[self.row_offset:]
+        return index if self.row_mask is None else index[self.row_mask]
+
+    def get_columns(self) -> pd.Index:
+        return self.columns[self.column_mask]
+
+    def get_rows(self) -> np.ndarray:
+        """
+        The values of the kept rows, of all the columns of the block. Not copied unless rows are masked
+        """
+        rows = self.values[self.row_offset:]
+        return rows if self.row_mask is None else rows[self.row_mask]
+
+    def get_values(self) -> np.ndarray:
+        """
+        The values of the kept rows and columns. Not copied if all the columns of the block are kept and no rows are masked
+        """
+        rows = self.get_rows()
+        return rows if self.column_mask.all() else rows[:, self.column_mask]
+
+    def to_df(self) -> pd.DataFrame:
+        index = self.get_index()
+        if isinstance(index, TimeAxis):
+            index = index.to_index()
+        return pd.DataFrame(self.get_values(), index=index, columns=self.get_columns(), copy=True)
+
+
 @dataclass
 class CellPopulationActivity:
     ignore_peaks_before_criteria: str = "SAMPLES"
     ignore_peaks_before: int = 11
     time_unit: str = "s"
-    # data attribute is not initialized in the __init__ method
-    data: pd.DataFrame = None
+    # data is passed to the __init__ method, and stored in _data through the data property
+    data: InitVar[pd.DataFrame] = None
     filters: list = None
+    # if True, `from_df` keeps a view of the DataFrame it is given, materialised when `data` is accessed
+    lazy: bool = False
+    # "datetime" to index the data by timestamps, or "numeric" to keep the time as numbers in the time unit
+    time_axis: str = DATETIME_TIME_AXIS
+    _data: pd.DataFrame = field(default=None, init=False, repr=False)
+    _view: CellPopulationView = field(default=None, init=False, repr=False)
     
-    def __post_init__(self):
+    def __post_init__(self, data: pd.DataFrame):
         # check if ignore criteria is either samples or time, if not raise an error
         if self.ignore_peaks_before_criteria.lower() not in ["samples", "time"]:
             error = ValueError("Ignore peaks before criteria must be either SAMPLES or TIME")
@@ -28,14 +93,56 @@ class CellPopulationActivity:
             error = ValueError("Time unit must be either s, ms, us or ns")
             logging.error(error)
             raise error
+
+        if self.time_axis not in [DATETIME_TIME_AXIS, NUMERIC_TIME_AXIS]:
+            error = ValueError(f"Time axis must be either {DATETIME_TIME_AXIS} or {NUMERIC_TIME_AXIS}")
+            logging.error(error)
+            raise error
+
+        # the default of data is the data property, defined after the fields, when data is not passed
+        if not isinstance(data, property):
+            self._data = data
         return
+
+    @property
+    def data(self) -> pd.DataFrame:
+        """
+        The data, with the time as index and one column per cell. In lazy mode, it is materialised from the view on first access
+        """
+        if self._data is None and self._view is not None:
+            self._data = self._view.to_df()
+            # the data may be changed from now on, so the view is no longer used
+            self._view = None
+        return self._data
+
+    @data.setter
+    def data(self, data: pd.DataFrame) -> None:
+        self._data = data
+        self._view = None
+
+    @property
+    def view(self) -> CellPopulationView:
+        """
+        The lazy view of the data, or None if the data is not lazy or was materialised
+        """
+        return self._view
+
+    @property
+    def columns(self) -> pd.Index:
+        """
+        The cells, without materialising the data
+        """
+        if self._view is not None:
+            return self._view.get_columns()
+        return self.data.columns
     
     def apply_filters(self, data: pd.DataFrame) -> pd.DataFrame:
         """
-        Remove column in which there is at least one value below or above the specified threshold
+        Remove the columns which do not pass the filters, e.g. with at least one value below or above the specified threshold.
+        All the filters are evaluated in a single pass over the values, see `ValueFilters`
 
         Args:
-            data (pd.DataFrame): The data to be filtered
+            data (pd.DataFrame or CellPopulationView): The data to be filtered. A view is filtered by updating its column mask
 
         Returns:
             pd.DataFrame: The filtered data
@@ -43,24 +150,25 @@ class CellPopulationActivity:
         if self.filters is None:
             return data
         initial_amount_of_columns = data.shape[1]
-        for threshold, filter_type in self.filters:
-            if filter_type.lower() == "above":
-                data = data.loc[:, (data <= threshold).all()]
-            elif filter_type.lower() == "below":
-                data = data.loc[:, (data >= threshold).all()]
-            else:
-                logging.warning(f"Filter type {filter_type} not recognized. Skipping filter")
+        if isinstance(data, CellPopulationView):
+            # all the columns of the block are reduced, so the values are not copied
+            data.column_mask &= ValueFilters(self.filters).get_mask(data.get_rows())
+        else:
+            data = data.loc[:, ValueFilters(self.filters).get_mask(data.to_numpy())]
         final_amount_of_columns = data.shape[1]
         logging.info(f"Filtered data from {initial_amount_of_columns} to {final_amount_of_columns} columns")
         return data
     
     def from_df(self,data: pd.DataFrame) -> None:
         """
-        Read the data from a pandas DataFrame and performs some data cleaning
+        Read the data from a pandas DataFrame and performs some data cleaning.
+        In lazy mode, the DataFrame is not changed and the cleaning only updates a view of its values
 
         Args:
             data (pd.DataFrame): The data to be read
         """
+        if self.lazy:
+            return self._view_from_df(data)
         try:
             # check if any column name contains "time". If so, set it as the index
             self.set_time_column_as_index(data)
@@ -85,6 +193,32 @@ class CellPopulationActivity:
         )
 
         return
+
+    def _view_from_df(self, data: pd.DataFrame) -> None:
+        """
+        Keep a view of the values of the cells of a DataFrame, and drop rows and apply filters on the view
+        """
+        time_column = self._get_time_column(data)
+        is_cell = np.array([column != time_column and "frame" not in column.lower() for column in data.columns])
+        cell_positions = np.flatnonzero(is_cell)
+        # the columns from the first to the last cell. With copy on write, they are a (read-only)
+        # view of the DataFrame when they have the same type
+        start, stop = (cell_positions[0], cell_positions[-1] + 1) if len(cell_positions) else (0, 0)
+        with pd.option_context("mode.copy_on_write", True):
+            values = data.iloc[:, start:stop].to_numpy()
+        view = CellPopulationView(
+            values,
+            self._get_time_index(data[time_column]),
+            data.columns[start:stop],
+            is_cell[start:stop].copy(),
+        )
+        self.drop_rows(view)
+        self.apply_filters(view)
+        self._data, self._view = None, view
+
+        logging.info(
+            f"Data loaded lazily. Data shape: {view.shape}. Data columns: {view.get_columns()}"
+        )
     
     def drop_frames_column(self, data, inplace: bool = True) -> pd.DataFrame:
         """
@@ -133,8 +267,19 @@ class CellPopulationActivity:
         if threshold_time is None:
             threshold_time = self.ignore_peaks_before
         
-        # convert the time to a timestamp
-        threshold_time_timestamp = pd.to_datetime(threshold_time, unit=self.time_unit)
+        # convert the time to a timestamp, or keep it as a number with a numeric time axis
+        threshold_time_timestamp = self._get_time_threshold(threshold_time)
+        if isinstance(data, CellPopulationView):
+            index = data.get_index()
+            if data.row_mask is None and index.is_monotonic_increasing:
+                data.row_offset += int(index.searchsorted(threshold_time_timestamp, side="left"))
+            else:
+                time_index = data.time_index[data.row_offset:]
+                if isinstance(time_index, TimeAxis):
+                    time_index = time_index.values
+                is_kept = ~(time_index < threshold_time_timestamp)
+                data.row_mask = is_kept if data.row_mask is None else data.row_mask & is_kept
+            return data
         # drop rows before the specified time, in place
         return data.drop(data.index[data.index < threshold_time_timestamp], inplace=inplace)
 
@@ -153,6 +298,13 @@ class CellPopulationActivity:
             threshold_sample = self.ignore_peaks_before
         
         # drop rows before the index number `threshold_sample`
+        if isinstance(data, CellPopulationView):
+            if data.row_mask is None:
+                data.row_offset += min(max(int(threshold_sample), 0), len(data.get_index()))
+            else:
+                # the first kept rows are no longer kept
+                data.row_mask[np.flatnonzero(data.row_mask)[:threshold_sample]] = False
+            return data
 
         return data.drop(data.index[:threshold_sample], inplace=inplace)
     
@@ -170,12 +322,37 @@ class CellPopulationActivity:
         Raises:
             ValueError: If no column containing "time" is found in the data
         """
+        # set the time column as the index
+        data.set_index(self._get_time_column(data), inplace=True)
+        if self.time_axis == NUMERIC_TIME_AXIS:
+            if not pd.api.types.is_numeric_dtype(data.index):
+                error = ValueError("Time column must be numeric")
+                logging.error(error)
+                raise error
+            return
+        data.index = pd.to_datetime(data.index, unit=self.time_unit)
+
+    @staticmethod
+    def _get_time_column(data: pd.DataFrame) -> str:
         time_column = [column for column in data.columns if "time" in column.lower()]
         if len(time_column) == 0:
             error = ValueError("Time column not found in the data")
             logging.error(error)
             raise error
-        # set the time column as the index
-        data.set_index(time_column[0], inplace=True)
-        data.index = pd.to_datetime(data.index, unit=self.time_unit)
+        return time_column[0]
+
+    def _get_time_index(self, time: pd.Series):
+        """
+        Get the time of each sample as timestamps or, with a numeric time axis, as a `TimeAxis`
+        """
+        if self.time_axis == NUMERIC_TIME_AXIS:
+            return TimeAxis.from_values(time.to_numpy(), unit=self.time_unit, name=time.name)
+        return pd.to_datetime(pd.Index(time), unit=self.time_unit)
 
+    def _get_time_threshold(self, threshold_time: float):
+        """
+        Get a time, in the time unit, in the type of the time index: a timestamp, or a number with a numeric time axis
+        """
+        if self.time_axis == NUMERIC_TIME_AXIS:
+            return threshold_time
+        return pd.to_datetime(threshold_time, unit=self.time_unit)
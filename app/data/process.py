@@ -2,19 +2,52 @@ import pandas as pd
 import os
 import logging
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from scipy.signal import argrelmax
 
-from app.data.population import CellPopulationActivity
-from app.data.cell import CellActivity
+from app.data.population import CellPopulationActivity, CellPopulationView
+from app.data.cell import CellActivity, CellActivityBatch
+from app.data.candidates import PeakCandidateIndex
+from app.data.shared import SharedTraceMatrix, SharedTraceMatrixHandle
+from app.data.axis import TimeAxis, NUMERIC_TIME_AXIS
 
 log_level = os.getenv("LOG_LEVEL", "INFO")
 logging.basicConfig(format='%(asctime)s - %(levelname)s - %(module)s - %(lineno)d - %(message)s', level=log_level, handlers=[logging.StreamHandler(), logging.FileHandler(f"{__name__}.log")])
 
 class ActivityProcessor:
-    def __init__(self, threshold: float, n_neighbors: int = 3):
+    _supported_detectors = ["argrelmax", "running_max"]
+    _supported_shard_backends = ["threads", "processes"]
+    _supported_output_dtypes = ["default", "compact"]
+    _supported_precisions = ["float64", "float32"]
+
+    def __init__(self, threshold: float, n_neighbors: int = 3, detector: str = "argrelmax", nr_shards: int = 1, shard_backend: str = "threads", output_dtypes: str = "default", precision: str = "float64"):
+        if detector not in self._supported_detectors:
+            error = ValueError(f"Peak detector must be one of {self._supported_detectors}")
+            logging.error(error)
+            raise error
+        if shard_backend not in self._supported_shard_backends:
+            error = ValueError(f"Shard backend must be one of {self._supported_shard_backends}")
+            logging.error(error)
+            raise error
+        if output_dtypes not in self._supported_output_dtypes:
+            error = ValueError(f"Output dtypes must be one of {self._supported_output_dtypes}")
+            logging.error(error)
+            raise error
+        if precision not in self._supported_precisions:
+            error = ValueError(f"Precision must be one of {self._supported_precisions}")
+            logging.error(error)
+            raise error
         self.threshold = threshold
         self.n_neighbors = n_neighbors
-        logging.info(f"ActivityProcessor initialized with threshold {threshold} and n_neighbors {n_neighbors}")
+        self.detector = detector
+        # number of groups of cells processed in parallel, either in threads or in processes
+        self.nr_shards = max(1, int(nr_shards))
+        self.shard_backend = shard_backend
+        # "compact" returns the features with smaller dtypes, see `to_compact_dtypes`
+        self.output_dtypes = output_dtypes
+        # the type the values are processed in. float32 values are not copied with the float32 precision
+        self.precision = precision
+        logging.info(f"ActivityProcessor initialized with threshold {threshold}, n_neighbors {n_neighbors}, detector {detector}, {self.nr_shards} shards ({shard_backend}), {output_dtypes} output dtypes and {precision} precision")
 
     def _sanity_check_data(self, cell_population_activity: CellPopulationActivity) -> None:
         """
@@ -27,7 +60,7 @@ class ActivityProcessor:
             error: if the data is not a CellPopulationActivity
             error: if the data is not a pandas DataFrame
             error: if the data is empty
-            error: if the index is not a datetime index
+            error: if the index is not a datetime index, or a numeric index with a numeric time axis
             error: if the columns are not numerical
         """
         
@@ -35,6 +68,8 @@ class ActivityProcessor:
             error = ValueError("Data must be a CellPopulationActivity")
             logging.error(error)
             raise error
+        if isinstance(cell_population_activity.view, CellPopulationView):
+            return self._sanity_check_view(cell_population_activity.view)
         if not isinstance(cell_population_activity.data, pd.DataFrame):
             error = ValueError("Data must be a pandas DataFrame")
             logging.error(error)
@@ -44,8 +79,13 @@ class ActivityProcessor:
             error = ValueError("Data must not be empty")
             logging.error(error)
             raise error
-        # check if index is datetime index
-        if not isinstance(cell_population_activity.data.index, pd.DatetimeIndex):
+        # check if index is numeric with a numeric time axis, or a datetime index otherwise
+        if cell_population_activity.time_axis == NUMERIC_TIME_AXIS:
+            if not pd.api.types.is_numeric_dtype(cell_population_activity.data.index):
+                error = ValueError("Data index must be numeric with a numeric time axis")
+                logging.error(error)
+                raise error
+        elif not isinstance(cell_population_activity.data.index, pd.DatetimeIndex):
             error = ValueError("Data index must be a datetime index")
             logging.error(error)
             raise error
@@ -55,6 +95,20 @@ class ActivityProcessor:
             logging.error(error)
             raise error
         return       
+
+    @staticmethod
+    def _sanity_check_view(view: CellPopulationView) -> None:
+        """
+        Check if the lazy view of the data is valid, with the same rules as `_sanity_check_data`
+        """
+        if 0 in view.shape:
+            error = ValueError("Data must not be empty")
+            logging.error(error)
+            raise error
+        if not pd.api.types.is_numeric_dtype(view.values.dtype):
+            error = ValueError("Data columns must be numerical")
+            logging.error(error)
+            raise error
         
 
     def run(self, cell_population_activity: CellPopulationActivity) -> pd.DataFrame:
@@ -70,15 +124,16 @@ class ActivityProcessor:
         
         self._sanity_check_data(cell_population_activity)
         
-        summary_df = self._initialize_summary_df(cell_population_activity)
-        for column in cell_population_activity.data.columns:
-            cell_activity_row: pd.DataFrame = self.process_cell_activity(cell_population_activity.data[column])
-            summary_df.update(cell_activity_row)
+        if isinstance(cell_population_activity.view, CellPopulationView):
+            # the values are read from the view, without materialising the data
+            summary_df = self._batch_to_summary_df(self.get_population_activity_batch_from_view(cell_population_activity.view))
+        else:
+            summary_df = self.process_population_activity(cell_population_activity.data, time_unit=cell_population_activity.time_unit)
         
         # sort the index alphabetically
         summary_df = summary_df.sort_index()
         
-        return summary_df
+        return self._to_output_dtypes(summary_df)
 
     def _initialize_summary_df(self, cell_population_activity: CellPopulationActivity) -> pd.DataFrame:
         """
@@ -93,6 +148,245 @@ class ActivityProcessor:
         summary_df = pd.DataFrame(CellActivity("").to_df(), index=cell_population_activity.data.columns)
         return summary_df
     
+    def process_population_activity(self, data: pd.DataFrame, time_unit: str = "s") -> pd.DataFrame:
+        """
+        Process the activity of every cell at once and return a summary DataFrame.
+        Equivalent to calling `process_cell_activity` on each column, but the peak
+        detection and the feature extraction are done with array operations over the whole
+        population, and the summary DataFrame is built only once.
+
+        Args:
+            data (pd.DataFrame): datetime index and one column with numerical values per cell
+            time_unit (str): The unit of the index, if it is numeric
+
+        Returns:
+            pd.DataFrame: The summary DataFrame - each row is a cell and each column is a feature
+        """
+        return self._batch_to_summary_df(self.get_population_activity_batch(data, time_unit=time_unit))
+
+    @staticmethod
+    def _batch_to_summary_df(batch: CellActivityBatch) -> pd.DataFrame:
+        summary_df = batch.to_df()
+        # kept as float and object, as the column-by-column summary DataFrame always was
+        summary_df["nr_peaks"] = summary_df["nr_peaks"].astype(float)
+        summary_df["is_active"] = summary_df["is_active"].astype(object)
+        return summary_df
+
+    def _to_output_dtypes(self, summary_df: pd.DataFrame) -> pd.DataFrame:
+        if self.output_dtypes == "compact":
+            return self.to_compact_dtypes(summary_df)
+        return summary_df
+
+    @staticmethod
+    def to_compact_dtypes(summary_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Convert the summary DataFrame to smaller dtypes, for the features of many files to fit in memory:
+        the cell ids are categorical, the times and values are float32, the number of peaks is int16
+        (int32 if a cell has more peaks than int16 can hold) and the activity is bool
+
+        Args:
+            summary_df (pd.DataFrame): The summary DataFrame, as returned by `run`
+
+        Returns:
+            pd.DataFrame: The summary DataFrame with the same values in smaller dtypes
+        """
+        nr_peaks = summary_df["nr_peaks"]
+        nr_peaks_dtype = np.int16 if nr_peaks.empty or nr_peaks.max() <= np.iinfo(np.int16).max else np.int32
+        summary_df = summary_df.astype({
+            "time_to_first_peak": np.float32,
+            "value_at_first_peak": np.float32,
+            "time_to_max_peak": np.float32,
+            "value_at_max_peak": np.float32,
+            "is_active": bool,
+            "nr_peaks": nr_peaks_dtype,
+        })
+        if not isinstance(summary_df.index, pd.MultiIndex):
+            summary_df.index = pd.CategoricalIndex(summary_df.index, name=summary_df.index.name)
+        return summary_df
+
+    def get_population_activity_batch(self, data: pd.DataFrame, time_unit: str = "s") -> CellActivityBatch:
+        """
+        Detect the peaks of every cell at once and return their features as a CellActivityBatch
+
+        Args:
+            data (pd.DataFrame): datetime index and one column with numerical values per cell
+            time_unit (str): The unit of the index, if it is numeric
+
+        Returns:
+            CellActivityBatch: The activity features of each cell
+        """
+        values = data.to_numpy(dtype=self.precision)
+        threshold = self.threshold
+        if threshold is None:
+            threshold = data.mean().to_numpy(dtype=float)
+        seconds = CellActivity._get_seconds_of_index(data.index, time_unit)
+        return self._get_activity_batch_in_shards(data.columns, values, seconds, threshold)
+
+    def get_population_activity_batch_from_view(self, view: CellPopulationView) -> CellActivityBatch:
+        """
+        Detect the peaks of every cell of a lazy view of the data at once, as `get_population_activity_batch` does
+
+        Args:
+            view (CellPopulationView): The view of the data of a population
+
+        Returns:
+            CellActivityBatch: The activity features of each cell
+        """
+        values = np.asarray(view.get_values(), dtype=self.precision)
+        threshold = self.threshold
+        if threshold is None:
+            threshold = pd.DataFrame(values, copy=False).mean().to_numpy(dtype=float)
+        seconds = CellActivity._get_seconds_of_index(view.get_index())
+        return self._get_activity_batch_in_shards(view.get_columns(), values, seconds, threshold)
+
+    def _get_activity_batch_in_shards(self, cell_ids: pd.Index, values: np.ndarray, seconds, threshold) -> CellActivityBatch:
+        """
+        Detect the peaks of every cell, splitting the cells in shards processed in parallel if the processor has more than one shard
+        """
+        if self.nr_shards == 1 or values.shape[1] < 2:
+            return self.get_activity_batch_from_values(cell_ids, values, seconds, threshold)
+
+        shard_bounds = np.linspace(0, values.shape[1], min(self.nr_shards, values.shape[1]) + 1).astype(int)
+        if self.shard_backend == "processes":
+            return self._get_population_activity_batch_in_processes(cell_ids, values, seconds, threshold, shard_bounds)
+
+        # NumPy and SciPy release the GIL in their kernels, so shards of cells run in parallel threads
+        def process_shard(start: int, end: int) -> CellActivityBatch:
+            shard_threshold = threshold[start:end] if np.ndim(threshold) > 0 else threshold
+            return self.get_activity_batch_from_values(cell_ids[start:end], values[:, start:end], seconds, shard_threshold)
+
+        with ThreadPoolExecutor(max_workers=len(shard_bounds) - 1) as executor:
+            batches = list(executor.map(process_shard, shard_bounds[:-1], shard_bounds[1:]))
+        return CellActivityBatch.concatenate(batches, name=cell_ids.name)
+
+    def _get_population_activity_batch_in_processes(self, cell_ids: pd.Index, values: np.ndarray, seconds, threshold, shard_bounds: np.ndarray) -> CellActivityBatch:
+        """
+        Process each shard of cells in a worker process. The values and the time are placed in shared
+        memory once, so workers read their columns without the data being pickled, and only the
+        features of the cells are sent back
+        """
+        if isinstance(seconds, TimeAxis):
+            seconds = seconds.get_seconds()
+        with SharedTraceMatrix(values, seconds) as shared_trace_matrix:
+            with ProcessPoolExecutor(max_workers=len(shard_bounds) - 1) as executor:
+                futures = [
+                    executor.submit(
+                        _process_shared_columns,
+                        shared_trace_matrix.handle,
+                        start,
+                        end,
+                        threshold[start:end] if np.ndim(threshold) > 0 else threshold,
+                        self.n_neighbors,
+                        self.detector,
+                    )
+                    for start, end in zip(shard_bounds[:-1], shard_bounds[1:])
+                ]
+                batches = [future.result() for future in futures]
+        batch = CellActivityBatch.concatenate(batches, name=cell_ids.name)
+        # workers only know the position of the cells
+        batch.cell_id = np.asarray(cell_ids)
+        return batch
+
+    def get_activity_batch_from_values(self, cell_ids, values: np.ndarray, seconds: np.ndarray, threshold) -> CellActivityBatch:
+        """
+        Detect the peaks of every cell of a 2D array and return their features as a CellActivityBatch
+
+        Args:
+            cell_ids (array-like): The ID of each cell (column)
+            values (np.ndarray): 2D array where each row is a sample and each column is a cell
+            seconds (np.ndarray or TimeAxis): The time, in seconds, of each sample, or the time axis of the samples
+            threshold (float or np.ndarray): The threshold, either a single value or one value per cell
+
+        Returns:
+            CellActivityBatch: The activity features of each cell
+        """
+        is_peak = self.get_local_maxima_per_population(values, self.n_neighbors, threshold, detector=self.detector)
+        idx_samples, idx_cells = np.nonzero(is_peak)
+        return CellActivityBatch.from_peak_indices(
+            cell_ids,
+            idx_samples,
+            idx_cells,
+            values[idx_samples, idx_cells],
+            seconds,
+        )
+
+    def get_peak_candidate_index(self, data: pd.DataFrame, n_neighbors: int = None, time_unit: str = "s") -> PeakCandidateIndex:
+        """
+        Find the local maxima of every cell, regardless of the threshold, and index them so the
+        features for any threshold can be obtained without detecting the local maxima again
+
+        Args:
+            data (pd.DataFrame): datetime index and one column with numerical values per cell
+            n_neighbors (int): The number of samples on each side a local maxima must be greater than.
+                If None, the n_neighbors of the processor is used
+            time_unit (str): The unit of the index, if it is numeric
+
+        Returns:
+            PeakCandidateIndex: The index of the local maxima
+        """
+        if n_neighbors is None:
+            n_neighbors = self.n_neighbors
+        values = data.to_numpy(dtype=self.precision)
+        is_candidate = self.get_local_maxima_per_population(values, n_neighbors, -np.inf, detector=self.detector)
+        idx_samples, idx_cells = np.nonzero(is_candidate)
+        return PeakCandidateIndex(
+            data.columns,
+            idx_samples,
+            idx_cells,
+            values[idx_samples, idx_cells],
+            CellActivity._get_seconds_of_index(data.index, time_unit),
+            means=data.mean().to_numpy(dtype=float),
+        )
+
+    def run_from_peak_candidate_index(self, peak_candidate_index: PeakCandidateIndex, threshold = None) -> pd.DataFrame:
+        """
+        Get the summary DataFrame for a threshold from an index of the local maxima, without detecting them again.
+        Gives the same result as `run` on the data the index was built from.
+
+        Args:
+            peak_candidate_index (PeakCandidateIndex): The index of the local maxima, see `get_peak_candidate_index`
+            threshold (float): The threshold to consider a value as a peak. If None, the threshold of the processor is used
+
+        Returns:
+            pd.DataFrame: The summary DataFrame with the activity features of each cell
+        """
+        if threshold is None:
+            threshold = self.threshold
+        return self._to_output_dtypes(self._batch_to_summary_df(peak_candidate_index.features(threshold)).sort_index())
+
+    def sweep(self, cell_population_activity: CellPopulationActivity, thresholds: list = None, windows: list = None) -> pd.DataFrame:
+        """
+        Process the cell population activity for every combination of threshold and window.
+        The local maxima are detected once per window, and each threshold is then answered from
+        the candidates sorted by value, so adding thresholds is much cheaper than calling `run` again.
+
+        Args:
+            cell_population_activity (CellPopulationActivity): The cell population activity
+            thresholds (list): The thresholds to evaluate. If None, the threshold of the processor is used
+            windows (list): The n_neighbors to evaluate. If None, the n_neighbors of the processor is used
+
+        Returns:
+            pd.DataFrame: The features of each cell, indexed by (threshold, window, cell)
+        """
+        self._sanity_check_data(cell_population_activity)
+        if thresholds is None:
+            thresholds = [self.threshold]
+        if windows is None:
+            windows = [self.n_neighbors]
+
+        data = cell_population_activity.data
+        summary_dfs = []
+        for window in windows:
+            index = self.get_peak_candidate_index(data, n_neighbors=window, time_unit=cell_population_activity.time_unit)
+            for threshold in thresholds:
+                summary_df = self._to_output_dtypes(self._batch_to_summary_df(index.features(threshold)).sort_index())
+                summary_df.index = pd.MultiIndex.from_arrays(
+                    [[threshold] * len(summary_df), [window] * len(summary_df), summary_df.index],
+                    names=["threshold", "window", data.columns.name if data.columns.name is not None else "cell"]
+                )
+                summary_dfs.append(summary_df)
+        return pd.concat(summary_dfs)
+
     def process_cell_activity(self, cell_activity_time_series: pd.Series) :
         """
         Process the cell activity time series and return a series with the summary of the activity
@@ -130,18 +424,126 @@ class ActivityProcessor:
         is_local_maxima.iloc[idx_local_maxima] = series.iloc[idx_local_maxima] >= threshold
         return series[is_local_maxima]
     
+    @staticmethod
+    def get_local_maxima_per_population(values: np.ndarray, n_neighbors: int = 3, threshold = None, detector: str = "argrelmax") -> np.ndarray:
+        """
+        Find the local maxima of every column of a 2D array at once, along the time axis (axis 0)
+
+        Args:
+            values (np.ndarray): 2D array where each row is a sample and each column is a cell
+            n_neighbors (int): The number of samples on each side a local maxima must be greater than
+            threshold (float or np.ndarray): The threshold to consider a value as a local maxima, either
+                a single value or one value per column. If None, the mean of each column is used
+            detector (str): "argrelmax" to use `scipy.signal.argrelmax`, or "running_max" to use
+                running maxima, whose cost does not depend on n_neighbors. Both yield the same result
+
+        Returns:
+            np.ndarray: Boolean array, with the same shape as values, True where there is a local maxima
+        """
+        if not isinstance(values, np.ndarray) or values.ndim != 2:
+            error = ValueError("Data must be a 2D numpy array")
+            logging.error(error)
+            raise error
+        if threshold is None:
+            threshold = np.nanmean(values, axis=0)
+        if detector == "running_max":
+            is_local_maxima = ActivityProcessor._get_local_maxima_by_running_max(values, n_neighbors)
+        elif detector == "argrelmax":
+            is_local_maxima = np.zeros(values.shape, dtype=bool)
+            idx_rows, idx_columns = argrelmax(values, axis=0, order=n_neighbors)
+            is_local_maxima[idx_rows, idx_columns] = True
+        else:
+            error = ValueError(f"Peak detector must be one of {ActivityProcessor._supported_detectors}")
+            logging.error(error)
+            raise error
+        if np.issubdtype(values.dtype, np.floating):
+            # compared in the type of the values, so a value equal to the threshold is not above it once rounded to float32
+            threshold = np.asarray(threshold).astype(values.dtype)
+        is_local_maxima &= values >= threshold
+        return is_local_maxima
+
+    @staticmethod
+    def _get_local_maxima_by_running_max(values: np.ndarray, n_neighbors: int) -> np.ndarray:
+        """
+        Find the local maxima along axis 0 with the same semantics as `argrelmax(values, axis=0, order=n_neighbors)`:
+        a sample is a local maxima if it is strictly greater than the n_neighbors samples on each side,
+        where windows crossing the edges are clipped and the first and last samples are never local maxima.
+
+        Args:
+            values (np.ndarray): 2D array where each row is a sample and each column is a cell
+            n_neighbors (int): The number of samples on each side a local maxima must be greater than
+
+        Returns:
+            np.ndarray: Boolean array, with the same shape as values, True where there is a local maxima
+        """
+        if int(n_neighbors) != n_neighbors or n_neighbors < 1:
+            error = ValueError("n_neighbors must be an integer >= 1")
+            logging.error(error)
+            raise error
+        n_neighbors = int(n_neighbors)
+        if values.dtype == bool:
+            values = values.astype(np.uint8)
+        nr_samples = values.shape[0]
+        is_local_maxima = np.zeros(values.shape, dtype=bool)
+        if nr_samples < 3:
+            return is_local_maxima
+
+        # with n_neighbors samples of padding at the start, the running max starting at sample i
+        # is the max of the n_neighbors samples before i, and the one starting at sample
+        # i + n_neighbors + 1 is the max of the n_neighbors samples after i
+        padding = np.full((n_neighbors,) + values.shape[1:], ActivityProcessor._lowest_value(values.dtype), dtype=values.dtype)
+        running_max = ActivityProcessor._running_max(np.concatenate([padding, values]), n_neighbors)
+        candidates = values[1:-1]
+        # comparisons with NaN are False, and NaN propagates through the running max
+        is_local_maxima[1:-1] = (candidates > running_max[1:nr_samples - 1]) & (candidates > running_max[n_neighbors + 2:])
+        return is_local_maxima
+
+    @staticmethod
+    def _running_max(values: np.ndarray, window: int) -> np.ndarray:
+        """
+        Running maximum along axis 0, where the output at row i is the max of values[i:i + window].
+        Windows running past the last row are truncated. Uses the van Herk/Gil-Werman algorithm,
+        so the cost is the same whatever the window size.
+
+        Args:
+            values (np.ndarray): Array to compute the running maximum of
+            window (int): The number of rows of each window
+
+        Returns:
+            np.ndarray: The running maximum, with the same shape as values
+        """
+        nr_samples = values.shape[0]
+        # split in blocks of `window` rows, with an extra block so every window fits
+        nr_blocks = -(-nr_samples // window) + 1
+        padded = np.full((nr_blocks * window,) + values.shape[1:], ActivityProcessor._lowest_value(values.dtype), dtype=values.dtype)
+        padded[:nr_samples] = values
+        blocks = padded.reshape((nr_blocks, window) + values.shape[1:])
+        # max from the start of the block up to each row, and from each row up to the end of the block
+        max_from_block_start = np.maximum.accumulate(blocks, axis=1).reshape(padded.shape)
+        max_to_block_end = np.maximum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].reshape(padded.shape)
+        # a window starting at row i spans the end of the block of i and the start of the next one
+        return np.maximum(max_to_block_end[:nr_samples], max_from_block_start[window - 1:window - 1 + nr_samples])
+
+    @staticmethod
+    def _lowest_value(dtype: np.dtype):
+        if np.issubdtype(dtype, np.floating):
+            return -np.inf
+        return np.iinfo(dtype).min
+
     @staticmethod
     def summary_of_population(cell_population_activity_features: pd.DataFrame, exclude_zeros_in_numeric_columns: bool = False):
         """
         Get mean, nr of instances and % number of each column in the cell population activity features
 
         Args:
-            cell_population_activity_features (pd.DataFrame): The cell population activity features (each row
-                represents a cell and each column represents a feature)
+            cell_population_activity_features (pd.DataFrame or CellActivityBatch): The cell population activity
+                features (each row represents a cell and each column represents a feature)
 
         Returns:
             pd.Series: The mean of each column in the cell population activity features
         """
+        if isinstance(cell_population_activity_features, CellActivityBatch):
+            cell_population_activity_features = cell_population_activity_features.to_df()
         total_instances = pd.Series(
             {
                 "total_instances": cell_population_activity_features.shape[0]
@@ -152,9 +554,17 @@ class ActivityProcessor:
         numeric_features = cell_population_activity_features.select_dtypes(include=[np.number])
         # if exclude_zeros_in_numeric_columns is True, then replace 0 with NaN
         if exclude_zeros_in_numeric_columns:
-            numeric_features = numeric_features.replace(0, np.nan)
-            
-        mean_features:pd.Series = numeric_features.mean(skipna=True)
+            # float columns keep their dtype, e.g. float32, while integer columns, which cannot hold NaN,
+            # are summed and counted instead of being converted to float64
+            is_float = numeric_features.dtypes.apply(pd.api.types.is_float_dtype).to_numpy()
+            float_features = numeric_features.loc[:, is_float]
+            integer_features = numeric_features.loc[:, ~is_float]
+            mean_features:pd.Series = pd.concat([
+                float_features.where(float_features != 0).mean(skipna=True),
+                integer_features.sum() / (integer_features != 0).sum(),
+            ])[numeric_features.columns]
+        else:
+            mean_features:pd.Series = numeric_features.mean(skipna=True)
         
         # update the index to include "mean " before to each index value
         mean_features.index = mean_features.index.map(lambda x: 'mean ' + x)
@@ -164,7 +574,8 @@ class ActivityProcessor:
         #convert column to boolean
         candidate_boolean_features = [col for col in cell_population_activity_features.columns if "is" in col]
         for column in candidate_boolean_features:
-            cell_population_activity_features[column] = cell_population_activity_features[column].astype(bool)
+            if not pd.api.types.is_bool_dtype(cell_population_activity_features[column]):
+                cell_population_activity_features[column] = cell_population_activity_features[column].astype(bool)
 
         # find boolean columns and count total number of rows, total number of true and % of true
         boolean_features = cell_population_activity_features.select_dtypes(include=[bool])
@@ -177,4 +588,23 @@ class ActivityProcessor:
         # combine all features
         summary = pd.concat([mean_features, nr_true, percent_true, total_instances], axis=0).transpose()
         return summary
-        
+
+
+def _process_shared_columns(handle: SharedTraceMatrixHandle, start: int, end: int, threshold, n_neighbors: int, detector: str) -> CellActivityBatch:
+    """
+    Process the columns start to end (excluded) of a SharedTraceMatrix, in a worker process
+
+    Returns:
+        CellActivityBatch: The activity features of the cells, identified by their position
+    """
+    values_memory, seconds_memory = handle.attach()
+    try:
+        activity_processor = ActivityProcessor(threshold=threshold, n_neighbors=n_neighbors, detector=detector)
+        return activity_processor.get_activity_batch_from_values(
+            np.arange(start, end),
+            handle.get_values(values_memory)[:, start:end],
+            handle.get_seconds(seconds_memory),
+            threshold,
+        )
+    finally:
+        SharedTraceMatrixHandle.detach(values_memory, seconds_memory)
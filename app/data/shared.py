@@ -0,0 +1,97 @@
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+import os
+import logging
+import numpy as np
+
+log_level = os.getenv("LOG_LEVEL", "INFO")
+logging.basicConfig(format='%(asctime)s - %(levelname)s - %(module)s - %(lineno)d - %(message)s', level=log_level, handlers=[logging.StreamHandler(), logging.FileHandler(f"{__name__}.log")])
+
+@dataclass(frozen=True)
+class SharedTraceMatrixHandle:
+    """
+    Small, picklable description of a SharedTraceMatrix, sent to the worker processes instead of the data
+    """
+    values_name: str
+    seconds_name: str
+    shape: tuple
+    dtype: str
+
+    def attach(self):
+        """
+        Attach to the shared memory blocks, without copying them
+
+        Returns:
+            tuple: The shared memory blocks of the values and of the time, to be closed with `detach`
+        """
+        return SharedMemory(name=self.values_name), SharedMemory(name=self.seconds_name)
+
+    def get_values(self, values_memory: SharedMemory) -> np.ndarray:
+        # column-major, so the values of a range of columns are contiguous
+        return np.ndarray(self.shape, dtype=self.dtype, buffer=values_memory.buf, order="F")
+
+    def get_seconds(self, seconds_memory: SharedMemory) -> np.ndarray:
+        return np.ndarray((self.shape[0],), dtype=np.float64, buffer=seconds_memory.buf)
+
+    @staticmethod
+    def detach(*memories: SharedMemory) -> None:
+        for memory in memories:
+            try:
+                memory.close()
+            except BufferError:
+                # an array still points to the block, e.g. in the traceback of an error. The
+                # mapping is released when the process exits
+                logging.warning(f"Could not close shared memory {memory.name}")
+
+
+class SharedTraceMatrix:
+    """
+    Trace matrix (one column per cell) and time (in seconds) of a population, placed in shared memory
+    blocks so worker processes can read any range of columns without the data being pickled.
+    The blocks are released when the matrix is closed, including when used as a context manager
+    and a worker fails.
+    """
+    def __init__(self, values: np.ndarray, seconds: np.ndarray):
+        """
+        Args:
+            values (np.ndarray): 2D array where each row is a sample and each column is a cell
+            seconds (np.ndarray): The time, in seconds, of each sample
+        """
+        self._memories = []
+        try:
+            values_memory = self._create(values.nbytes)
+            seconds_memory = self._create(len(seconds) * np.dtype(np.float64).itemsize)
+            self.handle = SharedTraceMatrixHandle(values_memory.name, seconds_memory.name, tuple(values.shape), np.dtype(values.dtype).str)
+            self.handle.get_values(values_memory)[:] = values
+            self.handle.get_seconds(seconds_memory)[:] = seconds
+        except Exception as e:
+            self.close()
+            logging.error(e)
+            raise e
+        logging.info(f"Placed a trace matrix of shape {values.shape} in shared memory")
+
+    def _create(self, size: int) -> SharedMemory:
+        memory = SharedMemory(create=True, size=max(size, 1))
+        self._memories.append(memory)
+        return memory
+
+    def close(self) -> None:
+        """
+        Release the shared memory blocks. Can be called more than once
+        """
+        while self._memories:
+            memory = self._memories.pop()
+            SharedTraceMatrixHandle.detach(memory)
+            try:
+                memory.unlink()
+            except FileNotFoundError:
+                pass
+
+    def __enter__(self) -> "SharedTraceMatrix":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __del__(self):
+        self.close()
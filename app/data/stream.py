@@ -0,0 +1,180 @@
+import os
+import logging
+import numpy as np
+import pandas as pd
+
+from app.data.population import CellPopulationActivity
+from app.data.cell import CellActivity, CellActivityBatch
+from app.data.process import ActivityProcessor
+from app.data.filters import ValueFilters
+
+log_level = os.getenv("LOG_LEVEL", "INFO")
+logging.basicConfig(format='%(asctime)s - %(levelname)s - %(module)s - %(lineno)d - %(message)s', level=log_level, handlers=[logging.StreamHandler(), logging.FileHandler(f"{__name__}.log")])
+
+class StreamingActivityProcessor:
+    """
+    Streaming counterpart of `ActivityProcessor`: receives the recording in blocks of frames and
+    keeps the activity features of each cell up to date. Only the last 2 * n_neighbors frames are
+    kept as context, so memory does not grow with the length of the recording. Once `finalize`
+    is called, the features are the same as running `ActivityProcessor.run` on the whole recording.
+    """
+    def __init__(self, cell_population_activity: CellPopulationActivity, threshold: float, n_neighbors: int = 3, detector: str = "argrelmax", output_dtypes: str = "default", precision: str = "float64"):
+        """
+        Args:
+            cell_population_activity (CellPopulationActivity): Provides the time unit, the filters and the rule
+                to ignore peaks at the start of the recording. Its data is not used
+            threshold (float): The threshold to consider a value as a peak
+            n_neighbors (int): The number of samples on each side a peak must be greater than
+            detector (str): The local maxima detector, as in `ActivityProcessor`
+            output_dtypes (str): The dtypes of the features, as in `ActivityProcessor`
+            precision (str): The type the values are processed in, as in `ActivityProcessor`
+        """
+        if threshold is None:
+            # the mean of each cell is only known at the end of the recording
+            error = ValueError("A threshold is required to process a recording while streaming")
+            logging.error(error)
+            raise error
+        self.cell_population_activity = cell_population_activity
+        self.activity_processor = ActivityProcessor(threshold=threshold, n_neighbors=n_neighbors, detector=detector, output_dtypes=output_dtypes, precision=precision)
+        self.columns: pd.Index = None
+        self.batch: CellActivityBatch = None
+        # columns which, so far, pass all the filters of the population
+        self.is_kept: np.ndarray = None
+        self.value_filters = ValueFilters(cell_population_activity.filters)
+        self.is_finalized = False
+        # number of frames received, before and after ignoring the first ones
+        self.nr_frames_received = 0
+        self.nr_frames_processed = 0
+        # last frames, whose values and time (in seconds) are needed to confirm the next peaks
+        self._context_values: np.ndarray = None
+        self._context_seconds: np.ndarray = None
+        # frame, among the processed ones, of the first frame of the context
+        self._context_start = 0
+        # frame, among the processed ones, of the first frame not yet confirmed as peak or not
+        self._next_unconfirmed = 0
+
+    @property
+    def n_neighbors(self) -> int:
+        return self.activity_processor.n_neighbors
+
+    def update(self, block: pd.DataFrame) -> None:
+        """
+        Process a block of frames, following the previous ones
+
+        Args:
+            block (pd.DataFrame): The frames, with the same layout as the data given to
+                `CellPopulationActivity.from_df`: a column containing "time" and one column per cell
+        """
+        if self.is_finalized:
+            error = ValueError("Cannot update a finalized StreamingActivityProcessor")
+            logging.error(error)
+            raise error
+        block = self._prepare_block(block)
+        if block.empty:
+            return
+        values = block.to_numpy(dtype=self.activity_processor.precision)
+        self._apply_filters(values)
+        seconds = CellActivity._get_seconds_of_index(block.index, self.cell_population_activity.time_unit)
+
+        if self._context_values is None:
+            self._context_values, self._context_seconds = values, seconds
+        else:
+            self._context_values = np.concatenate([self._context_values, values])
+            self._context_seconds = np.concatenate([self._context_seconds, seconds])
+        self.nr_frames_processed += len(values)
+
+        # a frame is confirmed once the n_neighbors frames after it have been received
+        self._confirm_peaks(self.nr_frames_processed - self.n_neighbors)
+        self._trim_context()
+
+    def finalize(self) -> pd.DataFrame:
+        """
+        Confirm the peaks of the last frames, as the recording has ended, and get the features
+
+        Returns:
+            pd.DataFrame: The summary DataFrame with the activity features of each cell
+
+        Raises:
+            ValueError: If no frame was left after ignoring the first ones, or no cell passed the filters,
+                as `ActivityProcessor.run` does for empty data
+        """
+        if self.nr_frames_processed == 0 or not self.is_kept.any():
+            error = ValueError("Data must not be empty")
+            logging.error(error)
+            raise error
+        if not self.is_finalized and self._context_values is not None:
+            self._confirm_peaks(self.nr_frames_processed)
+            self._context_values, self._context_seconds = None, None
+        self.is_finalized = True
+        return self.features
+
+    @property
+    def features(self) -> pd.DataFrame:
+        """
+        The features of the peaks confirmed so far, with the same layout as `ActivityProcessor.run`
+        """
+        if self.batch is None:
+            error = ValueError("No frames were processed")
+            logging.error(error)
+            raise error
+        summary_df = ActivityProcessor._batch_to_summary_df(self.batch)
+        return self.activity_processor._to_output_dtypes(summary_df[self.is_kept].sort_index())
+
+    def _prepare_block(self, block: pd.DataFrame) -> pd.DataFrame:
+        """
+        Set the time index, drop the frames column and the frames to be ignored at the start of the recording
+        """
+        block = block.copy()
+        self.cell_population_activity.set_time_column_as_index(block)
+        self.cell_population_activity.drop_frames_column(block)
+        if self.columns is None:
+            self.columns = block.columns
+            self.batch = CellActivityBatch.inactive(self.columns)
+            self.is_kept = np.ones(len(self.columns), dtype=bool)
+        elif not block.columns.equals(self.columns):
+            error = ValueError("All blocks must have the same columns")
+            logging.error(error)
+            raise error
+
+        first_frame = self.nr_frames_received
+        self.nr_frames_received += len(block)
+        if self.cell_population_activity.ignore_peaks_before_criteria.lower() == "samples":
+            nr_frames_to_ignore = max(0, min(len(block), self.cell_population_activity.ignore_peaks_before - first_frame))
+            return block.iloc[nr_frames_to_ignore:]
+        threshold_time = self.cell_population_activity._get_time_threshold(self.cell_population_activity.ignore_peaks_before)
+        return block[block.index >= threshold_time]
+
+    def _apply_filters(self, values: np.ndarray) -> None:
+        """
+        Update which columns pass the filters, with the same rules as `CellPopulationActivity.apply_filters`,
+        as the statistics of the filters are accumulated over the blocks
+        """
+        self.is_kept = self.value_filters.get_mask(values)
+
+    def _confirm_peaks(self, end: int) -> None:
+        """
+        Detect the peaks among the frames not yet confirmed, up to `end` (excluded), and add them to the features
+        """
+        start = self._next_unconfirmed
+        if end <= start:
+            return
+        is_peak = self.activity_processor.get_local_maxima_per_population(
+            self._context_values, self.n_neighbors, self.activity_processor.threshold, detector=self.activity_processor.detector
+        )
+        idx_samples, idx_cells = np.nonzero(is_peak[start - self._context_start:end - self._context_start])
+        idx_samples += start - self._context_start
+        confirmed = CellActivityBatch.from_peak_indices(
+            self.columns, idx_samples, idx_cells, self._context_values[idx_samples, idx_cells], self._context_seconds
+        )
+        self.batch = self.batch.combine(confirmed)
+        self._next_unconfirmed = end
+
+    def _trim_context(self) -> None:
+        """
+        Keep only the frames needed to confirm the next peaks: the unconfirmed frames and the n_neighbors before them
+        """
+        context_start = max(self._context_start, self._next_unconfirmed - self.n_neighbors)
+        # copied so the rest of the last block can be released
+        self._context_values = self._context_values[context_start - self._context_start:].copy()
+        self._context_seconds = self._context_seconds[context_start - self._context_start:].copy()
+        self._context_start = context_start
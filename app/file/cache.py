@@ -0,0 +1,183 @@
+import numpy as np
+import pandas as pd
+
+import os
+import hashlib
+import logging
+from urllib.parse import quote
+
+from app.file.tables import READER_VERSION
+from app.file.compression import open_input, is_compressed, get_uncompressed_file_path
+
+
+# load logging level from environment variable
+log_level = os.getenv("LOG_LEVEL", "INFO")
+logging.basicConfig(format='%(asctime)s - %(levelname)s - %(module)s - %(lineno)d - %(message)s', level=log_level, handlers=[logging.StreamHandler(), logging.FileHandler(f"{__name__}.log")])
+
+
+def get_content_hash(file_path: str = None, raw_bytes: bytes = None, block_size: int = 1 << 20) -> str:
+    """
+    Get the SHA-256 hash of the contents of a file, read in blocks. Compressed files are hashed by their
+    uncompressed contents
+
+    Args:
+        file_path (str): The path to the file
+        raw_bytes (bytes): The contents of the file, used instead of reading the file if provided
+        block_size (int): The number of bytes read at a time
+
+    Returns:
+        str: The hexadecimal hash
+    """
+    if raw_bytes is not None and not is_compressed(file_path or ""):
+        return hashlib.sha256(raw_bytes).hexdigest()
+    content_hash = hashlib.sha256()
+    with open_input(file_path, raw_bytes) as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            content_hash.update(block)
+    return content_hash.hexdigest()
+
+
+class ParsedInputCache:
+    """
+    On-disk cache of the DataFrames read from files, so that a file is only parsed and cleaned once.
+    Entries are keyed by the hash of the contents of the file and the version of the reader, and
+    hold the values of the columns of each dtype, in that dtype, and the names of the columns in a `.npz` file.
+    When the entries exceed the size limit, the least recently used ones are evicted.
+    """
+    def __init__(self, directory: str, size_limit: int = 1 << 30, reader_version: int = READER_VERSION):
+        """
+        Args:
+            directory (str): The directory of the entries, created if it does not exist
+            size_limit (int): The maximum total size of the entries, in bytes
+            reader_version (int): The version of the reader, so entries of a previous reader are not used
+        """
+        self.directory = directory
+        self.size_limit = size_limit
+        self.reader_version = reader_version
+        os.makedirs(directory, exist_ok=True)
+
+    def get_key(self, file_path: str, raw_bytes: bytes = None) -> str:
+        """
+        Get the key of the entry of a file: the hash of its contents, the version of the reader and
+        the extension of the file, as the same contents are read differently as csv or Excel. A compressed
+        file has the same key as the file it contains
+        """
+        extension = os.path.splitext(get_uncompressed_file_path(file_path))[1].lstrip(".").lower()
+        return f"{get_content_hash(file_path, raw_bytes)}_v{self.reader_version}_{extension}"
+
+    def get_sheet_key(self, key: str, sheet_name: str) -> str:
+        """
+        Get the key of the entry of a sheet of a workbook, from the key of the workbook, see `get_key`
+        """
+        return f"{key}_{quote(sheet_name, safe='')}"
+
+    def contains(self, key: str) -> bool:
+        """
+        Whether there is an entry for a key, without loading it
+        """
+        return os.path.exists(self._get_entry_path(key))
+
+    def _get_entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def load(self, key: str) -> pd.DataFrame:
+        """
+        Load the DataFrame of an entry, marking it as recently used
+
+        Args:
+            key (str): The key of the entry, see `get_key`
+
+        Returns:
+            pd.DataFrame: The DataFrame, or None if there is no entry for the key
+        """
+        entry_path = self._get_entry_path(key)
+        try:
+            with np.load(entry_path, allow_pickle=False) as entry:
+                df = self._entry_to_df(entry)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            # a corrupted or incompatible entry is read again from the file
+            logging.warning(f"Could not load cache entry {entry_path}: {e}")
+            return None
+        # the modification time tracks the last use, for the eviction
+        os.utime(entry_path)
+        logging.info(f"Loaded cache entry {entry_path}")
+        return df
+
+    def store(self, key: str, df: pd.DataFrame) -> None:
+        """
+        Store the DataFrame read from a file and evict the least recently used entries beyond the size limit.
+        DataFrames without a time column are not stored
+
+        Args:
+            key (str): The key of the entry, see `get_key`
+            df (pd.DataFrame): The DataFrame, as returned by `read_from_file`
+        """
+        if not any(isinstance(column, str) and "time" in column.lower() for column in df.columns):
+            logging.warning("Not caching a DataFrame without a time column")
+            return
+        entry_path = self._get_entry_path(key)
+        # written to a temporary file first, so that a concurrent reader never sees a partial entry
+        temporary_path = f"{entry_path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as file:
+            np.savez(file, **self._df_to_entry(df))
+        os.replace(temporary_path, entry_path)
+        logging.info(f"Stored cache entry {entry_path}")
+        self.evict(keep=key)
+
+    def evict(self, keep: str = None) -> None:
+        """
+        Remove the least recently used entries until the total size is within the size limit
+
+        Args:
+            keep (str): The key of an entry which is not removed, e.g. the one just stored, even if it is
+                larger than the size limit on its own
+        """
+        keep_file_name = None if keep is None else os.path.basename(self._get_entry_path(keep))
+        entries = []
+        for file_name in os.listdir(self.directory):
+            if file_name.endswith(".npz"):
+                entry_stat = os.stat(os.path.join(self.directory, file_name))
+                entries.append((entry_stat.st_mtime, entry_stat.st_size, file_name))
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, file_name in sorted(entries):
+            if total_size <= self.size_limit:
+                break
+            if file_name == keep_file_name:
+                continue
+            try:
+                os.remove(os.path.join(self.directory, file_name))
+            except FileNotFoundError:
+                pass
+            total_size -= size
+            logging.info(f"Evicted cache entry {file_name}")
+
+    @staticmethod
+    def _df_to_entry(df: pd.DataFrame) -> dict:
+        # the columns of each dtype are stored as a block of that dtype, so that large integers are not rounded
+        dtypes = df.dtypes.to_numpy()
+        entry = {
+            # columns without header are named NaN
+            "columns": np.array(["" if pd.isna(column) else str(column) for column in df.columns]),
+            "is_named": np.array([not pd.isna(column) for column in df.columns]),
+            "index": df.index.to_numpy(dtype=np.int64),
+            "header_label": np.array(-1 if df.columns.name is None else df.columns.name),
+        }
+        for block, dtype in enumerate(dict.fromkeys(dtypes)):
+            positions = np.flatnonzero(dtypes == dtype)
+            entry[f"positions_{block}"] = positions
+            entry[f"values_{block}"] = df.iloc[:, positions].to_numpy(dtype=dtype)
+        return entry
+
+    @staticmethod
+    def _entry_to_df(entry) -> pd.DataFrame:
+        columns = [column if is_named else np.nan for column, is_named in zip(entry["columns"].tolist(), entry["is_named"])]
+        header_label = int(entry["header_label"])
+        blocks = [
+            pd.DataFrame(entry[f"values_{block}"], index=entry["index"], columns=entry[f"positions_{block}"])
+            for block in range(sum(key.startswith("values_") for key in entry.files))
+        ]
+        df = pd.concat(blocks, axis=1)[list(range(len(columns)))]
+        df.columns = pd.Index(columns, name=None if header_label < 0 else header_label)
+        return df
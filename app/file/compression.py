@@ -0,0 +1,101 @@
+import os
+import bz2
+import gzip
+import lzma
+import logging
+import zipfile
+from io import BytesIO
+
+
+# load logging level from environment variable
+log_level = os.getenv("LOG_LEVEL", "INFO")
+logging.basicConfig(format='%(asctime)s - %(levelname)s - %(module)s - %(lineno)d - %(message)s', level=log_level, handlers=[logging.StreamHandler(), logging.FileHandler(f"{__name__}.log")])
+
+COMPRESSION_EXTENSIONS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+ZIP_EXTENSION = ".zip"
+# separates the path of a zip archive from the name of a file inside it, e.g. "recordings.zip/day1.csv"
+ZIP_MEMBER_SEPARATOR = "/"
+
+
+def get_uncompressed_file_path(file_path: str) -> str:
+    """
+    Get the path of a file without its compression extension, e.g. "recording.csv" for "recording.csv.gz"
+    """
+    file_name, file_extension = os.path.splitext(file_path)
+    if file_extension.lower() in COMPRESSION_EXTENSIONS:
+        return file_name
+    return file_path
+
+
+def split_zip_member_path(file_path: str):
+    """
+    Split the path of a file inside a zip archive into the path of the archive and the name of the file
+
+    Returns:
+        tuple: The path of the archive and the name of the file, or (None, None) if the file is not inside an archive
+    """
+    position = file_path.lower().find(ZIP_EXTENSION + ZIP_MEMBER_SEPARATOR)
+    while position >= 0:
+        zip_path = file_path[:position + len(ZIP_EXTENSION)]
+        if os.path.isfile(zip_path):
+            return zip_path, file_path[position + len(ZIP_EXTENSION) + len(ZIP_MEMBER_SEPARATOR):]
+        position = file_path.lower().find(ZIP_EXTENSION + ZIP_MEMBER_SEPARATOR, position + 1)
+    return None, None
+
+
+def get_zip_member_path(zip_path: str, member_name: str) -> str:
+    return f"{zip_path}{ZIP_MEMBER_SEPARATOR}{member_name}"
+
+
+def is_compressed(file_path: str) -> bool:
+    """
+    Check if a file is compressed or inside a zip archive, so it can only be read as a stream
+    """
+    return get_uncompressed_file_path(file_path) != file_path or split_zip_member_path(file_path)[0] is not None
+
+
+def input_exists(file_path: str) -> bool:
+    """
+    Check if a file exists, including files inside zip archives
+    """
+    zip_path, member_name = split_zip_member_path(file_path)
+    if zip_path is None:
+        return os.path.exists(file_path)
+    with zipfile.ZipFile(zip_path) as archive:
+        return member_name in archive.namelist()
+
+
+def open_input(file_path: str, raw_bytes: bytes = None):
+    """
+    Open a file, or its contents, in binary mode, decompressing it as it is read. Nothing is
+    extracted to disk, including for files inside zip archives
+
+    Args:
+        file_path (str): The path to the file, possibly compressed or inside a zip archive
+        raw_bytes (bytes): The contents of the file, used instead of reading the file if provided
+
+    Returns:
+        The binary stream of the uncompressed contents
+    """
+    if raw_bytes is not None:
+        stream = BytesIO(raw_bytes)
+    else:
+        zip_path, member_name = split_zip_member_path(file_path)
+        if zip_path is None:
+            stream = open(file_path, "rb")
+        else:
+            # the member keeps the archive file open until the member is closed
+            with zipfile.ZipFile(zip_path) as archive:
+                stream = archive.open(member_name)
+    file_extension = os.path.splitext(file_path)[1].lower()
+    if file_extension in COMPRESSION_EXTENSIONS:
+        return COMPRESSION_EXTENSIONS[file_extension](stream, "rb")
+    return stream
+
+
+def list_zip_members(zip_path: str) -> list:
+    """
+    List the paths of the files inside a zip archive, as given to `open_input`. Directories are not listed
+    """
+    with zipfile.ZipFile(zip_path) as archive:
+        return [get_zip_member_path(zip_path, member.filename) for member in archive.infolist() if not member.is_dir()]
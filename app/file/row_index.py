@@ -0,0 +1,193 @@
+import numpy as np
+
+import os
+import logging
+
+
+# load logging level from environment variable
+log_level = os.getenv("LOG_LEVEL", "INFO")
+logging.basicConfig(format='%(asctime)s - %(levelname)s - %(module)s - %(lineno)d - %(message)s', level=log_level, handlers=[logging.StreamHandler(), logging.FileHandler(f"{__name__}.log")])
+
+ROW_INDEX_SUFFIX = ".rowindex.npz"
+
+
+def get_row_index_path(file_path: str) -> str:
+    return f"{file_path}{ROW_INDEX_SUFFIX}"
+
+
+def _parse_time(field: bytes) -> float:
+    try:
+        return float(field.strip().strip(b'"'))
+    except ValueError:
+        return np.nan
+
+
+class CsvRowIndex:
+    """
+    Byte offset, label and time of every Kth row after the header of a csv file, so that the rows
+    covering a time range can be read by seeking to them instead of parsing the file from the top.
+    It is stored next to the file and is no longer valid once the size or the modification time of
+    the file changes. Seeking requires the time to be sorted, which is checked while building it.
+    """
+    def __init__(self, file_size: int, file_mtime_ns: int, every: int, time_position: int, data_offset: int, data_label: int,
+                 offsets: np.ndarray, labels: np.ndarray, times: np.ndarray, is_sorted: bool):
+        """
+        Args:
+            file_size (int): The size of the file, in bytes, when the index was built
+            file_mtime_ns (int): The modification time of the file, in nanoseconds, when the index was built
+            every (int): The number of rows between two indexed rows
+            time_position (int): The position of the time column
+            data_offset (int): The byte offset of the line after the header
+            data_label (int): The label of the first row after the header, as in `read_from_file`
+            offsets (np.ndarray): The byte offset of each indexed row
+            labels (np.ndarray): The label of each indexed row, as in `read_from_file`
+            times (np.ndarray): The time of each indexed row
+            is_sorted (bool): Whether the time of all rows is sorted
+        """
+        self.file_size = file_size
+        self.file_mtime_ns = file_mtime_ns
+        self.every = every
+        self.time_position = time_position
+        self.data_offset = data_offset
+        self.data_label = data_label
+        self.offsets = offsets
+        self.labels = labels
+        self.times = times
+        self.is_sorted = is_sorted
+
+    @classmethod
+    def build(cls, file_path: str, every: int = 1000) -> "CsvRowIndex":
+        """
+        Build the index of a csv file, reading it once
+
+        Args:
+            file_path (str): The path to the file
+            every (int): The number of rows between two indexed rows
+
+        Returns:
+            CsvRowIndex: The index
+
+        Raises:
+            ValueError: If a row after the header has a quoted value
+        """
+        # imported here, as read_from_file uses the index
+        from app.file.tables import _open_csv, find_header_row_in_csv, get_time_column_position
+
+        file_stat = os.stat(file_path)
+        with _open_csv(file_path) as file:
+            header_row_index, header, _ = find_header_row_in_csv(file)
+        time_position = get_time_column_position(header)
+
+        offsets, labels, times = [], [], []
+        is_sorted, last_time = True, -np.inf
+        # rows are labelled as when reading the whole file, where blank lines are skipped
+        offset, label, data_offset, data_label = 0, 0, None, None
+        with open(file_path, "rb") as file:
+            for line_number, line in enumerate(file):
+                is_blank = line.strip(b"\r\n") == b""
+                if line_number == header_row_index + 1:
+                    data_offset, data_label = offset, label
+                if line_number > header_row_index and not is_blank:
+                    # a quoted value may hold separators or line breaks, so the line is not split into its values
+                    if b'"' in line:
+                        error = ValueError(f"Rows of {file_path} have quoted values, so they cannot be indexed")
+                        logging.error(error)
+                        raise error
+                    fields = line.split(b",")
+                    time = _parse_time(fields[time_position]) if time_position < len(fields) else np.nan
+                    if not np.isnan(time):
+                        is_sorted = is_sorted and time >= last_time
+                        last_time = time
+                        if (label - data_label) % every == 0:
+                            offsets.append(offset)
+                            labels.append(label)
+                            times.append(time)
+                if not is_blank:
+                    label += 1
+                offset += len(line)
+        if data_offset is None:
+            data_offset, data_label = offset, label
+        if not is_sorted:
+            logging.warning(f"The time of {file_path} is not sorted, so time ranges are read without the row index")
+
+        logging.info(f"Row index of {file_path} built with {len(offsets)} rows")
+        return cls(
+            file_stat.st_size, file_stat.st_mtime_ns, every, time_position, data_offset, data_label,
+            np.array(offsets, dtype=np.int64), np.array(labels, dtype=np.int64), np.array(times, dtype=np.float64), is_sorted
+        )
+
+    def save(self, file_path: str) -> None:
+        """
+        Store the index next to the file it was built from
+        """
+        with open(get_row_index_path(file_path), "wb") as file:
+            np.savez(file, **self.__dict__)
+
+    @classmethod
+    def load(cls, file_path: str) -> "CsvRowIndex":
+        """
+        Load the index stored next to a file
+
+        Returns:
+            CsvRowIndex: The index, or None if there is none or the file changed after it was built
+        """
+        row_index_path = get_row_index_path(file_path)
+        if not os.path.exists(row_index_path) or not os.path.exists(file_path):
+            return None
+        try:
+            with np.load(row_index_path, allow_pickle=False) as stored:
+                row_index = cls(**{key: stored[key] if stored[key].ndim else stored[key].item() for key in stored.files})
+        except Exception as e:
+            logging.warning(f"Could not load row index {row_index_path}: {e}")
+            return None
+        if not row_index.is_valid_for(file_path):
+            logging.info(f"Row index {row_index_path} is outdated")
+            return None
+        return row_index
+
+    def is_valid_for(self, file_path: str) -> bool:
+        file_stat = os.stat(file_path)
+        return file_stat.st_size == self.file_size and file_stat.st_mtime_ns == self.file_mtime_ns
+
+    def get_byte_range(self, time_range: tuple):
+        """
+        Get the bytes of the file which cover a time range
+
+        Args:
+            time_range (tuple): The first and last time, both included. Either can be None
+
+        Returns:
+            int: The byte offset to start reading at
+            int: The byte offset to stop reading at, or None to read until the end of the file
+            int: The label of the first row read
+        """
+        start, end = time_range
+        # the last indexed row before the start, as rows before it have a time before the start
+        first = np.searchsorted(self.times, start, side="left") - 1 if start is not None else -1
+        # the first indexed row after the end, as rows from it on have a time after the end
+        last = np.searchsorted(self.times, end, side="right") if end is not None else len(self.times)
+        start_offset, first_label = (self.offsets[first], self.labels[first]) if first >= 0 else (self.data_offset, self.data_label)
+        end_offset = self.offsets[last] if last < len(self.offsets) else None
+        return int(start_offset), None if end_offset is None else int(end_offset), int(first_label)
+
+
+def load_or_build_csv_row_index(file_path: str, every: int = 1000) -> CsvRowIndex:
+    """
+    Load the row index stored next to a csv file, or build and store it if there is none or it is outdated
+
+    Args:
+        file_path (str): The path to the file
+        every (int): The number of rows between two indexed rows, when building the index
+
+    Returns:
+        CsvRowIndex: The index, or None if the file cannot be indexed, in which case time ranges are read without it
+    """
+    row_index = CsvRowIndex.load(file_path)
+    if row_index is None:
+        try:
+            row_index = CsvRowIndex.build(file_path, every=every)
+        except ValueError as e:
+            logging.warning(f"No row index for {file_path}: {e}")
+            return None
+        row_index.save(file_path)
+    return row_index
@@ -1,10 +1,24 @@
+import numpy as np
 import pandas as pd
+import openpyxl
 
 import os
+import re
+import csv
 import logging
 import datetime
-from io import BytesIO
+from io import BytesIO, TextIOWrapper
 
+from app.file.traces import TraceStore, TRACE_STORE_EXTENSION
+from app.file.row_index import CsvRowIndex
+from app.file.compression import get_uncompressed_file_path, is_compressed, input_exists, open_input, list_zip_members, ZIP_EXTENSION
+
+
+SUPPORTED_FILE_EXTENSIONS = (".csv", ".xlsx", TRACE_STORE_EXTENSION)
+SUPPORTED_PRECISIONS = ("float64", "float32")
+
+# version of the reader, to be increased when the DataFrame read from a file changes, so cached ones are not used
+READER_VERSION = 2
 
 # load logging level from environment variable
 log_level = os.getenv("LOG_LEVEL", "INFO")
@@ -27,43 +41,209 @@ def read_file_using_function(file_path: str, read_function: callable, raw_bytes:
     
     return read_function(file_path, index_col=None, header=None)
 
-def post_clean_df(df: pd.DataFrame) -> pd.DataFrame:
+def _to_numeric_or_none(column: pd.Series) -> pd.Series:
+    """
+    Convert a column to numeric, or get None if it is not numeric
+    """
+    try:
+        return pd.to_numeric(column)
+    except ValueError:
+        return None
+    except TypeError as e:
+        logging.error(e)
+        raise e
+
+# types of the values of a block, as inferred by pandas, which cannot be bools
+BLOCK_CONVERTIBLE_TYPES = ("string", "integer", "floating", "mixed-integer-float", "decimal", "empty")
+
+def _block_to_numeric(values: np.ndarray):
+    """
+    Convert a block of object columns to numeric at once
+
+    Args:
+        values (np.ndarray): 2D object array where each column is a column of the DataFrame
+
+    Returns:
+        np.ndarray: The converted block, where values which are not numeric are NaN
+        np.ndarray: Whether each column must be converted on its own to get the same result as `pd.to_numeric`,
+            as it may not be numeric or may be converted to another type than the block
     """
-    Clean a DataFrame by dropping rows and columns with all NaN values
+    flat_values = pd.Series(values.ravel(), dtype=object)
+    # bools are converted to integers with the other values of a block, but `pd.to_numeric` keeps a column
+    # of bools as it is, so blocks which may have bools, e.g. read by openpyxl, are converted column by column
+    if pd.api.types.infer_dtype(flat_values, skipna=True) not in BLOCK_CONVERTIBLE_TYPES:
+        return None, np.ones(values.shape[1], dtype=bool)
+    try:
+        converted = pd.to_numeric(flat_values)
+    except (ValueError, TypeError):
+        converted = pd.to_numeric(flat_values, errors="coerce")
+    if converted.dtype == np.int64:
+        # as all values are integers, so is each column
+        return converted.to_numpy().reshape(values.shape), np.zeros(values.shape[1], dtype=bool)
+    if converted.dtype != np.float64:
+        return None, np.ones(values.shape[1], dtype=bool)
+    converted = converted.to_numpy().reshape(values.shape)
+    is_nan = np.isnan(converted)
+    # a value converted to NaN without being missing may not be numeric, e.g. text
+    maybe_non_numeric = is_nan.any(axis=0)
+    maybe_non_numeric[maybe_non_numeric] = (is_nan[:, maybe_non_numeric] & pd.notna(values[:, maybe_non_numeric])).any(axis=0)
+    # a column of whole numbers without missing values may be converted to integers
+    maybe_integer = ~is_nan.any(axis=0) & (converted == np.trunc(converted)).all(axis=0)
+    return converted, maybe_non_numeric | maybe_integer
+
+def post_clean_df(df: pd.DataFrame, block_size: int = 256) -> pd.DataFrame:
+    """
+    Clean a DataFrame by converting its columns to numeric and dropping the columns which are not numeric.
+    The object columns are converted in blocks, and only the columns of a block which may not be numeric
+    or may be integers are converted one by one, so the result is the same as `pd.to_numeric` on each column
 
     Args:
         df (pd.DataFrame): The DataFrame to be cleaned
+        block_size (int): The number of columns converted at once
 
     Returns:
         pd.DataFrame: The cleaned DataFrame
     """
-    # try to convert to numeric all columns
-    for col in df.columns:
-        try:
-            df[col] = pd.to_numeric(df[col])
-        except ValueError:
-            df = df.drop(columns=col)
-        except TypeError as e:
-            logging.error(e)
-            raise e
+    is_object = (df.dtypes == object).to_numpy()
+    columns = {}
+    for start in range(0, df.shape[1], block_size):
+        positions = np.arange(start, min(start + block_size, df.shape[1]))
+        object_positions = positions[is_object[positions]]
+        converted, is_converted_alone = _block_to_numeric(df.iloc[:, object_positions].to_numpy())
+        block_columns = dict(zip(object_positions, converted.T)) if converted is not None else {}
+        # the columns which are not of type object are converted on their own
+        for position in np.concatenate([positions[~is_object[positions]], object_positions[is_converted_alone]]):
+            column = _to_numeric_or_none(df.iloc[:, position])
+            if column is None:
+                block_columns.pop(position, None)
+            else:
+                block_columns[position] = column.array
+        columns.update(sorted(block_columns.items()))
+
+    cleaned_df = pd.DataFrame(columns, index=df.index)
+    cleaned_df.columns = df.columns[list(columns)]
+    return cleaned_df
+
+def to_precision(df: pd.DataFrame, precision: str = "float64") -> pd.DataFrame:
+    """
+    Convert the float columns of a DataFrame which are more precise than a precision, e.g. float64 columns
+    to float32. The time column is kept as it is, as float32 cannot tell apart the samples of long recordings.
+    Columns are converted one at a time, so only one column is held twice
+
+    Args:
+        df (pd.DataFrame): The DataFrame to convert
+        precision (str): The precision of the values, either "float64" or "float32"
+
+    Returns:
+        pd.DataFrame: The converted DataFrame
+    """
+    if precision not in SUPPORTED_PRECISIONS:
+        e = ValueError(f"Precision must be one of {SUPPORTED_PRECISIONS}")
+        logging.error(e)
+        raise e
+    dtype = np.dtype(precision)
+    positions = [
+        position for position, (column, column_dtype) in enumerate(zip(df.columns, df.dtypes))
+        if np.issubdtype(column_dtype, np.floating) and column_dtype.itemsize > dtype.itemsize
+        and not (isinstance(column, str) and "time" in column.lower())
+    ]
+    if not positions:
+        return df
+    df = df.copy(deep=False)
+    for position in positions:
+        df.isetitem(position, df.iloc[:, position].astype(dtype))
     return df
 
-def read_from_file(file_path: str, raw_bytes: bytes = None) -> pd.DataFrame:
+def read_from_file(file_path: str, raw_bytes: bytes = None, drop_frames_column: bool = False, cells = None, time_range: tuple = None, cache = None, precision: str = None) -> pd.DataFrame:
     """
     Read a pandas DataFrame from a file
 
     Args:
         file_path (str): The path to the file
+        raw_bytes (bytes): The contents of the file, used instead of reading the file if provided
+        drop_frames_column (bool): Whether to drop the columns containing "frame" while reading
+        cells (str or list): The cells to read, as a regular expression or a list of names. If None, all cells are read
+        time_range (tuple): The first and last time to read, in the unit of the time column. Either can be None
+        cache (ParsedInputCache): If provided, the whole file is read from the cache, or read and stored in it,
+            and the cells and time range are then selected
+        precision (str): If provided, the values of the cells are converted to this precision, see `to_precision`.
+            The cache stores the values as read, so it does not depend on the precision
 
     Returns:
         pd.DataFrame: The read DataFrame
     """
     # check if file exists
-    if raw_bytes is None and not os.path.exists(file_path):
+    if raw_bytes is None and not input_exists(file_path):
         e = FileNotFoundError(f"File not found: {file_path}")
         logging.error(e)
         raise e
+    # compressed files are read as the file they contain
+    uncompressed_file_path = get_uncompressed_file_path(file_path)
+    if cache is not None and not file_path.endswith(TRACE_STORE_EXTENSION):
+        key = cache.get_key(file_path, raw_bytes)
+        df = cache.load(key)
+        if df is None:
+            df = read_from_file(file_path, raw_bytes=raw_bytes)
+            cache.store(key, df)
+        df = select_cells_and_time_range(df, cells, time_range)
+    elif uncompressed_file_path.endswith(".csv"):
+        try:
+            # a row index stored next to the file is used to seek to the time range
+            row_index = CsvRowIndex.load(file_path) if time_range is not None and raw_bytes is None and not is_compressed(file_path) else None
+            df = read_csv_with_header_sniffing(file_path, raw_bytes=raw_bytes, drop_frames_column=drop_frames_column, cells=cells, time_range=time_range, row_index=row_index)
+        except HeaderNotFoundError:
+            # the header is further down the file, search it in the whole file instead
+            logging.info(f"Header not found in the first rows of {file_path}, reading the whole file as text")
+            df = select_cells_and_time_range(_read_from_file_as_text(file_path, raw_bytes=raw_bytes), cells, time_range)
+        except pd.errors.ParserError:
+            # a row has more values than the first row after the header, which sets the number of columns
+            logging.info(f"Rows of {file_path} have more values than the first one, reading the whole file as text")
+            df = select_cells_and_time_range(_read_from_file_as_text(file_path, raw_bytes=raw_bytes), cells, time_range)
+        except Exception as e:
+            logging.error(f"Could not read file {file_path}")
+            logging.error(e)
+            raise e
+    elif file_path.endswith(TRACE_STORE_EXTENSION):
+        if raw_bytes is not None:
+            e = ValueError(f"Trace stores are memory-mapped, so they can only be read from a file: {file_path}")
+            logging.error(e)
+            raise e
+        trace_store = TraceStore(file_path)
+        df = trace_store.to_df(None if cells is None else [cell for cell in trace_store.cells if is_selected_column(cell, cells)])
+        df = select_cells_and_time_range(df, time_range=time_range)
+    elif uncompressed_file_path.endswith(".xlsx"):
+        try:
+            workbook = _open_excel(file_path, raw_bytes)
+            try:
+                df = read_excel_sheet(workbook.worksheets[0])
+            finally:
+                workbook.close()
+        except Exception as e:
+            logging.error(f"Could not read file {file_path}")
+            logging.error(e)
+            raise e
+        df = select_cells_and_time_range(df, cells, time_range)
+    else:
+        df = select_cells_and_time_range(_read_from_file_as_text(file_path, raw_bytes=raw_bytes), cells, time_range)
+    if drop_frames_column:
+        df = df.drop(columns=[column for column in df.columns if isinstance(column, str) and "frame" in column.lower()])
+
+    if df.empty:
+        e = ValueError(f"DataFrame is empty: {file_path}")
+        logging.error(e)
+        raise e
+    return df if precision is None else to_precision(df, precision)
+
+def _read_from_file_as_text(file_path: str, raw_bytes: bytes = None) -> pd.DataFrame:
+    """
+    Read a file without header, so that all values are read as text, then find the header and
+    convert the columns to numeric
+    """
     try:
+        if is_compressed(file_path):
+            with open_input(file_path, raw_bytes) as stream:
+                raw_bytes = stream.read()
+        file_path = get_uncompressed_file_path(file_path)
         if file_path.endswith(".csv"):
             df = read_file_using_function(file_path, pd.read_csv, raw_bytes=raw_bytes)
         elif file_path.endswith(".xlsx"):
@@ -86,11 +266,6 @@ def read_from_file(file_path: str, raw_bytes: bytes = None) -> pd.DataFrame:
         logging.error(f"Could not clean DataFrame from file {file_path}")
         logging.error(e)
         raise e
-    
-    if df.empty:
-        e = ValueError(f"DataFrame is empty: {file_path}")
-        logging.error(e)
-        raise e
     return df
    
    
@@ -121,6 +296,560 @@ def find_and_set_header(df: pd.DataFrame) -> pd.DataFrame:
     df = df.drop(header_index)
     return df
 
+class HeaderNotFoundError(ValueError):
+    """
+    Raised when no header is found in the scanned rows of a file
+    """
+    pass
+
+def find_header_row_in_csv(file, max_rows: int = 100):
+    """
+    Find the header of a csv file by scanning only its first rows: the header is the first row
+    where "time" can be found (partially or fully)
+
+    Args:
+        file: The opened csv file (text mode), positioned at its start
+        max_rows (int): The maximum number of rows to scan
+
+    Returns:
+        int: The position of the header row
+        list: The values of the header row
+        list: The rows before the header row
+    """
+    rows_before_header = []
+    for row_index, row in enumerate(csv.reader(file)):
+        if row_index >= max_rows:
+            break
+        if any("time" in value.lower() for value in row):
+            return row_index, row, rows_before_header
+        rows_before_header.append(row)
+    e = HeaderNotFoundError(f"Header with a time column not found in the first {max_rows} rows")
+    logging.error(e)
+    raise e
+
+def coerce_to_numeric(df: pd.DataFrame):
+    """
+    Convert all columns of a DataFrame to numeric, replacing the values which cannot be converted by NaN
+
+    Args:
+        df (pd.DataFrame): The DataFrame to convert
+
+    Returns:
+        pd.DataFrame: The converted DataFrame
+        list: The columns where some value could not be converted
+    """
+    non_numeric_columns = []
+    for col in df.columns:
+        numeric_column = pd.to_numeric(df[col], errors="coerce")
+        if (numeric_column.isna() & df[col].notna()).any():
+            non_numeric_columns.append(col)
+        df[col] = numeric_column
+    return df, non_numeric_columns
+
+def _open_csv(file_path: str, raw_bytes: bytes = None):
+    """
+    Open a csv file, or its contents, in text mode, decompressing it as it is read
+    """
+    return TextIOWrapper(open_input(file_path, raw_bytes), encoding="utf-8-sig", newline="")
+
+# a line without any value, i.e. only separators and whitespace
+EMPTY_LINE_PATTERN = re.compile(r"^[ \t\r,]*$", re.MULTILINE)
+
+class _CsvDataLines:
+    """
+    Text stream of the lines of a csv file after its header, without the lines which have no value, so that
+    pandas infers the type of the columns from the rows with values only, as when the whole file is read as
+    text and these rows are dropped before the conversion to numeric. Blocks without such lines are passed
+    on as they are, and the removed lines which hold separators, and so would have been rows, are counted
+    to label the parsed rows as when reading the whole file.
+    """
+    def __init__(self, file, skip_lines: int = 0, block_size: int = 1 << 20):
+        """
+        Args:
+            file: The opened csv file (text mode), positioned at its start
+            skip_lines (int): The number of lines to skip, e.g. the header and the lines before it
+            block_size (int): The number of characters read from the file at once
+        """
+        self.file = file
+        self.block_size = block_size
+        for _ in range(skip_lines):
+            self.file.readline()
+        self._remainder = ""
+        self._nr_rows = 0
+        # the number of rows passed on before each removed row
+        self._removed_rows = []
+
+    def read(self, size: int = -1) -> str:
+        # an empty string ends the file, so blocks are read until one has a line with a value
+        while True:
+            text = self._read_lines()
+            if not text:
+                return ""
+            text = self._drop_empty_lines(text)
+            if text:
+                return text
+
+    def _read_lines(self) -> str:
+        # blocks end at a line end, so lines are filtered whole
+        while True:
+            block = self.file.read(self.block_size)
+            text = self._remainder + block
+            if not block:
+                self._remainder = ""
+                return text
+            end = text.rfind("\n") + 1
+            text, self._remainder = text[:end], text[end:]
+            if text:
+                return text
+
+    def _drop_empty_lines(self, text: str) -> str:
+        if EMPTY_LINE_PATTERN.search(text, 0, len(text) - 1 if text.endswith("\n") else len(text)) is None:
+            self._nr_rows += text.count("\n") + (not text.endswith("\n"))
+            return text
+        lines = []
+        for line in text.splitlines(keepends=True):
+            if EMPTY_LINE_PATTERN.fullmatch(line.rstrip("\n")) is None:
+                lines.append(line)
+                self._nr_rows += 1
+            elif "," in line:
+                self._removed_rows.append(self._nr_rows)
+        return "".join(lines)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        line = self.read()
+        if not line:
+            raise StopIteration
+        return line
+
+    def get_labels(self, positions) -> np.ndarray:
+        """
+        Get the label of parsed rows, counting the removed rows before them
+
+        Args:
+            positions (array-like): The position of each row in the parsed DataFrame
+
+        Returns:
+            np.ndarray: The label of each row, counting from the first line after the skipped ones
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        return positions + np.searchsorted(self._removed_rows, positions, side="right")
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def read_csv_with_header_sniffing(file_path: str, raw_bytes: bytes = None, max_header_rows: int = 100, drop_frames_column: bool = False, cells = None, time_range: tuple = None, row_index: CsvRowIndex = None) -> pd.DataFrame:
+    """
+    Read a csv file by finding its header in the first rows only, and then parsing the rows after it
+    in a single typed pass, instead of reading every value as text. Gives the same DataFrame as
+    reading the file as text: the rows before the header are kept as data rows, rows and columns
+    without any value are dropped and the non-numeric columns are dropped.
+
+    Cells and rows which are not selected are skipped while parsing: only the time column is parsed
+    in full, to find the rows within the time range. With a row index of the file, only the bytes
+    covering the time range are read instead.
+
+    Args:
+        file_path (str): The path to the file
+        raw_bytes (bytes): The contents of the file, used instead of reading the file if provided
+        max_header_rows (int): The maximum number of rows to scan for the header
+        drop_frames_column (bool): Whether to skip the columns containing "frame" while parsing
+        cells (str or list): The cells to read, see `is_selected_column`. If None, all cells are read
+        time_range (tuple): The first and last time to read, in the unit of the time column. Either can be None
+        row_index (CsvRowIndex): The row index of the file, used to read a time range if the time of the file is sorted
+
+    Returns:
+        pd.DataFrame: The read DataFrame
+
+    Raises:
+        HeaderNotFoundError: If the header is not in the first max_header_rows rows
+    """
+    with _open_csv(file_path, raw_bytes) as file:
+        header_row_index, header, rows_before_header = find_header_row_in_csv(file, max_rows=max_header_rows)
+
+    # rows are labelled as when reading the whole file, where blank lines are skipped
+    rows_before_header = [row for row in rows_before_header if row]
+    header_label = len(rows_before_header)
+    # rows with a value are kept even if it is in a skipped column, as when the column is dropped after reading the file
+    rows_before_header = [(label, row) for label, row in enumerate(rows_before_header) if any(value.strip() for value in row)]
+    is_skipped_column = [
+        (drop_frames_column and "frame" in name.lower()) or not is_selected_column(name if name.strip() else np.nan, cells)
+        for name in header
+    ]
+    # columns beyond the header are only parsed when no column is skipped
+    usecols = [position for position in range(len(header)) if not is_skipped_column[position]] if any(is_skipped_column) else None
+
+    if time_range is not None:
+        time_position = get_time_column_position(header)
+        rows_before_header = [
+            (label, row) for label, row in rows_before_header
+            if time_position < len(row) and is_within_time_range(pd.to_numeric(pd.Series([row[time_position]]), errors="coerce"), time_range).iloc[0]
+        ]
+
+    if time_range is not None and row_index is not None and row_index.is_sorted:
+        body = _read_csv_time_range_with_row_index(file_path, row_index, time_range, usecols)
+    else:
+        first_row, nr_rows = 0, None
+        if time_range is not None:
+            first_row, nr_rows = _get_rows_spanning_time_range(file_path, raw_bytes, header_row_index, time_position, time_range)
+        with _CsvDataLines(_open_csv(file_path, raw_bytes), skip_lines=header_row_index + 1) as lines:
+            try:
+                body = pd.read_csv(lines, header=None, skiprows=first_row, nrows=nr_rows, index_col=None, usecols=usecols) if nr_rows != 0 else pd.DataFrame()
+            except pd.errors.EmptyDataError:
+                body = pd.DataFrame()
+            body.index = lines.get_labels(np.arange(len(body)) + first_row) + header_label + 1
+        if time_range is not None and not body.empty:
+            # the rows between the first and the last row within the time range are out of it if the time is not sorted
+            body = body[is_within_time_range(pd.to_numeric(body[time_position]), time_range)]
+
+    # columns are labelled by their position in the file until the header is set
+    nr_columns = max([len(header), *(body.columns + 1)])
+    positions = [position for position in range(nr_columns) if position >= len(header) or not is_skipped_column[position]]
+    body = body.reindex(columns=positions)
+    if usecols is None:
+        # drop rows which are only NaN, before the non-numeric values are dropped. With skipped columns, the rows
+        # are kept, as the lines without any value are not parsed and the others may have one in a skipped column
+        body = body.dropna(axis=0, how="all")
+    rows_before_header = pd.DataFrame(
+        [[row[position] if position < len(row) and row[position].strip() else None for position in positions] for _, row in rows_before_header],
+        index=[label for label, _ in rows_before_header],
+        columns=positions,
+    )
+    if not rows_before_header.empty:
+        numeric_rows_before_header = rows_before_header.apply(pd.to_numeric, errors="coerce")
+        is_non_numeric = (rows_before_header.notna() & numeric_rows_before_header.isna()).any()
+        non_numeric_positions = set(is_non_numeric.index[is_non_numeric])
+        # an empty body would turn integer columns into float ones
+        df = pd.concat([numeric_rows_before_header, body]) if not body.empty else numeric_rows_before_header
+    else:
+        df = body
+        non_numeric_positions = set()
+
+    # drop columns which are only NaN and have no header
+    names = [header[position] if position < len(header) and header[position].strip() else np.nan for position in positions]
+    is_empty = df.isna().all().to_numpy()
+    keep = [position for position, name, empty in zip(positions, names, is_empty) if not (empty and pd.isna(name))]
+    # the body of a column with a non-numeric value is parsed as text
+    for position in keep:
+        if df[position].dtype == object:
+            try:
+                df[position] = pd.to_numeric(df[position])
+            except ValueError:
+                non_numeric_positions.add(position)
+    keep = [position for position in keep if position not in non_numeric_positions]
+
+    df = df[keep]
+    df.columns = pd.Index([names[positions.index(position)] for position in keep], name=header_label)
+    return df
+
+def _read_csv_time_range_with_row_index(file_path: str, row_index, time_range: tuple, usecols: list) -> pd.DataFrame:
+    """
+    Parse only the bytes of a csv file which cover a time range, found with its row index, and keep
+    the rows within the time range
+    """
+    start_offset, end_offset, first_label = row_index.get_byte_range(time_range)
+    with open(file_path, "rb") as file:
+        file.seek(start_offset)
+        content = file.read() if end_offset is None else file.read(end_offset - start_offset)
+    logging.info(f"Reading {len(content)} bytes of {file_path} with its row index")
+    with _CsvDataLines(TextIOWrapper(BytesIO(content), encoding="utf-8", newline="")) as lines:
+        try:
+            body = pd.read_csv(lines, header=None, index_col=None, usecols=usecols)
+        except pd.errors.EmptyDataError:
+            return pd.DataFrame()
+        body.index = lines.get_labels(np.arange(len(body))) + first_label
+    return body[is_within_time_range(pd.to_numeric(body[row_index.time_position]), time_range)]
+
+def _get_rows_spanning_time_range(file_path: str, raw_bytes: bytes, header_row_index: int, time_position: int, time_range: tuple):
+    """
+    Parse only the time column of the rows after the header, to find the first and the last row within the time range
+
+    Returns:
+        int: The position of the first row within the time range, counting the lines with a value after the header
+        int: The number of rows from the first to the last row within the time range, both included
+    """
+    with _CsvDataLines(_open_csv(file_path, raw_bytes), skip_lines=header_row_index + 1) as lines:
+        try:
+            time = pd.read_csv(lines, header=None, usecols=[time_position]).iloc[:, 0]
+        except pd.errors.EmptyDataError:
+            time = pd.Series(dtype=float)
+    try:
+        time = pd.to_numeric(time)
+    except ValueError:
+        e = ValueError("The time column must be numeric to select a time range")
+        logging.error(e)
+        raise e
+    rows_within = np.flatnonzero(is_within_time_range(time, time_range).to_numpy())
+    if len(rows_within) == 0:
+        return 0, 0
+    return int(rows_within[0]), int(rows_within[-1] - rows_within[0] + 1)
+
+def get_time_column_position(header: list) -> int:
+    """
+    Get the position of the first column containing "time", as `CellPopulationActivity` uses it as time
+
+    Raises:
+        ValueError: If no column containing "time" is found
+    """
+    for position, name in enumerate(header):
+        if isinstance(name, str) and "time" in name.lower():
+            return position
+    e = ValueError("Time column not found in the data")
+    logging.error(e)
+    raise e
+
+def is_selected_column(name, cells = None) -> bool:
+    """
+    Check if a column is selected: the time and frames columns are always selected, and the cells
+    are selected if their name is in the list of cells or matches the regular expression
+
+    Args:
+        name: The name of the column
+        cells (str or list): A regular expression, searched in the name, or a list of names. If None, all cells are selected
+
+    Returns:
+        bool: Whether the column is selected
+    """
+    if cells is None:
+        return True
+    if isinstance(name, str) and ("time" in name.lower() or "frame" in name.lower()):
+        return True
+    if isinstance(cells, str):
+        return isinstance(name, str) and re.search(cells, name) is not None
+    return name in cells
+
+def is_within_time_range(time: pd.Series, time_range: tuple) -> pd.Series:
+    """
+    Check which times are within the time range, both ends included. Missing times are not
+    """
+    start, end = time_range
+    if start is not None and end is not None and start > end:
+        e = ValueError(f"The start of the time range must not be after its end: {time_range}")
+        logging.error(e)
+        raise e
+    return time.between(-np.inf if start is None else start, np.inf if end is None else end)
+
+def select_cells_and_time_range(df: pd.DataFrame, cells = None, time_range: tuple = None) -> pd.DataFrame:
+    """
+    Keep only the selected cells and the rows within the time range of a DataFrame read from a file
+
+    Args:
+        df (pd.DataFrame): The DataFrame, with a column containing "time"
+        cells (str or list): The cells to keep, see `is_selected_column`. If None, all cells are kept
+        time_range (tuple): The first and last time to keep, in the unit of the time column. Either can be None
+
+    Returns:
+        pd.DataFrame: The selected part of the DataFrame
+    """
+    if cells is not None:
+        df = df[[column for column in df.columns if is_selected_column(column, cells)]]
+    if time_range is not None:
+        time_column = df.columns[get_time_column_position(list(df.columns))]
+        df = df[is_within_time_range(pd.to_numeric(df[time_column]), time_range)]
+    return df
+
+def _open_excel(file_path: str, raw_bytes: bytes = None) -> openpyxl.Workbook:
+    """
+    Open an Excel workbook in read-only mode, where rows are streamed instead of loaded at once,
+    with the values of the formulas as last computed by Excel
+    """
+    if is_compressed(file_path):
+        # workbooks are zip files themselves, which are read by seeking, so they are decompressed in memory
+        with open_input(file_path, raw_bytes) as stream:
+            raw_bytes = stream.read()
+    return openpyxl.load_workbook(BytesIO(raw_bytes) if raw_bytes is not None else file_path, read_only=True, data_only=True)
+
+def read_excel_sheet(worksheet) -> pd.DataFrame:
+    """
+    Read a sheet of a workbook opened in read-only mode, streaming its rows. The header is the first
+    row where "time" can be found (partially or fully), as in `find_and_set_header`, and the
+    DataFrame is cleaned as in `read_from_file`
+
+    Args:
+        worksheet: The sheet, from a workbook opened with `_open_excel`
+
+    Returns:
+        pd.DataFrame: The read DataFrame
+
+    Raises:
+        HeaderNotFoundError: If no row of the sheet contains "time"
+    """
+    labels, rows, header_label = [], [], None
+    # rows are labelled by their position in the sheet, as with pd.read_excel
+    for label, row in enumerate(worksheet.iter_rows(values_only=True)):
+        if header_label is None and any(isinstance(value, str) and "time" in value.lower() for value in row):
+            header_label = label
+        if any(value is not None for value in row):
+            labels.append(label)
+            rows.append(row)
+    if header_label is None:
+        e = HeaderNotFoundError(f"Header with a time column not found in sheet {worksheet.title}")
+        logging.error(e)
+        raise e
+
+    df = pd.DataFrame(rows, index=labels, dtype=object)
+    # drop columns which are only empty, including their header
+    df = df.dropna(axis=1, how="all")
+    df.columns = pd.Index(df.loc[header_label].tolist(), name=header_label)
+    df = df.drop(header_label)
+    return post_clean_df(df)
+
+def iter_excel_sheets(file_path: str, raw_bytes: bytes = None, sheet_names: list = None, drop_frames_column: bool = False, cells = None, time_range: tuple = None, cache = None):
+    """
+    Read the sheets of an Excel workbook, opening it only once. Sheets without header are skipped
+
+    Args:
+        file_path (str): The path to the file
+        raw_bytes (bytes): The contents of the file, used instead of reading the file if provided
+        sheet_names (list): The sheets to read. If None, all sheets are read
+        drop_frames_column (bool): Whether to drop the columns containing "frame"
+        cells (str or list): The cells to read, see `is_selected_column`. If None, all cells are read
+        time_range (tuple): The first and last time to read, in the unit of the time column. Either can be None
+        cache (ParsedInputCache): If provided, each whole sheet is read from the cache, or read and stored in it,
+            with an entry per sheet, and the cells and time range are then selected
+
+    Yields:
+        tuple: The name of each sheet and its DataFrame
+    """
+    if raw_bytes is None and not input_exists(file_path):
+        e = FileNotFoundError(f"File not found: {file_path}")
+        logging.error(e)
+        raise e
+    key = cache.get_key(file_path, raw_bytes) if cache is not None else None
+    workbook = _open_excel(file_path, raw_bytes)
+    try:
+        for worksheet in workbook.worksheets:
+            if sheet_names is not None and worksheet.title not in sheet_names:
+                continue
+            sheet_key = cache.get_sheet_key(key, worksheet.title) if cache is not None else None
+            df = cache.load(sheet_key) if cache is not None else None
+            if df is None:
+                try:
+                    df = read_excel_sheet(worksheet)
+                except HeaderNotFoundError:
+                    logging.warning(f"Skipping sheet {worksheet.title} of {file_path}, as it has no header")
+                    continue
+                if cache is not None:
+                    cache.store(sheet_key, df)
+            if drop_frames_column:
+                df = df.drop(columns=[column for column in df.columns if isinstance(column, str) and "frame" in column.lower()])
+            yield worksheet.title, select_cells_and_time_range(df, cells, time_range)
+    finally:
+        workbook.close()
+
+def read_from_file_in_chunks(file_path: str, chunksize: int = 100_000, raw_bytes: bytes = None):
+    """
+    Read a csv file in blocks of rows, so that memory is bounded by the size of the blocks and not
+    by the size of the file. The header is found as in `find_and_set_header` and the rows before
+    it are kept as data rows, as `read_from_file` does. Rows and columns are labelled as in
+    `read_from_file`, but the columns without header are ignored. If the rows do not fit the header,
+    the whole file is read as text, as `read_from_file` does, and then yielded in blocks.
+
+    Args:
+        file_path (str): The path to the file
+        chunksize (int): The number of rows of each block
+        raw_bytes (bytes): The contents of the file, used instead of reading the file if provided
+
+    Yields:
+        pd.DataFrame: Each block of rows, with the header set. Values are not converted, see `coerce_to_numeric`
+    """
+    if raw_bytes is None and not input_exists(file_path):
+        e = FileNotFoundError(f"File not found: {file_path}")
+        logging.error(e)
+        raise e
+    if not get_uncompressed_file_path(file_path).endswith(".csv"):
+        e = ValueError(f"File format not supported for reading in chunks: {file_path}")
+        logging.error(e)
+        raise e
+
+    with _open_csv(file_path, raw_bytes) as file:
+        header_row_index, header, rows_before_header = find_header_row_in_csv(file)
+    # rows are labelled as when reading the whole file, where blank lines are skipped
+    rows_before_header = [row for row in rows_before_header if row]
+    header_label = len(rows_before_header)
+    # positions and names of the columns with a header
+    positions = [position for position, name in enumerate(header) if name.strip()]
+    names = pd.Index([header[position] for position in positions], name=header_label)
+
+    def select_columns(chunk: pd.DataFrame) -> pd.DataFrame:
+        chunk = chunk.reindex(columns=positions)
+        chunk.columns = names
+        return chunk
+
+    # rows with a value are kept even if it is in a column without header, as `read_from_file` does
+    rows_before_header = [(label, row) for label, row in enumerate(rows_before_header) if any(value.strip() for value in row)]
+    rows_before_header = select_columns(pd.DataFrame(
+        [[value if value.strip() else None for value in row] for _, row in rows_before_header],
+        index=[label for label, _ in rows_before_header],
+    )) if rows_before_header else None
+
+    nr_rows_read = 0
+    try:
+        with _CsvDataLines(_open_csv(file_path, raw_bytes), skip_lines=header_row_index + 1) as lines:
+            # the header sets the number of columns, so the values of wider rows, which have no header, are not parsed
+            chunks = pd.read_csv(lines, header=None, names=range(len(header)), usecols=positions, chunksize=chunksize, index_col=None)
+            for chunk in chunks:
+                chunk.index = lines.get_labels(np.arange(len(chunk)) + nr_rows_read) + header_label + 1
+                nr_rows_read += len(chunk)
+                chunk = select_columns(chunk)
+                if rows_before_header is not None:
+                    # the values are not converted yet, so the rows before the header are added as text
+                    chunk = pd.concat([rows_before_header, chunk.astype(object)])
+                    rows_before_header = None
+                yield chunk
+    except (pd.errors.ParserError, ValueError):
+        if nr_rows_read > 0:
+            raise
+        # no row was yielded yet, so the file can be read as text instead
+        logging.info(f"Rows of {file_path} do not fit its header, reading the whole file as text")
+        df = _read_from_file_as_text(file_path, raw_bytes=raw_bytes)
+        df = df[[column for column in df.columns if isinstance(column, str) and column.strip()]]
+        for start in range(0, len(df), chunksize):
+            yield df.iloc[start:start + chunksize]
+        return
+    if rows_before_header is not None:
+        # the file has no row after the header
+        yield rows_before_header
+
+def is_supported_file(file_path: str) -> bool:
+    """
+    Check if a file can be read, possibly compressed, or is a zip archive of such files
+    """
+    return get_uncompressed_file_path(file_path).endswith(SUPPORTED_FILE_EXTENSIONS) or file_path.endswith(ZIP_EXTENSION)
+
+def expand_zip_archives(file_paths: list) -> list:
+    """
+    Replace each zip archive by the files inside it which can be read, so each of them is a separate input.
+    Nothing is extracted: the files are read from the archive with `read_from_file`
+
+    Args:
+        file_paths (list): The paths to the files
+
+    Returns:
+        list: The paths to the files, with the files inside the zip archives in place of the archives
+    """
+    expanded_file_paths = []
+    for file_path in file_paths:
+        if not file_path.endswith(ZIP_EXTENSION) or not os.path.isfile(file_path):
+            expanded_file_paths.append(file_path)
+            continue
+        # trace stores are memory-mapped, so they cannot be read from an archive
+        member_paths = [
+            member_path for member_path in list_zip_members(file_path)
+            if is_supported_file(member_path) and not member_path.endswith((ZIP_EXTENSION, TRACE_STORE_EXTENSION))
+        ]
+        logging.info(f"Found {len(member_paths)} files in archive {file_path}")
+        expanded_file_paths.extend(member_paths)
+    return expanded_file_paths
+
 def create_new_file_from_input_filepath(file_path: str, suffix: str = None) -> str:
     """
     Create a new file path from the input file path
@@ -132,7 +861,7 @@ def create_new_file_from_input_filepath(file_path: str, suffix: str = None) -> s
     Returns:
         str: The new file path
     """
-    file_name, file_extension = os.path.splitext(file_path)
+    file_name, file_extension = os.path.splitext(get_uncompressed_file_path(file_path))
     # get the file name without the directory
     file_name = os.path.basename(file_name)
     if suffix is None:
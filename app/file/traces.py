@@ -0,0 +1,171 @@
+import numpy as np
+import pandas as pd
+
+import os
+import json
+import logging
+
+
+# load logging level from environment variable
+log_level = os.getenv("LOG_LEVEL", "INFO")
+logging.basicConfig(format='%(asctime)s - %(levelname)s - %(module)s - %(lineno)d - %(message)s', level=log_level, handlers=[logging.StreamHandler(), logging.FileHandler(f"{__name__}.log")])
+
+TRACE_STORE_EXTENSION = ".traces"
+TRACE_STORE_VERSION = 1
+_supported_dtypes = ["float32", "float64"]
+
+
+def get_trace_store_header_path(file_path: str) -> str:
+    return f"{file_path}.json"
+
+
+class TraceStore:
+    """
+    Recording stored as a binary matrix (one column per cell) next to a small JSON header holding the
+    names of the cells, the time of each sample and its unit. The matrix is column-major, so the
+    values of each cell are contiguous, and it is opened with `numpy.memmap`: opening is immediate
+    and only the pages of the cells which are read are loaded in memory.
+    """
+    def __init__(self, file_path: str):
+        """
+        Args:
+            file_path (str): The path to the matrix file, with its header at `get_trace_store_header_path`
+        """
+        header_path = get_trace_store_header_path(file_path)
+        if not os.path.exists(file_path) or not os.path.exists(header_path):
+            e = FileNotFoundError(f"Trace store not found: {file_path}")
+            logging.error(e)
+            raise e
+        with open(header_path) as file:
+            self.header = json.load(file)
+        if self.header.get("version") != TRACE_STORE_VERSION or self.header.get("dtype") not in _supported_dtypes:
+            e = ValueError(f"Trace store format not supported: {file_path}")
+            logging.error(e)
+            raise e
+        self.file_path = file_path
+        self.time = np.asarray(self.header["time"], dtype=np.float64)
+        # position of each cell, the first one if a name is repeated
+        self._cell_positions = {cell: position for position, cell in reversed(list(enumerate(self.cells)))}
+        shape = (len(self.time), len(self.cells))
+        if 0 in shape:
+            self.values = np.empty(shape, dtype=self.header["dtype"], order="F")
+        else:
+            self.values = np.memmap(file_path, dtype=self.header["dtype"], mode="r", shape=shape, order="F")
+
+    @property
+    def cells(self) -> list:
+        return self.header["cells"]
+
+    @property
+    def time_column(self) -> str:
+        return self.header["time_column"]
+
+    @property
+    def time_unit(self) -> str:
+        return self.header["time_unit"]
+
+    def to_df(self, cells: list = None) -> pd.DataFrame:
+        """
+        Get the recording as a DataFrame with the same layout as `read_from_file`: the time column followed
+        by one column per cell. The values of the cells are not copied, but read from the file when used
+
+        Args:
+            cells (list): The cells to include. If None, all cells are included
+
+        Returns:
+            pd.DataFrame: The recording
+        """
+        if cells is None:
+            return self._to_df(self.values, self.cells)
+        positions = [self._cell_positions[cell] for cell in cells]
+        # a contiguous range of cells is still a view of the file
+        is_range = positions == list(range(positions[0], positions[0] + len(positions))) if positions else True
+        values = self.values[:, positions[0]:positions[0] + len(positions)] if is_range and positions else self.values[:, positions]
+        return self._to_df(values, cells)
+
+    def _to_df(self, values: np.ndarray, cells: list) -> pd.DataFrame:
+        df = pd.DataFrame(values, columns=list(cells), copy=False)
+        df.insert(0, self.time_column, self.time)
+        return df
+
+    def iter_cell_blocks(self, nr_cells: int):
+        """
+        Get the recording in blocks of cells, so that only one block is loaded in memory at a time
+
+        Args:
+            nr_cells (int): The number of cells of each block
+
+        Yields:
+            pd.DataFrame: Each block, as returned by `to_df`
+        """
+        for start in range(0, len(self.cells), nr_cells):
+            # the cells of a block are a contiguous range, so the block is a view of the file
+            yield self._to_df(self.values[:, start:start + nr_cells], self.cells[start:start + nr_cells])
+
+
+def write_trace_store(df: pd.DataFrame, file_path: str, dtype: str = "float64", time_unit: str = "s") -> None:
+    """
+    Write a recording as a trace store. Columns containing "frame" are not written
+
+    Args:
+        df (pd.DataFrame): The recording, as returned by `read_from_file`: a column containing "time" and one column per cell
+        file_path (str): The path to the matrix file. The header is written next to it
+        dtype (str): The type of the values, either "float32" or "float64"
+        time_unit (str): The unit of the time column
+    """
+    if dtype not in _supported_dtypes:
+        e = ValueError(f"Trace store type not supported: {dtype}. Supported types are {_supported_dtypes}")
+        logging.error(e)
+        raise e
+    time_columns = [column for column in df.columns if isinstance(column, str) and "time" in column.lower()]
+    if len(time_columns) == 0:
+        e = ValueError("Time column not found in the data")
+        logging.error(e)
+        raise e
+    cells = [column for column in df.columns if column != time_columns[0] and not (isinstance(column, str) and "frame" in column.lower())]
+    header = {
+        "version": TRACE_STORE_VERSION,
+        "dtype": dtype,
+        "time_column": time_columns[0],
+        "time_unit": time_unit,
+        "cells": [str(cell) for cell in cells],
+        "time": df[time_columns[0]].astype(float).tolist(),
+    }
+    # written column by column, in the column-major order of the matrix
+    with open(file_path, "wb") as file:
+        for cell in cells:
+            file.write(df[cell].to_numpy(dtype=dtype).tobytes())
+    with open(get_trace_store_header_path(file_path), "w") as file:
+        json.dump(header, file)
+    logging.info(f"Trace store with {len(cells)} cells and {len(df)} samples written to {file_path}")
+
+
+def convert_to_trace_store(file_path: str, output_file_path: str = None, dtype: str = "float64", time_unit: str = "s") -> str:
+    """
+    Convert a csv or Excel file to a trace store
+
+    Args:
+        file_path (str): The path to the file
+        output_file_path (str): The path to the matrix file. If None, the extension of the file is replaced
+        dtype (str): The type of the values, either "float32" or "float64"
+        time_unit (str): The unit of the time column of the file
+
+    Returns:
+        str: The path to the matrix file
+    """
+    # imported here, as read_from_file opens trace stores
+    from app.file.tables import read_from_file
+
+    if output_file_path is None:
+        output_file_path = os.path.splitext(file_path)[0] + TRACE_STORE_EXTENSION
+    write_trace_store(read_from_file(file_path, drop_frames_column=True), output_file_path, dtype=dtype, time_unit=time_unit)
+    return output_file_path
+
+
+if __name__=="__main__":
+    import sys
+    if len(sys.argv) < 2:
+        logging.error("Please provide the paths of the files to convert as arguments")
+        sys.exit(1)
+    for file_path in sys.argv[1:]:
+        convert_to_trace_store(file_path)
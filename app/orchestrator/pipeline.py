@@ -1,32 +1,49 @@
 
+import numpy as np
 import pandas as pd
 import logging
 import os
 import json
+from itertools import chain, islice
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from app.data.population import CellPopulationActivity
 from app.data.process import ActivityProcessor
-from app.file.tables import read_from_file, write_to_file, create_new_file_from_input_filepath, get_directory_of_filepath
+from app.data.candidates import PeakCandidateIndex
+from app.data.stream import StreamingActivityProcessor
+from app.file.tables import read_from_file, read_from_file_in_chunks, iter_excel_sheets, is_supported_file, expand_zip_archives, coerce_to_numeric, select_cells_and_time_range, to_precision, write_to_file, create_new_file_from_input_filepath, get_directory_of_filepath
+from app.file.cache import ParsedInputCache
+from app.file.traces import TraceStore, TRACE_STORE_EXTENSION
+from app.file.compression import get_uncompressed_file_path
+from app.orchestrator.prefetch import Prefetcher
 from app.config import AppConfig, LOGGING_CONFIG
 
 default_config = AppConfig()
+# size, in bytes, of the blocks of cells of a trace store processed at a time
+TRACE_STORE_BLOCK_SIZE = 256 * 1024 * 1024
 logging.basicConfig(**LOGGING_CONFIG)
 
 
-def get_cell_activity_features_from_file_or_df(file_path: str = None, df: pd.DataFrame = None, config: AppConfig = AppConfig()):
+def get_cell_population_activity_from_file_or_df(file_path: str = None, df: pd.DataFrame = None, config: AppConfig = AppConfig(), cells = None, time_range: tuple = None) -> CellPopulationActivity:
     """
-    Get cell activity features from a file or dataframe
+    Read and clean the cell population activity from a file or dataframe
 
     Args:
         file_path (str): The path to the file
+        df (pd.DataFrame): The dataframe, used instead of reading the file if provided
+        cells (str or list): The cells to read, as a regular expression or a list of names. If None, all cells are read
+        time_range (tuple): The first and last time to read, in the unit of the time column. Either can be None
 
     Returns:
-        pd.DataFrame: The cell activity features
-        pd.Series: The summary of the population
+        CellPopulationActivity: The cell population activity
     """
-    if df is None:
+    if df is not None:
+        df = to_precision(select_cells_and_time_range(df, cells, time_range), config.precision)
+    else:
         try:
             logging.info(f"Reading file {file_path}")
-            df = read_from_file(file_path)
+            df = read_from_file(file_path, drop_frames_column=True, cells=cells, time_range=time_range, cache=get_parsed_input_cache(config), precision=config.precision)
         except FileNotFoundError as e:
             logging.error(e)
             raise e
@@ -41,76 +58,548 @@ def get_cell_activity_features_from_file_or_df(file_path: str = None, df: pd.Dat
         ignore_peaks_before_criteria=config.ignore_peaks_before_criteria,
         ignore_peaks_before=config.ignore_peaks_before,
         time_unit=config.time_unit,
-        filters=config.filters
+        filters=config.filters,
+        lazy=True,
+        time_axis=config.time_axis
     )
 
     cell_population_activity.from_df(df)
-    activity_processor = ActivityProcessor(
+    return cell_population_activity
+
+
+def get_parsed_input_cache(config: AppConfig = AppConfig()) -> ParsedInputCache:
+    """
+    Get the cache of the files read, or None if the config sets no cache directory
+    """
+    if config.cache_directory is None:
+        return None
+    return ParsedInputCache(config.cache_directory, size_limit=int(config.cache_size_limit * 1024 * 1024))
+
+
+def get_activity_processor(config: AppConfig = AppConfig()) -> ActivityProcessor:
+    return ActivityProcessor(
         threshold=config.threshold,
-        n_neighbors=config.n_neighbors
+        n_neighbors=config.n_neighbors,
+        detector=config.peak_detector,
+        nr_shards=config.shards,
+        shard_backend=config.shard_backend,
+        output_dtypes=config.output_dtypes,
+        precision=config.precision
     )
 
+
+def get_cell_activity_features_from_file_or_df(file_path: str = None, df: pd.DataFrame = None, config: AppConfig = AppConfig(), cells = None, time_range: tuple = None):
+    """
+    Get cell activity features from a file or dataframe
+
+    Args:
+        file_path (str): The path to the file
+        cells (str or list): The cells to process, as a regular expression or a list of names. If None, all cells are processed
+        time_range (tuple): The first and last time to process, in the unit of the time column. Either can be None.
+            When reading a file, cells and rows which are not selected are not parsed
+
+    Returns:
+        pd.DataFrame: The cell activity features
+        pd.Series: The summary of the population
+    """
+    cell_population_activity = get_cell_population_activity_from_file_or_df(file_path, df, config=config, cells=cells, time_range=time_range)
+    activity_processor = get_activity_processor(config)
+
     cell_population_activity_features: pd.DataFrame = activity_processor.run(cell_population_activity)
     summary_population: pd.Series = activity_processor.summary_of_population(cell_population_activity_features, exclude_zeros_in_numeric_columns=True)
     return cell_population_activity_features, summary_population
 
 
-def process_files_in_bulk(file_paths: list, save_to_file: bool = False, config: AppConfig = default_config):
+def get_cell_activity_features_from_file_in_chunks(file_path: str, config: AppConfig = AppConfig(), chunksize: int = None):
     """
-    Process a list of files in bulk
+    Get cell activity features from a csv file read in blocks of rows, so that memory is bounded
+    by the size of the blocks and not by the length of the recording. Peaks spanning two blocks
+    are found as `StreamingActivityProcessor` keeps the frames around the border between them.
 
     Args:
-        file_paths (list): The list of file paths
+        file_path (str): The path to the file
+        chunksize (int): The number of rows of each block. If None, the chunk size of the config is used
 
     Returns:
-        dict: A dictionary with the file path as key and the summary of the population as value
+        pd.DataFrame: The cell activity features
+        pd.Series: The summary of the population
     """
-    result = {}
-    for file_path in file_paths:
+    if chunksize is None:
+        chunksize = config.chunk_size
+    cell_population_activity = CellPopulationActivity(
+        ignore_peaks_before_criteria=config.ignore_peaks_before_criteria,
+        ignore_peaks_before=config.ignore_peaks_before,
+        time_unit=config.time_unit,
+        filters=config.filters,
+        time_axis=config.time_axis
+    )
+    streaming_processor = StreamingActivityProcessor(
+        cell_population_activity,
+        threshold=config.threshold,
+        n_neighbors=config.n_neighbors,
+        detector=config.peak_detector,
+        output_dtypes=config.output_dtypes,
+        precision=config.precision
+    )
+    logging.info(f"Reading file {file_path} in chunks of {chunksize} rows")
+    non_numeric_columns = set()
+    for chunk in read_from_file_in_chunks(file_path, chunksize=chunksize):
+        chunk, chunk_non_numeric_columns = coerce_to_numeric(chunk)
+        non_numeric_columns.update(chunk_non_numeric_columns)
+        streaming_processor.update(chunk)
+    cell_population_activity_features = streaming_processor.finalize()
+    # columns with non numeric values are dropped, as when reading the whole file
+    cell_population_activity_features = cell_population_activity_features.drop(
+        index=[column for column in non_numeric_columns if column in cell_population_activity_features.index]
+    )
+    if cell_population_activity_features.empty:
+        e = ValueError(f"No cells left to process: {file_path}")
+        logging.error(e)
+        raise e
+    summary_population: pd.Series = ActivityProcessor.summary_of_population(cell_population_activity_features, exclude_zeros_in_numeric_columns=True)
+    return cell_population_activity_features, summary_population
+
+
+def get_peak_candidate_index_from_file_or_df(file_path: str = None, df: pd.DataFrame = None, config: AppConfig = AppConfig()) -> PeakCandidateIndex:
+    """
+    Get the index of the local maxima of each cell from a file or dataframe, so the features can be
+    obtained for any threshold with `get_cell_activity_features_from_peak_candidate_index`
+
+    Args:
+        file_path (str): The path to the file
+        df (pd.DataFrame): The dataframe, used instead of reading the file if provided
+
+    Returns:
+        PeakCandidateIndex: The index of the local maxima
+    """
+    cell_population_activity = get_cell_population_activity_from_file_or_df(file_path, df, config=config)
+    activity_processor = get_activity_processor(config)
+    activity_processor._sanity_check_data(cell_population_activity)
+    return activity_processor.get_peak_candidate_index(cell_population_activity.data, time_unit=cell_population_activity.time_unit)
+
+
+def get_cell_activity_features_from_peak_candidate_index(peak_candidate_index: PeakCandidateIndex, threshold: float = None, config: AppConfig = AppConfig()):
+    """
+    Get cell activity features for a threshold from the index of the local maxima, without reading
+    the data or detecting the local maxima again
+
+    Args:
+        peak_candidate_index (PeakCandidateIndex): The index of the local maxima
+        threshold (float): The peak threshold. If None, the threshold of the config is used
+
+    Returns:
+        pd.DataFrame: The cell activity features
+        pd.Series: The summary of the population
+    """
+    activity_processor = get_activity_processor(config)
+    cell_population_activity_features = activity_processor.run_from_peak_candidate_index(peak_candidate_index, threshold)
+    summary_population: pd.Series = activity_processor.summary_of_population(cell_population_activity_features, exclude_zeros_in_numeric_columns=True)
+    return cell_population_activity_features, summary_population
+
+
+def get_cell_activity_features_from_file(file_path: str, config: AppConfig = AppConfig()):
+    """
+    Get cell activity features from a file, read in chunks if the config sets a chunk size and the file is a csv
+
+    Args:
+        file_path (str): The path to the file
+
+    Returns:
+        pd.DataFrame: The cell activity features
+        pd.Series: The summary of the population
+    """
+    logging.info(f"Processing file {file_path}")
+    if file_path.endswith(TRACE_STORE_EXTENSION):
+        return get_cell_activity_features_from_trace_store(file_path, config=config)
+    if is_read_in_chunks(file_path, config=config):
+        return get_cell_activity_features_from_file_in_chunks(file_path, config=config)
+    return get_cell_activity_features_from_file_or_df(file_path, config=config)
+
+
+def is_read_in_chunks(file_path: str, config: AppConfig = AppConfig()) -> bool:
+    """
+    Whether a file is read in chunks: a csv file when the config sets a chunk size, unless the file is in the cache,
+    as reading it from the cache is faster and bounded by the size of the file already read once
+    """
+    if not config.chunk_size or not get_uncompressed_file_path(file_path).endswith(".csv"):
+        return False
+    cache = get_parsed_input_cache(config)
+    return cache is None or not cache.contains(cache.get_key(file_path))
+
+
+def get_cell_activity_features_from_trace_store(file_path: str, config: AppConfig = AppConfig(), nr_cells_per_block: int = None):
+    """
+    Get cell activity features from a trace store, processed in blocks of cells, so that recordings
+    larger than the memory can be processed: only the values of one block are loaded at a time.
+    The features of each cell do not depend on the other cells, so they are the same as processing
+    all cells at once. The time unit of the trace store is used
+
+    Args:
+        file_path (str): The path to the matrix file of the trace store
+        nr_cells_per_block (int): The number of cells of each block. If None, blocks of about TRACE_STORE_BLOCK_SIZE bytes are used
+
+    Returns:
+        pd.DataFrame: The cell activity features
+        pd.Series: The summary of the population
+    """
+    trace_store = TraceStore(file_path)
+    if trace_store.time_unit != config.time_unit:
+        logging.warning(f"Using the time unit of the trace store {trace_store.time_unit} instead of {config.time_unit}")
+    if nr_cells_per_block is None:
+        # the values are processed in the precision of the config
+        nr_cells_per_block = max(1, TRACE_STORE_BLOCK_SIZE // max(1, np.dtype(config.precision).itemsize * len(trace_store.time)))
+    activity_processor = get_activity_processor(config)
+
+    features_of_blocks = []
+    for block in trace_store.iter_cell_blocks(nr_cells_per_block):
+        cell_population_activity = CellPopulationActivity(
+            ignore_peaks_before_criteria=config.ignore_peaks_before_criteria,
+            ignore_peaks_before=config.ignore_peaks_before,
+            time_unit=trace_store.time_unit,
+            filters=config.filters,
+            lazy=True,
+            time_axis=config.time_axis
+        )
+        cell_population_activity.from_df(block)
+        # all cells of the block may be removed by the filters
+        if len(cell_population_activity.columns) > 0:
+            features_of_blocks.append(activity_processor.run(cell_population_activity))
+    if not features_of_blocks:
+        e = ValueError(f"No cells left to process: {file_path}")
+        logging.error(e)
+        raise e
+    # categorical cell ids of different blocks are concatenated as objects, so the dtypes are set again
+    cell_population_activity_features = activity_processor._to_output_dtypes(pd.concat(features_of_blocks).sort_index())
+    summary_population: pd.Series = activity_processor.summary_of_population(cell_population_activity_features, exclude_zeros_in_numeric_columns=True)
+    return cell_population_activity_features, summary_population
+
+
+def read_populations_of_file(file_path: str, config: AppConfig = AppConfig()) -> list:
+    """
+    Read and parse the populations of a file ahead of processing them, see `get_cell_activity_features_of_each_population_in_file`.
+    Trace stores and csv files read in chunks are read while they are processed, so they are not read ahead
+
+    Args:
+        file_path (str): The path to the file
+
+    Returns:
+        list: The sheet name and DataFrame of each sheet of an Excel workbook, or a single pair, without sheet name,
+            for other files. None if the file is read while it is processed
+    """
+    if file_path.endswith(TRACE_STORE_EXTENSION) or is_read_in_chunks(file_path, config=config):
+        return None
+    logging.info(f"Reading file {file_path} ahead of processing it")
+    if get_uncompressed_file_path(file_path).endswith(".xlsx"):
+        return list(iter_excel_sheets(file_path, drop_frames_column=True, cache=get_parsed_input_cache(config)))
+    return [(None, read_from_file(file_path, drop_frames_column=True, cache=get_parsed_input_cache(config), precision=config.precision))]
+
+
+def get_cell_activity_features_of_each_population_in_file(file_path: str, config: AppConfig = AppConfig(), populations: list = None) -> dict:
+    """
+    Get cell activity features of each population in a file: each sheet of an Excel workbook is
+    a population, read in a single open of the workbook, while other files hold a single population
+
+    Args:
+        file_path (str): The path to the file
+        populations (list): The populations of the file, as read by `read_populations_of_file`. If None, the file is read
+
+    Returns:
+        dict: The features and summary of each population, keyed by the file path, with the name of
+            the sheet appended to it when the workbook has more than one population
+    """
+    is_excel = get_uncompressed_file_path(file_path).endswith(".xlsx")
+    if populations is None and not is_excel:
+        return {file_path: get_cell_activity_features_from_file(file_path, config=config)}
+    if not is_excel:
+        logging.info(f"Processing file {file_path}")
+        return {file_path: get_cell_activity_features_from_file_or_df(df=populations[0][1], config=config)}
+
+    logging.info(f"Processing the sheets of file {file_path}")
+    if populations is None:
+        populations = iter_excel_sheets(file_path, drop_frames_column=True, cache=get_parsed_input_cache(config))
+    result, error = {}, None
+    for sheet_name, df in populations:
         try:
-            logging.info(f"Processing file {file_path}")
-            cell_population_activity_features, summary_population = get_cell_activity_features_from_file_or_df(file_path, config=config)
-            summary_population.name = file_path
-            result[file_path] = (cell_population_activity_features, summary_population)
+            result[sheet_name] = get_cell_activity_features_from_file_or_df(df=df, config=config)
         except Exception as e:
-            logging.error(f"Error processing file {file_path}")
+            logging.error(f"Error processing sheet {sheet_name} of file {file_path}")
             logging.error(e)
-    logging.info(f"Processed {len(result)} files")
-    all_populations_summary = pd.DataFrame({key: value[1] for key, value in result.items()})
+            error = e
+    if not result:
+        if error is None:
+            error = ValueError(f"No sheet with a header found: {file_path}")
+            logging.error(error)
+        raise error
+    if len(result) == 1:
+        return {file_path: next(iter(result.values()))}
+    file_name, file_extension = os.path.splitext(get_uncompressed_file_path(file_path))
+    return {f"{file_name}_{sheet_name}{file_extension}": value for sheet_name, value in result.items()}
+
+
+def _get_cell_activity_features_from_df(df: pd.DataFrame, config: AppConfig = AppConfig()):
+    return get_cell_activity_features_from_file_or_df(df=df, config=config)
+
+
+def map_with_workers(function: callable, items, config: AppConfig, workers: int = 1):
+    """
+    Call `function(item, config=config)` for each item, in a pool of processes if there is more than one worker.
+    An error in one item does not stop the others. Items are taken from the iterable as they are needed: at most
+    two items per worker are submitted ahead of the one yielded, so the results waiting to be yielded do not grow
+    with the number of items.
+
+    Args:
+        function (callable): The function to call. Must be defined at module level, to be sent to the processes
+        items (iterable): The items to call the function with, e.g. a list or a generator
+        config (AppConfig): The config, passed to each call
+        workers (int): The number of processes. If 1 or less, the items are processed in this process
+
+    Yields:
+        tuple: Each item, its result and the exception raised (None if there was none), in the order of items
+    """
+    items = iter(items)
+    first_items = list(islice(items, 2))
+    items = chain(first_items, items)
+    if workers is None or workers <= 1 or len(first_items) <= 1:
+        for item in items:
+            try:
+                yield item, function(item, config=config), None
+            except Exception as e:
+                yield item, None, e
+        return
+
+    executor = ProcessPoolExecutor(max_workers=workers)
+    # the future of each submitted item, replaced by its outcome when the item is run again after a crash
+    submitted = deque([item, executor.submit(function, item, config=config)] for item in islice(items, 2 * workers))
+    try:
+        while submitted:
+            for next_item in islice(items, 1):
+                try:
+                    future = executor.submit(function, next_item, config=config)
+                except BrokenProcessPool:
+                    executor = _replace_broken_pool(executor, function, submitted, config, workers)
+                    future = executor.submit(function, next_item, config=config)
+                submitted.append([next_item, future])
+            item, future = submitted.popleft()
+            if not isinstance(future, Future):
+                yield future
+                continue
+            try:
+                yield item, future.result(), None
+            except BrokenProcessPool:
+                submitted.appendleft([item, future])
+                executor = _replace_broken_pool(executor, function, submitted, config, workers)
+                yield submitted.popleft()[1]
+            except Exception as e:
+                yield item, None, e
+    finally:
+        executor.shutdown(wait=True)
+
+
+def _run_in_own_process(function: callable, item, config: AppConfig):
+    """
+    Call `function(item, config=config)` in a pool of its own, so that no other item fails if it crashes its worker
+
+    Returns:
+        tuple: The item, its result and the exception raised (None if there was none)
+    """
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        try:
+            return item, executor.submit(function, item, config=config).result(), None
+        except Exception as e:
+            return item, None, e
+
+
+def _replace_broken_pool(executor: ProcessPoolExecutor, function: callable, submitted: deque, config: AppConfig, workers: int) -> ProcessPoolExecutor:
+    """
+    Replace a pool broken by a worker process which crashed. The crash fails every item not finished yet, including
+    the items other workers were running, so these are run again one at a time, each in a pool of its own: only
+    the item which crashed fails. Their future is replaced by their outcome, while finished items keep their future
+
+    Returns:
+        ProcessPoolExecutor: The new pool, for the next items
+    """
+    executor.shutdown(wait=True)
+    for entry in submitted:
+        future = entry[1]
+        if isinstance(future, Future) and (not future.done() or isinstance(future.exception(), BrokenProcessPool)):
+            entry[1] = _run_in_own_process(function, entry[0], config)
+    return ProcessPoolExecutor(max_workers=workers)
+
+
+def map_with_prefetching(file_paths, config: AppConfig):
+    """
+    Get the features of each population of each file, reading and parsing the next files in a background
+    thread, up to the prefetch depth of the config, while the current file is processed
+
+    Args:
+        file_paths (iterable): The file paths
+        config (AppConfig): The config
+
+    Yields:
+        tuple: Each file path, the features and summary of each of its populations (see
+            `get_cell_activity_features_of_each_population_in_file`) and the exception raised (None if there was none)
+    """
+    with Prefetcher(lambda file_path: read_populations_of_file(file_path, config=config), file_paths, depth=config.prefetch_depth) as prefetcher:
+        for file_path, populations, error in prefetcher:
+            if error is None:
+                try:
+                    populations = get_cell_activity_features_of_each_population_in_file(file_path, config=config, populations=populations)
+                except Exception as e:
+                    error = e
+            yield file_path, None if error is not None else populations, error
+
+
+def iter_process_files(file_paths, config: AppConfig = default_config, workers: int = None):
+    """
+    Process files one after the other, or spread across workers, and yield the features and summary of each
+    population as soon as it is processed. Only the populations being processed are held in memory, so the
+    number of files does not change the memory used. Each sheet of an Excel workbook is processed as its own
+    population, and each file inside a zip archive as its own file. Files which cannot be processed are skipped.
+    Without workers, the next files are read while a file is processed if the config sets a prefetch depth
+
+    Args:
+        file_paths (iterable): The file paths, possibly compressed (gzip, bz2, xz) or zip archives
+        workers (int): The number of processes the files are spread across. If None, the workers of the config are used
+
+    Yields:
+        tuple: The name of the population (the file path, and sheet, see `get_cell_activity_features_of_each_population_in_file`),
+            its features and its summary, named after the population, in the order of the files
+    """
+    if workers is None:
+        workers = config.workers
+    # each file inside a zip archive is a separate input, read from the archive
+    file_paths = expand_zip_archives(file_paths)
+    if (workers is None or workers <= 1) and config.prefetch_depth > 0:
+        files_and_populations = map_with_prefetching(file_paths, config)
+    else:
+        files_and_populations = map_with_workers(get_cell_activity_features_of_each_population_in_file, file_paths, config, workers)
+    for file_path, populations, error in files_and_populations:
+        if error is not None:
+            logging.error(f"Error processing file {file_path}")
+            logging.error(error)
+            continue
+        for population_name, (cell_population_activity_features, summary_population) in populations.items():
+            summary_population.name = population_name
+            yield population_name, cell_population_activity_features, summary_population
+
+
+def iter_process_dataframes(dataframes, config: AppConfig = default_config, workers: int = None):
+    """
+    Process DataFrames one after the other, or spread across workers, and yield the features and summary of
+    each as soon as it is processed, as `iter_process_files` does. DataFrames which cannot be processed are skipped
+
+    Args:
+        dataframes (iterable): The DataFrames, e.g. a generator reading them one at a time
+        workers (int): The number of processes the DataFrames are spread across. If None, the workers of the config are used
+
+    Yields:
+        tuple: The position of the DataFrame, as a string, its features and its summary, named after the position
+    """
+    if workers is None:
+        workers = config.workers
+    for idx, (_, features_and_summary, error) in enumerate(map_with_workers(_get_cell_activity_features_from_df, dataframes, config, workers)):
+        if error is not None:
+            logging.error(error)
+            continue
+        cell_population_activity_features, summary_population = features_and_summary
+        summary_population.name = str(idx)
+        yield summary_population.name, cell_population_activity_features, summary_population
+
+
+def _collect_populations(populations, save_to_file: bool = False, keep_results: bool = True, write_in_background: bool = False):
+    """
+    Build the summary of all populations from the populations yielded by `iter_process_files` or `iter_process_dataframes`,
+    one population at a time. Each population is written as soon as it is yielded if save_to_file is True, and is only
+    kept in the result if keep_results is True, so only the summaries of the populations are held until the end otherwise.
+    If write_in_background is True, a population is written in a background thread while the next one is processed
+    """
+    output_dir = create_output_directory() if save_to_file else None
+    result, summaries = {}, {}
+    writer = ThreadPoolExecutor(max_workers=1) if save_to_file and write_in_background else None
+    pending_write = None
+    try:
+        for population_name, cell_population_activity_features, summary_population in populations:
+            summaries[population_name] = summary_population
+            if writer is not None:
+                # a single population is written at a time, so the populations waiting to be written do not pile up
+                if pending_write is not None:
+                    pending_write.result()
+                pending_write = writer.submit(write_population_to_files, output_dir, population_name, cell_population_activity_features, summary_population)
+            elif save_to_file:
+                write_population_to_files(output_dir, population_name, cell_population_activity_features, summary_population)
+            if keep_results:
+                result[population_name] = (cell_population_activity_features, summary_population)
+        if pending_write is not None:
+            pending_write.result()
+    finally:
+        if writer is not None:
+            writer.shutdown(wait=True)
+    logging.info(f"Processed {len(summaries)} files")
+    all_populations_summary = pd.DataFrame(summaries)
     if save_to_file:
-        logging.info("Writing population data to files")
-        write_population_data_to_files(result, all_populations_summary)
+        write_all_populations_summary(output_dir, all_populations_summary)
     return result, all_populations_summary
 
 
-def process_dataframes_in_bulk(dataframes: list, save_to_file: bool = False, config: AppConfig = default_config):
+def process_files_in_bulk(file_paths: list, save_to_file: bool = False, config: AppConfig = default_config, workers: int = None, keep_results: bool = True):
+    """
+    Process a list of files in bulk. Each sheet of an Excel workbook is processed as its own population,
+    and each file inside a zip archive as its own file
+
+    Args:
+        file_paths (list): The list of file paths, possibly compressed (gzip, bz2, xz) or zip archives
+        workers (int): The number of processes the files are spread across. If None, the workers of the config are used
+        keep_results (bool): Whether to return the features of each population. If False, the result is empty and
+            memory does not grow with the number of files, e.g. when the results are saved to files
+
+    Returns:
+        dict: A dictionary with the file path (and sheet, see `get_cell_activity_features_of_each_population_in_file`)
+            as key and the features and summary of the population as value
+        pd.DataFrame: The summary of all populations, one column per population
+    """
+    return _collect_populations(iter_process_files(file_paths, config=config, workers=workers), save_to_file=save_to_file, keep_results=keep_results, write_in_background=config.prefetch_depth > 0)
+
+
+def process_dataframes_in_bulk(dataframes: list, save_to_file: bool = False, config: AppConfig = default_config, workers: int = None, keep_results: bool = True):
     """
     Process a list of dataframes in bulk
 
     Args:
         file_paths (list): The list of DataFrames
+        workers (int): The number of processes the DataFrames are spread across. If None, the workers of the config are used
+        keep_results (bool): Whether to return the features of each DataFrame, see `process_files_in_bulk`
 
     Returns:
         dict: A dictionary with the file path as key and the summary of the population as value
     """
+    return _collect_populations(iter_process_dataframes(dataframes, config=config, workers=workers), save_to_file=save_to_file, keep_results=keep_results, write_in_background=config.prefetch_depth > 0)
+
+def process_peak_candidate_indexes_in_bulk(peak_candidate_indexes: list, threshold: float = None, config: AppConfig = default_config):
+    """
+    Get the features of a list of peak candidate indexes in bulk, for a threshold
+
+    Args:
+        peak_candidate_indexes (list): The list of PeakCandidateIndex
+        threshold (float): The peak threshold. If None, the threshold of the config is used
+
+    Returns:
+        dict: A dictionary with the position in the list as key and the features and summary of the population as value
+    """
     result = {}
-    for idx, df in enumerate(dataframes):
+    for idx, peak_candidate_index in enumerate(peak_candidate_indexes):
         try:
-            cell_population_activity_features, summary_population = get_cell_activity_features_from_file_or_df(df=df, config=config)
+            cell_population_activity_features, summary_population = get_cell_activity_features_from_peak_candidate_index(peak_candidate_index, threshold, config=config)
             summary_population.name = str(idx)
             result[summary_population.name] = (cell_population_activity_features, summary_population)
         except Exception as e:
             logging.error(e)
-    logging.info(f"Processed {len(result)} files")
     all_populations_summary = pd.DataFrame({key: value[1] for key, value in result.items()})
-        
-    if save_to_file:
-        logging.info("Writing population data to files")
-        write_population_data_to_files(result, all_populations_summary)
-
     return result, all_populations_summary
 
-def write_population_data_to_files(result, all_populations_summary):
+def create_output_directory() -> str:
+    """
+    Create the directory the results of a run are written to, named after the current time
+    """
     # check if app config directory exists
     if not os.path.exists(default_config.output_directory):
         os.makedirs(default_config.output_directory)
@@ -119,16 +608,23 @@ def write_population_data_to_files(result, all_populations_summary):
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
     logging.info(f"Writing population data to {output_dir}")
-    for key, value in result.items():
-        suffix = "features"
-        features_file_path = create_new_file_from_input_filepath(key, suffix)
-        features_file_path = os.path.join(output_dir, features_file_path)
-        write_to_file(value[0], features_file_path)
-
-        suffix = "summary"
-        summary_file_path = create_new_file_from_input_filepath(key, suffix)
-        summary_file_path = os.path.join(output_dir, summary_file_path)
-        write_to_file(value[1], summary_file_path)
+    return output_dir
+
+def write_population_to_files(output_dir: str, key: str, cell_population_activity_features: pd.DataFrame, summary_population: pd.Series) -> None:
+    # the results of trace stores are written as csv
+    if key.endswith(TRACE_STORE_EXTENSION):
+        key = os.path.splitext(key)[0] + ".csv"
+    suffix = "features"
+    features_file_path = create_new_file_from_input_filepath(key, suffix)
+    features_file_path = os.path.join(output_dir, features_file_path)
+    write_to_file(cell_population_activity_features, features_file_path)
+
+    suffix = "summary"
+    summary_file_path = create_new_file_from_input_filepath(key, suffix)
+    summary_file_path = os.path.join(output_dir, summary_file_path)
+    write_to_file(summary_population, summary_file_path)
+
+def write_all_populations_summary(output_dir: str, all_populations_summary: pd.DataFrame) -> None:
     populations_output_dir = os.path.join(output_dir, "all_populations_summary.csv")
     write_to_file(all_populations_summary.T, populations_output_dir)
     logging.info("Finished writing population data")
@@ -137,6 +633,12 @@ def write_population_data_to_files(result, all_populations_summary):
     with open(os.path.join(output_dir, "config.json"), "w") as f:
         json.dump(config_dict, f)
 
+def write_population_data_to_files(result, all_populations_summary):
+    output_dir = create_output_directory()
+    for key, value in result.items():
+        write_population_to_files(output_dir, key, value[0], value[1])
+    write_all_populations_summary(output_dir, all_populations_summary)
+
     return
 
 def main(my_own_config: AppConfig = None):
@@ -147,7 +649,7 @@ def main(my_own_config: AppConfig = None):
     current_module_dir = os.path.dirname(os.path.abspath(__file__))
     samples_dir = os.path.join(current_module_dir, "..", "..", "samples")
     # find excel and csv files in the samples directory
-    file_paths = [os.path.join(samples_dir, file) for file in os.listdir(samples_dir) if file.endswith(".csv") or file.endswith(".xlsx")]
+    file_paths = [os.path.join(samples_dir, file) for file in os.listdir(samples_dir) if is_supported_file(file)]
     logging.info(f"Found {len(file_paths)} files in the samples directory")
 
     # process the files in bulk
@@ -0,0 +1,89 @@
+import os
+import queue
+import logging
+import threading
+
+# load logging level from environment variable
+log_level = os.getenv("LOG_LEVEL", "INFO")
+logging.basicConfig(format='%(asctime)s - %(levelname)s - %(module)s - %(lineno)d - %(message)s', level=log_level, handlers=[logging.StreamHandler(), logging.FileHandler(f"{__name__}.log")])
+
+_END = object()
+
+
+class Prefetcher:
+    """
+    Calls a function on each item in a background thread, ahead of the items being consumed, e.g. to read
+    the next files while the current one is processed. At most `depth` items are read, or being read, ahead
+    of the consumer, so memory is bounded by the depth and not by the number of items. Reading and parsing
+    files mostly waits on the disk or runs in pandas and NumPy kernels, which release the GIL, so it overlaps
+    with the processing in the main thread.
+    """
+    def __init__(self, function: callable, items, depth: int = 1):
+        """
+        Args:
+            function (callable): The function called with each item, in the background thread
+            items (iterable): The items, e.g. a list or a generator. Consumed in the background thread
+            depth (int): The maximum number of items read ahead of the consumer
+        """
+        if depth < 1:
+            error = ValueError("Prefetch depth must be at least 1")
+            logging.error(error)
+            raise error
+        self.function = function
+        self.items = items
+        self.depth = int(depth)
+        self._results = queue.Queue()
+        # one slot per item read ahead, released when the consumer takes the item
+        self._slots = threading.Semaphore(self.depth)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._prefetch, name="prefetcher", daemon=True)
+
+    def _prefetch(self) -> None:
+        try:
+            for item in self.items:
+                # waits for a slot, checking now and then whether the consumer stopped
+                while not self._slots.acquire(timeout=0.1):
+                    if self._stop.is_set():
+                        return
+                if self._stop.is_set():
+                    return
+                try:
+                    self._results.put((item, self.function(item), None))
+                except Exception as e:
+                    self._results.put((item, None, e))
+        except Exception as e:
+            # an error of the items themselves ends the prefetching, and is raised to the consumer
+            self._results.put((_END, None, e))
+            return
+        self._results.put((_END, None, None))
+
+    def __iter__(self):
+        """
+        Yields:
+            tuple: Each item, the result of the function and the exception raised (None if there was none), in the order of items
+        """
+        if not self._thread.is_alive() and not self._stop.is_set():
+            self._thread.start()
+        while True:
+            item, result, error = self._results.get()
+            if item is _END:
+                if error is not None:
+                    logging.error(error)
+                    raise error
+                return
+            self._slots.release()
+            yield item, result, error
+
+    def close(self) -> None:
+        """
+        Stop reading ahead and wait for the item being read. Can be called more than once
+        """
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
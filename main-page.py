@@ -7,7 +7,7 @@ import logging
 from datetime import datetime
 
 from app.config import AppConfig, LOGGING_CONFIG, GITHUB_REPOSITORY_URL
-from app.orchestrator.pipeline import process_dataframes_in_bulk
+from app.orchestrator.pipeline import get_peak_candidate_index_from_file_or_df, process_peak_candidate_indexes_in_bulk
 from app.file.tables import read_from_file
 
 logging.basicConfig(**LOGGING_CONFIG)
@@ -15,17 +15,48 @@ logging.basicConfig(**LOGGING_CONFIG)
 def get_files_in_directory(directory_path):
     return [os.path.join(directory_path, file) for file in os.listdir(directory_path) if file.endswith(".csv") or file.endswith(".xlsx")]
 
+@st.cache_data(show_spinner="Detecting local maxima...")
+def build_peak_candidate_indexes(filenames: tuple, contents: tuple, peak_window: int, peak_detector: str, time_unit: str,
+                                 ignore_peaks_before_criteria: str, ignore_peaks_before: int, custom_filters: tuple):
+    # the local maxima do not depend on the peak threshold, so changing it does not invalidate this cache
+    app_config = AppConfig(
+        custom_filters=list(custom_filters),
+        peak_window=peak_window,
+        peak_detector=peak_detector,
+        time_unit=time_unit,
+        ignore_peaks_criteria=ignore_peaks_before_criteria,
+        ignore_peaks_before=ignore_peaks_before
+    )
+    peak_candidate_indexes = {}
+    for filename, content in zip(filenames, contents):
+        try:
+            df = read_from_file(filename, raw_bytes=content)
+            peak_candidate_indexes[filename] = get_peak_candidate_index_from_file_or_df(df=df, config=app_config)
+        except Exception as e:
+            logging.error(f"Error processing file {filename}")
+            logging.error(e)
+    return peak_candidate_indexes
+
 def process_files(files, app_config: AppConfig):
     if files is None:
         error = ValueError("Please upload files to process")
         logging.error(error)
         raise error
     
-    dfs = [read_from_file(file.name, raw_bytes=file.getvalue()) for file in files]
+    peak_candidate_indexes = build_peak_candidate_indexes(
+        tuple(file.name for file in files),
+        tuple(file.getvalue() for file in files),
+        app_config.n_neighbors,
+        app_config.peak_detector,
+        app_config.time_unit,
+        app_config.ignore_peaks_before_criteria,
+        app_config.ignore_peaks_before,
+        tuple(app_config.filters)
+    )
 
-    results, all_populations_summary = process_dataframes_in_bulk(dfs, save_to_file=False, config=app_config)
+    results, all_populations_summary = process_peak_candidate_indexes_in_bulk(list(peak_candidate_indexes.values()), threshold=app_config.threshold, config=app_config)
     # replace results keys with filenames
-    filenames = [file.name for file in files]
+    filenames = list(peak_candidate_indexes.keys())
     results_with_filenames = dict(zip(filenames, results.values()))
     
     # rename columns of all_populations_summary
@@ -40,7 +71,7 @@ st.sidebar.title('Parameter Selection 🛠️')
 list_of_files = st.sidebar.file_uploader(
     "Upload Files",
     accept_multiple_files=True,
-    type=['csv', 'xlsx'],
+    type=['csv', 'xlsx', 'gz', 'bz2', 'xz'],
     help='Upload the files to be processed'
 )
 st.sidebar.markdown(f"Sample Data can be found [here]({GITHUB_REPOSITORY_URL}/blob/main/samples/sample.csv)")
@@ -56,6 +87,9 @@ remove_values_aboves = st.sidebar.number_input('Remove Values Above', value=None
 remove_values_belows = st.sidebar.number_input('Remove Values Below', value=None, help='Remove values below this threshold')
 show_population_summary = st.sidebar.checkbox('Show Population Summary', value=True, help='Show the summary of the population')
 if st.sidebar.button('Submit'):
+    st.session_state.submitted = True
+# once submitted, changing a parameter (e.g. the peak threshold) recomputes the results straight away
+if st.session_state.get('submitted', False):
     app_config = AppConfig(
         custom_filters=[(remove_values_aboves, 'above'), (remove_values_belows, 'below')],
         peak_threshold=peak_threshold,
@@ -3,7 +3,10 @@ import plotly.graph_objects as go
 
 
 from app.data.population import CellPopulationActivity
+from app.data.process import ActivityProcessor
 from app.orchestrator.pipeline import read_from_file
+from app.file.tables import get_time_column_position
+from app.file.row_index import load_or_build_csv_row_index
 from app.config import AppConfig, GITHUB_REPOSITORY_URL
 
 config = AppConfig(
@@ -24,19 +27,29 @@ mock_threshold = st.sidebar.number_input('Peak Threshold', value=0.4, help='The
 line_plot_placeholder = st.empty()
 error_placeholder = st.empty()
 column_range_placeholder = st.empty()
+features_placeholder = st.empty()
+
+@st.cache_data(show_spinner="Detecting local maxima...")
+def load_population_and_peak_candidates(filename: str, content: bytes):
+    # the local maxima do not depend on the peak threshold, so changing it only queries the index
+    df = read_from_file(filename, raw_bytes=content)
+    cell_population_activity = CellPopulationActivity(
+        ignore_peaks_before_criteria=config._ignore_peaks_before_criteria,
+        ignore_peaks_before=config.ignore_peaks_before,
+        time_unit=config.time_unit,
+        filters=config.filters,
+        time_axis=config.time_axis
+    )
+    cell_population_activity.from_df(df)
+    activity_processor = ActivityProcessor(threshold=None, n_neighbors=config.n_neighbors, detector=config.peak_detector)
+    return cell_population_activity, activity_processor.get_peak_candidate_index(cell_population_activity.data, time_unit=config.time_unit)
 
 def uploaded_file_callback_on_change():
     uploaded_file = st.session_state.uploaded_file
     if uploaded_file is not None:
         try:
-            df = read_from_file(uploaded_file.name, raw_bytes=uploaded_file.getvalue())
-            cell_population_activity = CellPopulationActivity(
-                ignore_peaks_before_criteria=config._ignore_peaks_before_criteria,
-                ignore_peaks_before=config.ignore_peaks_before,
-                time_unit=config.time_unit,
-                filters=config.filters
-            )
-            cell_population_activity.from_df(df)
+            cell_population_activity, peak_candidate_index = load_population_and_peak_candidates(uploaded_file.name, uploaded_file.getvalue())
+            idx_peak_samples, idx_peak_cells = peak_candidate_index.get_peaks(mock_threshold)
             # Create a dropdown to select a range of columns
             num_columns = len(cell_population_activity.data.columns)
             column_ranges = [f'{i+1}-{min(i+10, num_columns)}' for i in range(0, num_columns, 10)]
@@ -48,17 +61,41 @@ def uploaded_file_callback_on_change():
             fig = go.Figure()
             if mock_threshold:
                 fig.add_trace(go.Scatter(x=cell_population_activity.data.index, y=[mock_threshold] * len(cell_population_activity.data.index), mode='lines', name='Peak Threshold'))
-            for column in cell_population_activity.data.columns[start-1:end]:
+            for idx_column, column in enumerate(cell_population_activity.data.columns[start-1:end], start=start-1):
                 fig.add_trace(go.Scatter(x=cell_population_activity.data.index, y=cell_population_activity.data[column], mode='lines+markers', name=column))
+                idx_peaks = idx_peak_samples[idx_peak_cells == idx_column]
+                fig.add_trace(go.Scatter(x=cell_population_activity.data.index[idx_peaks], y=cell_population_activity.data[column].iloc[idx_peaks], mode='markers', marker_symbol='x', marker_size=10, name=f"{column} peaks"))
                 fig.update_layout(title=f"Raw Data", xaxis_title='Time', yaxis_title='Value')
                 line_plot_placeholder.plotly_chart(fig)
+            features = ActivityProcessor(threshold=mock_threshold, n_neighbors=config.n_neighbors).run_from_peak_candidate_index(peak_candidate_index)
+            features_placeholder.dataframe(features, use_container_width=True)
         except Exception as e:
             error_placeholder.error(e)
     
 st.session_state.uploaded_file = st.sidebar.file_uploader(
-    "Choose a file", type=["csv", "xlsx"],
+    "Choose a file", type=["csv", "xlsx", "gz", "bz2", "xz"],
     on_change=uploaded_file_callback_on_change, key="new_file")
 # add url to a demo sample file
 st.sidebar.markdown(f"Sample Data can be found [here]({GITHUB_REPOSITORY_URL}/blob/main/samples/sample.csv)")
 
 uploaded_file_callback_on_change()
+
+# large recordings are previewed from disk, seeking to a time window with the row index of the file
+st.sidebar.markdown("## Preview a large csv file")
+large_file_path = st.sidebar.text_input('Path of the csv file', help='A csv file on this machine. Its row index is built on the first preview and stored next to it')
+preview_start = st.sidebar.number_input('Preview from time', value=0.0)
+preview_end = st.sidebar.number_input('Preview until time', value=10.0)
+if large_file_path and st.sidebar.button('Preview'):
+    try:
+        with st.spinner("Indexing rows..."):
+            load_or_build_csv_row_index(large_file_path)
+        preview = read_from_file(large_file_path, drop_frames_column=True, time_range=(preview_start, preview_end))
+        time_column = preview.columns[get_time_column_position(list(preview.columns))]
+        fig = go.Figure()
+        for column in preview.columns.drop(time_column)[:10]:
+            fig.add_trace(go.Scatter(x=preview[time_column], y=preview[column], mode='lines', name=column))
+        fig.update_layout(title=f"Preview of {large_file_path}", xaxis_title='Time', yaxis_title='Value')
+        st.plotly_chart(fig)
+        st.dataframe(preview, use_container_width=True)
+    except Exception as e:
+        st.error(e)
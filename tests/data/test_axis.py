@@ -0,0 +1,63 @@
+import pytest
+import numpy as np
+
+from app.data.axis import TimeAxis
+
+def test_from_values_stores_uniform_sampling():
+    time_axis = TimeAxis.from_values(np.arange(10) * 0.1 + 2.0)
+
+    assert time_axis.is_uniform
+    assert time_axis.t0 == 2.0
+    assert time_axis.dt == pytest.approx(0.1)
+    assert len(time_axis) == 10
+    np.testing.assert_allclose(time_axis.values, np.arange(10) * 0.1 + 2.0)
+
+def test_from_values_keeps_non_uniform_sampling():
+    values = np.array([0.0, 0.1, 0.3, 0.4])
+
+    time_axis = TimeAxis.from_values(values)
+
+    assert not time_axis.is_uniform
+    np.testing.assert_array_equal(time_axis.values, values)
+
+def test_from_values_with_non_numeric_values():
+    with pytest.raises(ValueError):
+        TimeAxis.from_values(np.array(["0", "1"]))
+
+@pytest.mark.parametrize("time", [-1.0, 0.0, 0.75, 0.8, 2.375, 5.0])
+@pytest.mark.parametrize("side", ["left", "right"])
+def test_uniform_searchsorted_same_as_values(time, side):
+    # Arrange
+    values = np.arange(10) * 0.25
+    uniform_time_axis = TimeAxis.from_values(values)
+
+    # Act
+    position = uniform_time_axis.searchsorted(time, side=side)
+
+    # Assert
+    assert position == TimeAxis(values).searchsorted(time, side=side)
+
+@pytest.mark.parametrize("key", [slice(3, None), slice(2, 8, 2), slice(None, -4)])
+def test_uniform_slice_same_as_values(key):
+    values = np.arange(20) * 0.5 + 1.0
+
+    time_axis = TimeAxis.from_values(values)[key]
+
+    assert time_axis.is_uniform
+    np.testing.assert_allclose(time_axis.values, values[key])
+
+def test_get_seconds_in_unit_of_axis():
+    time_axis = TimeAxis.from_values(np.arange(5) * 250, unit="ms")
+
+    np.testing.assert_allclose(time_axis.get_seconds(), [0.0, 0.25, 0.5, 0.75, 1.0])
+    np.testing.assert_allclose(time_axis.get_seconds(np.array([1, 3])), [0.25, 0.75])
+
+def test_get_seconds_after_24_hours():
+    # Arrange
+    values = np.array([0.0, 36000.0, 100000.0, 200000.0])
+
+    # Act
+    seconds = TimeAxis.from_values(values).get_seconds()
+
+    # Assert
+    np.testing.assert_array_equal(seconds, values)
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+from app.data.candidates import PeakCandidateIndex
+
+def test_index_with_candidates():
+    # candidates of cell "a" at samples 1 (2.0), 3 (5.0) and 5 (5.0), of cell "c" at sample 2 (1.0)
+    index = PeakCandidateIndex(
+        pd.Index(["a", "b", "c"]),
+        idx_samples=np.array([1, 2, 3, 5]),
+        idx_cells=np.array([0, 2, 0, 0]),
+        peak_values=np.array([2.0, 1.0, 5.0, 5.0]),
+        seconds=np.arange(7) / 2,
+    )
+
+    assert len(index) == 4
+    assert index.count_peaks(0).tolist() == [3, 0, 1]
+    assert index.count_peaks(2).tolist() == [3, 0, 0]
+    assert index.count_peaks(2.5).tolist() == [2, 0, 0]
+    assert index.count_peaks(6).tolist() == [0, 0, 0]
+    # one threshold per cell
+    assert index.count_peaks(np.array([5, 0, 1])).tolist() == [2, 0, 1]
+
+    features = index.features(2.5)
+    assert features.nr_peaks.tolist() == [2, 0, 0]
+    assert features.time_to_first_peak[0] == 1.5
+    assert features.value_at_first_peak[0] == 5
+    assert features.time_to_max_peak[0] == 1.5
+    assert np.isnan(features.time_to_first_peak[1:]).all()
+
+    idx_samples, idx_cells = index.get_peaks(2.5)
+    assert sorted(idx_samples.tolist()) == [3, 5]
+    assert idx_cells.tolist() == [0, 0]
+
+    features = index.features(0)
+    assert features.time_to_first_peak.tolist()[::2] == [0.5, 1.0]
+    assert features.value_at_first_peak.tolist()[::2] == [2, 1]
+    assert features.value_at_max_peak.tolist()[::2] == [5, 1]
+
+def test_index_without_candidates():
+    index = PeakCandidateIndex(
+        ["a", "b"],
+        idx_samples=np.array([], dtype=int),
+        idx_cells=np.array([], dtype=int),
+        peak_values=np.array([]),
+        seconds=np.arange(3),
+        means=np.array([0.0, 1.0]),
+    )
+
+    assert index.count_peaks().tolist() == [0, 0]
+    assert index.features(0).is_active.tolist() == [False, False]
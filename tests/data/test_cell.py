@@ -1,6 +1,7 @@
+import numpy as np
 import pandas as pd
 
-from app.data.cell import CellActivity
+from app.data.cell import CellActivity, CellActivityBatch
 
 def test_from_peaks_with_no_peaks():
     peaks = pd.Series([], name="cell1")
@@ -57,4 +58,50 @@ def test_to_series_non_active_cell():
     assert pd.isna(df["time_to_first_peak"][0])
     assert pd.isna(df["value_at_first_peak"][0])
     assert pd.isna(df["time_to_max_peak"][0])
-    
\ No newline at end of file
+
+def test_batch_from_peak_indices():
+    # peaks of cell "a" at samples 1, 3 and 4 (max tied at 3 and 4), none for "b", one for "c" at sample 2
+    batch = CellActivityBatch.from_peak_indices(
+        pd.Index(["a", "b", "c"], name="cells"),
+        idx_samples=np.array([1, 2, 3, 4]),
+        idx_cells=np.array([0, 2, 0, 0]),
+        peak_values=np.array([1.0, 7.0, 3.0, 3.0]),
+        seconds=np.array([0.0, 0.5, 1.0, 1.5, 2.0]),
+    )
+
+    assert len(batch) == 3
+    assert batch.nr_peaks.tolist() == [3, 0, 1]
+    assert batch.is_active.tolist() == [True, False, True]
+    assert batch.time_to_first_peak[0] == 0.5
+    assert batch.value_at_first_peak[0] == 1
+    assert batch.time_to_max_peak[0] == 1.5
+    assert batch.value_at_max_peak[0] == 3
+    assert np.isnan(batch.time_to_first_peak[1])
+    assert batch.time_to_first_peak[2] == batch.time_to_max_peak[2] == 1.0
+
+def test_batch_row_is_cell_activity():
+    batch = CellActivityBatch.from_peak_indices(
+        ["a", "b"],
+        idx_samples=np.array([2]),
+        idx_cells=np.array([0]),
+        peak_values=np.array([4.0]),
+        seconds=np.array([0.0, 0.5, 1.0]),
+    )
+
+    assert batch[0] == CellActivity("a", 1.0, 4.0, 1.0, 4.0, True, 1)
+    assert batch[1] == CellActivity("b")
+    assert batch[0].to_df()["time_to_first_peak"].iloc[0] == 1.0
+
+def test_batch_to_df_matches_cell_activity_to_df():
+    batch = CellActivityBatch.from_peak_indices(
+        pd.Index(["a", "b"], name="cells"),
+        idx_samples=np.array([2]),
+        idx_cells=np.array([1]),
+        peak_values=np.array([4.0]),
+        seconds=np.array([0.0, 0.5, 1.0]),
+    )
+    df = batch.to_df()
+    expected = pd.concat([batch[0].to_df(), batch[1].to_df()])
+
+    assert df.index.name == "cells"
+    pd.testing.assert_frame_equal(df, expected, check_names=False)
@@ -0,0 +1,62 @@
+import pytest
+import numpy as np
+import pandas as pd
+
+from app.data.filters import ValueFilters
+
+def _filter_each_column(data: pd.DataFrame, filters: list) -> pd.DataFrame:
+    for threshold, filter_type in filters:
+        if filter_type == "above":
+            data = data.loc[:, (data <= threshold).all()]
+        elif filter_type == "below":
+            data = data.loc[:, (data >= threshold).all()]
+    return data
+
+@pytest.mark.parametrize("filters", [[], [(0.9, "above")], [(0.1, "below"), (0.9, "above")]])
+@pytest.mark.parametrize("block_size", [1, 7, 4096])
+def test_mask_same_as_filtering_each_column(filters, block_size):
+    # Arrange
+    rng = np.random.default_rng(3)
+    values = rng.random((50, 30))
+    values[rng.random(values.shape) < 0.002] = np.nan
+    data = pd.DataFrame(values)
+
+    # Act
+    is_kept = ValueFilters(filters, block_size=block_size).get_mask(values)
+
+    # Assert
+    assert data.columns[is_kept].tolist() == _filter_each_column(data, filters).columns.tolist()
+
+def test_mask_with_nan_ratio_and_range():
+    values = np.array([
+        [1.0, np.nan, 0.0, np.nan],
+        [2.0, 1.0, 0.1, np.nan],
+        [3.0, np.nan, 0.2, np.nan],
+        [4.0, 5.0, 0.1, np.nan],
+    ])
+
+    assert ValueFilters([(0.5, "nan_ratio")]).get_mask(values).tolist() == [True, True, True, False]
+    assert ValueFilters([(0.25, "nan_ratio")]).get_mask(values).tolist() == [True, False, True, False]
+    # columns without values have no range
+    assert ValueFilters([(1, "range")]).get_mask(values).tolist() == [True, True, False, True]
+    assert ValueFilters([(1, "range"), (0.5, "nan_ratio")]).get_mask(values).tolist() == [True, True, False, False]
+
+def test_mask_of_blocks_same_as_mask_of_values():
+    # Arrange
+    rng = np.random.default_rng(8)
+    values = rng.random((60, 12))
+    values[rng.random(values.shape) < 0.05] = np.nan
+    filters = [(0.95, "above"), (0.05, "nan_ratio"), (0.8, "range")]
+    value_filters = ValueFilters(filters)
+
+    # Act
+    for start in range(0, 60, 25):
+        value_filters.update(values[start:start + 25])
+
+    # Assert
+    np.testing.assert_array_equal(value_filters.is_kept, ValueFilters(filters).get_mask(values))
+
+def test_unknown_filter_is_skipped():
+    values = np.arange(6.0).reshape(3, 2)
+
+    assert ValueFilters([(1, "sideways"), (4, "above")]).get_mask(values).tolist() == [True, False]
@@ -2,6 +2,7 @@ import pytest
 from pandas.testing import assert_frame_equal
 from unittest.mock import patch
 
+import numpy as np
 import pandas as pd
 
 from app.data.population import CellPopulationActivity
@@ -44,6 +45,15 @@ def test_post_init_cell_population_activity():
             time_unit="min"
         )
 
+def test_init_cell_population_activity_with_data(test_data):
+    # Act
+    cell_population_activity = CellPopulationActivity(data=test_data, filters=["cells"])
+
+    # Assert
+    assert cell_population_activity.data is test_data
+    assert cell_population_activity.filters == ["cells"]
+    assert CellPopulationActivity().data is None
+
 def test_set_time_column_as_index(test_data):
     # Arrange 
     test_data_test_1 = test_data.copy()
@@ -269,4 +279,42 @@ def test_read_df_cell_population_activity(test_data):
     # confirm the columns are as expected
     assert len(cell_population_activity.data.columns) == 3
     assert "CELL 1" in cell_population_activity.data.columns
-    assert len(cell_population_activity.data) == 3
\ No newline at end of file
+    assert len(cell_population_activity.data) == 3
+
+
+@pytest.mark.parametrize("criteria,ignore_peaks_before", [("SAMPLES", 2), ("TIME", 1.5)])
+@pytest.mark.parametrize("filters", [None, [(0.55, "above")], [(0.15, "below")]])
+def test_read_df_lazily_same_as_read_df(test_data, criteria, ignore_peaks_before, filters):
+    # Arrange
+    original_data = test_data.copy()
+    cell_population_activity = CellPopulationActivity(criteria, ignore_peaks_before, filters=filters)
+    lazy_cell_population_activity = CellPopulationActivity(criteria, ignore_peaks_before, filters=filters, lazy=True)
+
+    # Act
+    cell_population_activity.from_df(test_data.copy())
+    lazy_cell_population_activity.from_df(test_data)
+
+    # Assert
+    assert lazy_cell_population_activity.view is not None
+    assert lazy_cell_population_activity.columns.equals(cell_population_activity.data.columns)
+    assert_frame_equal(lazy_cell_population_activity.data, cell_population_activity.data)
+    assert lazy_cell_population_activity.view is None
+    # the DataFrame given is not changed
+    assert_frame_equal(test_data, original_data)
+
+
+def test_read_df_lazily_keeps_a_view_of_the_values():
+    # Arrange
+    values = np.arange(12, dtype=float).reshape(6, 2)
+    data = pd.DataFrame(values, columns=["CELL 1", "CELL 2"], copy=False)
+    data.insert(0, "TIME", [0, 1, 2, 3, 4, 5])
+    cell_population_activity = CellPopulationActivity("TIME", 2, lazy=True)
+
+    # Act
+    cell_population_activity.from_df(data)
+
+    # Assert
+    view = cell_population_activity.view
+    assert view.row_offset == 2
+    assert np.shares_memory(view.get_values(), values)
+    assert view.get_index()[0] == pd.Timestamp("1970-01-01 00:00:02")
@@ -212,6 +212,21 @@ def test_summary_population():
     assert summary_T["percentage_true boolean2"] == pytest.approx(2/3*100)
 
 
+def test_summary_population_with_batch(test_time_series):
+    # Arrange
+    data = pd.DataFrame({"cell 1": test_time_series, "cell 2": -test_time_series})
+    processor = ActivityProcessor(threshold=2, n_neighbors=3)
+    batch = processor.get_population_activity_batch(data)
+
+    # Act
+    summary = ActivityProcessor.summary_of_population(batch)
+
+    # Assert
+    pd.testing.assert_series_equal(summary, ActivityProcessor.summary_of_population(batch.to_df()))
+    assert summary["nr_true is_active"] == 1
+    assert summary["mean nr_peaks"] == 1
+
+
 def test_summary_population_handle_nan() :
     cell_population_activity_features = pd.DataFrame({
         'numeric1': [0, np.nan, np.nan],
@@ -222,3 +237,224 @@ def test_summary_population_handle_nan() :
     # check if mean numeric is nan (pandas)
     assert pd.isna(summary_T["mean numeric1"])
     assert summary_T["mean numeric2"] == 5
+
+
+def _run_column_by_column(processor: ActivityProcessor, data: pd.DataFrame) -> pd.DataFrame:
+    summary_df = pd.DataFrame(CellActivity("").to_df(), index=data.columns)
+    for column in data.columns:
+        summary_df.update(processor.process_cell_activity(data[column]))
+    return summary_df.sort_index()
+
+@pytest.mark.parametrize("detector", ["argrelmax", "running_max"])
+@pytest.mark.parametrize(
+    "n_neighbors, threshold",
+    [
+        (1, 0.5),
+        (3, 0.5),
+        (5, 0.8),
+        (20, 0.2),
+        (3, None),
+    ]
+)
+def test_run_matches_column_by_column(n_neighbors, threshold, detector):
+    # Arrange
+    rng = np.random.default_rng(42)
+    values = rng.random((200, 30)).round(1) # rounding creates plateaus and equal peaks
+    values[rng.random(values.shape) < 0.02] = np.nan
+    data = pd.DataFrame(
+        values,
+        columns=[f"cell {i}" for i in rng.permutation(30)],
+        index=pd.date_range(start='1/1/2020', periods=values.shape[0], freq='100ms')
+    )
+    mock_cell_population_activity = create_autospec(CellPopulationActivity)
+    mock_cell_population_activity.data = data
+    processor = ActivityProcessor(threshold=threshold, n_neighbors=n_neighbors, detector=detector)
+
+    # Act
+    result = processor.run(mock_cell_population_activity)
+
+    # Assert
+    pd.testing.assert_frame_equal(result, _run_column_by_column(processor, data))
+
+
+def test_init_with_unknown_detector():
+    with pytest.raises(ValueError):
+        ActivityProcessor(threshold=0.5, n_neighbors=3, detector="unknown")
+
+@pytest.mark.parametrize("nr_samples", [1, 2, 3, 10, 257])
+@pytest.mark.parametrize("n_neighbors", [1, 2, 5, 20, 300])
+@pytest.mark.parametrize("dtype", [float, int])
+def test_running_max_detector_matches_argrelmax(nr_samples, n_neighbors, dtype):
+    # Arrange
+    rng = np.random.default_rng(nr_samples * n_neighbors)
+    values = (rng.random((nr_samples, 8)) * 5).round(0).astype(dtype)
+    if dtype is float:
+        values[rng.random(values.shape) < 0.05] = np.nan
+
+    # Act
+    result = ActivityProcessor.get_local_maxima_per_population(values, n_neighbors, -np.inf, detector="running_max")
+    expected = ActivityProcessor.get_local_maxima_per_population(values, n_neighbors, -np.inf, detector="argrelmax")
+
+    # Assert
+    np.testing.assert_array_equal(result, expected)
+
+
+def test_sweep_matches_run():
+    # Arrange
+    rng = np.random.default_rng(7)
+    values = rng.random((150, 20)).round(1)
+    data = pd.DataFrame(
+        values,
+        columns=[f"cell {i}" for i in range(20)],
+        index=pd.date_range(start='1/1/2020', periods=values.shape[0], freq='100ms')
+    )
+    mock_cell_population_activity = create_autospec(CellPopulationActivity)
+    mock_cell_population_activity.data = data
+    thresholds = [0.0, 0.45, 0.9, None]
+    windows = [1, 4]
+
+    # Act
+    result = ActivityProcessor(threshold=0.5, n_neighbors=3).sweep(mock_cell_population_activity, thresholds, windows)
+
+    # Assert
+    assert result.index.names == ["threshold", "window", "cell"]
+    assert len(result) == len(thresholds) * len(windows) * data.shape[1]
+    for window in windows:
+        for threshold in thresholds:
+            expected = ActivityProcessor(threshold=threshold, n_neighbors=window).run(mock_cell_population_activity)
+            is_combination = result.index.get_level_values("window") == window
+            if threshold is None:
+                is_combination &= result.index.get_level_values("threshold").isna()
+            else:
+                is_combination &= result.index.get_level_values("threshold") == threshold
+            pd.testing.assert_frame_equal(result[is_combination].droplevel(["threshold", "window"]), expected, check_names=False)
+
+@pytest.mark.parametrize("shard_backend", ["threads", "processes"])
+@pytest.mark.parametrize("nr_shards", [2, 3, 50])
+@pytest.mark.parametrize("threshold", [0.5, None])
+def test_run_with_shards_matches_run(nr_shards, threshold, shard_backend):
+    # Arrange
+    rng = np.random.default_rng(11)
+    values = rng.random((100, 17)).round(1)
+    data = pd.DataFrame(
+        values,
+        columns=pd.Index([f"cell {i}" for i in rng.permutation(17)], name="cells"),
+        index=pd.date_range(start='1/1/2020', periods=values.shape[0], freq='100ms')
+    )
+    mock_cell_population_activity = create_autospec(CellPopulationActivity)
+    mock_cell_population_activity.data = data
+
+    # Act
+    result = ActivityProcessor(threshold=threshold, n_neighbors=3, nr_shards=nr_shards, shard_backend=shard_backend).run(mock_cell_population_activity)
+
+    # Assert
+    pd.testing.assert_frame_equal(result, ActivityProcessor(threshold=threshold, n_neighbors=3).run(mock_cell_population_activity))
+
+@pytest.mark.parametrize("nr_shards", [1, 3])
+@pytest.mark.parametrize("threshold", [0.5, None])
+def test_run_on_lazy_population_matches_run(nr_shards, threshold):
+    # Arrange
+    rng = np.random.default_rng(5)
+    values = rng.random((80, 9)).round(1)
+    # the only cell removed by the filter
+    values[40, 4] = 1.5
+    data = pd.DataFrame(values, columns=[f"cell {i}" for i in range(9)])
+    data.insert(0, "Time (sec)", np.arange(80) * 0.1)
+    data.insert(0, "FRAMES", np.arange(80))
+    cell_population_activity = CellPopulationActivity(filters=[(1.2, "above")])
+    cell_population_activity.from_df(data.copy())
+    lazy_cell_population_activity = CellPopulationActivity(filters=[(1.2, "above")], lazy=True)
+    lazy_cell_population_activity.from_df(data)
+    activity_processor = ActivityProcessor(threshold=threshold, n_neighbors=3, nr_shards=nr_shards)
+
+    # Act
+    result = activity_processor.run(lazy_cell_population_activity)
+
+    # Assert
+    pd.testing.assert_frame_equal(result, activity_processor.run(cell_population_activity))
+    assert "cell 4" not in result.index
+    # the data was not materialised to be processed
+    assert lazy_cell_population_activity.view is not None
+
+@pytest.mark.parametrize("lazy", [False, True])
+@pytest.mark.parametrize("criteria,ignore_peaks_before", [("SAMPLES", 3), ("TIME", 0.25)])
+def test_run_with_numeric_time_axis_matches_datetime(lazy, criteria, ignore_peaks_before):
+    # Arrange
+    rng = np.random.default_rng(7)
+    data = pd.DataFrame(rng.random((60, 5)), columns=[f"cell {i}" for i in range(5)])
+    data.insert(0, "Time (sec)", np.arange(60) * 0.05)
+    cell_population_activity = CellPopulationActivity(criteria, ignore_peaks_before)
+    cell_population_activity.from_df(data.copy())
+    numeric_cell_population_activity = CellPopulationActivity(criteria, ignore_peaks_before, lazy=lazy, time_axis="numeric")
+    numeric_cell_population_activity.from_df(data)
+    activity_processor = ActivityProcessor(threshold=0.5, n_neighbors=2)
+
+    # Act
+    result = activity_processor.run(numeric_cell_population_activity)
+
+    # Assert
+    pd.testing.assert_frame_equal(result, activity_processor.run(cell_population_activity), check_exact=False, atol=1e-9)
+
+def test_run_with_numeric_time_axis_after_24_hours():
+    # Arrange
+    data = pd.DataFrame({"Time (sec)": np.arange(10) * 36000.0, "cell 0": [0, 1, 0, 0, 0, 0, 0, 0, 5, 0.0]})
+    cell_population_activity = CellPopulationActivity("SAMPLES", 0, lazy=True, time_axis="numeric")
+    cell_population_activity.from_df(data)
+
+    # Act
+    result = ActivityProcessor(threshold=0.5, n_neighbors=1).run(cell_population_activity)
+
+    # Assert
+    assert result.loc["cell 0", "time_to_first_peak"] == 36000.0
+    assert result.loc["cell 0", "time_to_max_peak"] == 288000.0
+
+def test_run_with_compact_output_dtypes_matches_run():
+    # Arrange
+    rng = np.random.default_rng(11)
+    data = pd.DataFrame(rng.random((60, 6)), columns=[f"cell {i}" for i in range(6)])
+    data.insert(0, "Time (sec)", np.arange(60) * 0.05)
+    cell_population_activity = CellPopulationActivity("SAMPLES", 2)
+    cell_population_activity.from_df(data)
+
+    # Act
+    result = ActivityProcessor(threshold=0.5, n_neighbors=2, output_dtypes="compact").run(cell_population_activity)
+
+    # Assert
+    expected = ActivityProcessor(threshold=0.5, n_neighbors=2).run(cell_population_activity)
+    assert isinstance(result.index, pd.CategoricalIndex)
+    assert result.dtypes.to_dict() == {
+        "time_to_first_peak": np.float32,
+        "value_at_first_peak": np.float32,
+        "time_to_max_peak": np.float32,
+        "value_at_max_peak": np.float32,
+        "is_active": bool,
+        "nr_peaks": np.int16,
+    }
+    pd.testing.assert_frame_equal(result.astype(expected.dtypes.to_dict()).set_axis(result.index.astype(object)), expected, check_exact=False, rtol=1e-6)
+
+def test_init_with_unknown_output_dtypes():
+    with pytest.raises(ValueError):
+        ActivityProcessor(threshold=0.5, output_dtypes="float16")
+
+@pytest.mark.parametrize("exclude_zeros_in_numeric_columns", [False, True])
+def test_summary_population_of_compact_dtypes(exclude_zeros_in_numeric_columns):
+    # Arrange
+    features = pd.DataFrame({
+        "time_to_first_peak": [0.5, 0.0, 1.25, np.nan],
+        "value_at_first_peak": [1.0, 0.0, 2.0, np.nan],
+        "time_to_max_peak": [0.5, 0.0, 2.5, np.nan],
+        "value_at_max_peak": [1.0, 0.0, 3.0, np.nan],
+        "is_active": [True, False, True, False],
+        "nr_peaks": [1.0, 0.0, 2.0, 0.0],
+    }, index=["cell 0", "cell 1", "cell 2", "cell 3"])
+    compact_features = ActivityProcessor.to_compact_dtypes(features)
+    compact_dtypes = compact_features.dtypes.copy()
+
+    # Act
+    summary = ActivityProcessor.summary_of_population(compact_features, exclude_zeros_in_numeric_columns=exclude_zeros_in_numeric_columns)
+
+    # Assert
+    expected = ActivityProcessor.summary_of_population(features, exclude_zeros_in_numeric_columns=exclude_zeros_in_numeric_columns)
+    pd.testing.assert_series_equal(summary.astype(float), expected, check_exact=False, rtol=1e-6)
+    # the columns were not converted to larger dtypes
+    pd.testing.assert_series_equal(compact_features.dtypes, compact_dtypes)
@@ -0,0 +1,38 @@
+import pytest
+import numpy as np
+from multiprocessing.shared_memory import SharedMemory
+
+from app.data.shared import SharedTraceMatrix
+
+def test_shared_trace_matrix():
+    # Arrange
+    values = np.arange(12, dtype=float).reshape(4, 3)
+    seconds = np.array([0.0, 0.5, 1.0, 1.5])
+
+    # Act
+    with SharedTraceMatrix(values, seconds) as shared_trace_matrix:
+        handle = shared_trace_matrix.handle
+        values_memory, seconds_memory = handle.attach()
+        shared_values = handle.get_values(values_memory)
+        shared_seconds = handle.get_seconds(seconds_memory)
+
+        # Assert
+        np.testing.assert_array_equal(shared_values, values)
+        np.testing.assert_array_equal(shared_seconds, seconds)
+        # a range of columns is read without copying
+        assert np.shares_memory(shared_values[:, 1:3], shared_values)
+        del shared_values, shared_seconds
+        handle.detach(values_memory, seconds_memory)
+
+    # the shared memory is released
+    with pytest.raises(FileNotFoundError):
+        SharedMemory(name=handle.values_name)
+
+def test_shared_trace_matrix_is_released_on_error():
+    with pytest.raises(RuntimeError):
+        with SharedTraceMatrix(np.ones((2, 2)), np.zeros(2)) as shared_trace_matrix:
+            handle = shared_trace_matrix.handle
+            raise RuntimeError("worker failed")
+
+    with pytest.raises(FileNotFoundError):
+        SharedMemory(name=handle.seconds_name)
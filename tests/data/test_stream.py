@@ -0,0 +1,96 @@
+import pytest
+import numpy as np
+import pandas as pd
+
+from app.data.population import CellPopulationActivity
+from app.data.process import ActivityProcessor
+from app.data.stream import StreamingActivityProcessor
+
+@pytest.fixture()
+def test_recording():
+    rng = np.random.default_rng(3)
+    values = rng.random((300, 12)).round(1) * 10
+    # so that only some of the cells pass each filter
+    values[:, :6] += 1
+    values[:, 6:] *= 0.9
+    recording = pd.DataFrame(values, columns=[f"cell {i}" for i in range(12)])
+    recording.insert(0, "Time (sec)", np.arange(len(values)) * 0.5)
+    recording.insert(0, "FRAMES", np.arange(len(values)))
+    return recording
+
+def _get_population(criteria: str, ignore_peaks_before: int, filters: list = None):
+    return CellPopulationActivity(
+        ignore_peaks_before_criteria=criteria,
+        ignore_peaks_before=ignore_peaks_before,
+        time_unit="s",
+        filters=filters
+    )
+
+@pytest.mark.parametrize("block_size", [1, 2, 7, 64, 1000])
+@pytest.mark.parametrize("n_neighbors", [1, 3, 10])
+@pytest.mark.parametrize(
+    "criteria, ignore_peaks_before, filters",
+    [
+        ("samples", 1, None),
+        ("samples", 13, [(9.5, "above")]),
+        ("time", 20, [(0.5, "below")]),
+    ]
+)
+def test_streaming_matches_batch(test_recording, block_size, n_neighbors, criteria, ignore_peaks_before, filters):
+    # Arrange
+    population = _get_population(criteria, ignore_peaks_before, filters)
+    population.from_df(test_recording.copy())
+    expected = ActivityProcessor(threshold=5, n_neighbors=n_neighbors).run(population)
+    streaming_processor = StreamingActivityProcessor(
+        _get_population(criteria, ignore_peaks_before, filters), threshold=5, n_neighbors=n_neighbors
+    )
+
+    # Act
+    for start in range(0, len(test_recording), block_size):
+        streaming_processor.update(test_recording.iloc[start:start + block_size])
+        # only the frames needed to confirm the next peaks are kept
+        if streaming_processor._context_values is not None:
+            assert len(streaming_processor._context_values) <= 2 * n_neighbors
+    result = streaming_processor.finalize()
+
+    # Assert
+    pd.testing.assert_frame_equal(result, expected, check_names=False)
+
+def test_streaming_features_are_updated_while_recording(test_recording):
+    streaming_processor = StreamingActivityProcessor(_get_population("samples", 1), threshold=5, n_neighbors=3)
+
+    streaming_processor.update(test_recording.iloc[:100])
+    nr_peaks_so_far = streaming_processor.features["nr_peaks"]
+    streaming_processor.update(test_recording.iloc[100:])
+    nr_peaks = streaming_processor.finalize()["nr_peaks"]
+
+    assert (nr_peaks_so_far > 0).any()
+    assert (nr_peaks >= nr_peaks_so_far).all()
+    with pytest.raises(ValueError):
+        streaming_processor.update(test_recording.iloc[:10])
+
+def test_streaming_requires_threshold():
+    with pytest.raises(ValueError):
+        StreamingActivityProcessor(_get_population("samples", 1), threshold=None)
+
+@pytest.mark.parametrize(
+    "criteria, ignore_peaks_before, filters",
+    [
+        ("samples", 300, None),
+        ("time", 1000, None),
+        ("samples", 1, [(100, "below")]),
+    ]
+)
+def test_streaming_without_data_left_raises_as_batch(test_recording, criteria, ignore_peaks_before, filters):
+    # Arrange
+    population = _get_population(criteria, ignore_peaks_before, filters)
+    population.from_df(test_recording.copy())
+    streaming_processor = StreamingActivityProcessor(_get_population(criteria, ignore_peaks_before, filters), threshold=5)
+    for start in range(0, len(test_recording), 64):
+        streaming_processor.update(test_recording.iloc[start:start + 64])
+
+    # Act / Assert
+    with pytest.raises(ValueError, match="Data must not be empty"):
+        ActivityProcessor(threshold=5).run(population)
+    with pytest.raises(ValueError, match="Data must not be empty"):
+        streaming_processor.finalize()
@@ -0,0 +1,85 @@
+import os
+import pytest
+import numpy as np
+import pandas as pd
+
+from app.file.tables import read_from_file
+from app.file.cache import ParsedInputCache
+
+# get directory of this file
+dir_path = os.path.dirname(os.path.realpath(__file__))
+samples_path = os.path.join(dir_path, "..", ".." , "samples")
+
+def test_read_from_file_with_cache(tmp_path):
+    # Arrange
+    cache = ParsedInputCache(os.path.join(tmp_path, "cache"))
+
+    for file_name in ["sample.csv", "sample.xlsx"]:
+        file_path = os.path.join(samples_path, file_name)
+        expected = read_from_file(file_path)
+
+        # Act
+        stored = read_from_file(file_path, cache=cache)
+        key = cache.get_key(file_path)
+        loaded = cache.load(key)
+        selected = read_from_file(file_path, cache=cache, cells=["cell 2"], drop_frames_column=True)
+
+        # Assert
+        pd.testing.assert_frame_equal(stored, expected)
+        pd.testing.assert_frame_equal(loaded, expected)
+        pd.testing.assert_frame_equal(selected, expected[["Time (sec)", "cell 2"]])
+
+def test_cache_is_keyed_by_contents_and_reader_version(tmp_path):
+    # Arrange
+    with open(os.path.join(samples_path, "sample.csv"), "rb") as file:
+        raw_bytes = file.read()
+    cache = ParsedInputCache(os.path.join(tmp_path, "cache"))
+    cache_of_next_reader = ParsedInputCache(os.path.join(tmp_path, "cache"), reader_version=cache.reader_version + 1)
+
+    # Act
+    read_from_file("renamed.csv", raw_bytes=raw_bytes, cache=cache)
+
+    # Assert
+    assert cache.load(cache.get_key("other.name.csv", raw_bytes)) is not None
+    assert cache.load(cache.get_key("other.name.csv", raw_bytes + b"1,1,1,1,,1,1\r\n")) is None
+    assert cache_of_next_reader.load(cache_of_next_reader.get_key("renamed.csv", raw_bytes)) is None
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    # Arrange
+    df = read_from_file(os.path.join(samples_path, "sample.csv"))
+    cache = ParsedInputCache(os.path.join(tmp_path, "cache"))
+    cache.store("first", df)
+    entry_size = os.path.getsize(os.path.join(cache.directory, "first.npz"))
+    cache.size_limit = 2 * entry_size
+    cache.store("second", df)
+    os.utime(os.path.join(cache.directory, "first.npz"), (0, 0))
+    os.utime(os.path.join(cache.directory, "second.npz"), (1, 1))
+
+    # Act
+    cache.load("first")
+    cache.store("third", df)
+
+    # Assert
+    assert sorted(os.listdir(cache.directory)) == ["first.npz", "third.npz"]
+
+def test_cache_keeps_the_dtypes_and_the_stored_entry(tmp_path):
+    # Arrange
+    df = pd.DataFrame({"Time (s)": [0.5, 1.0], "id": np.array([2**53 + 1, 3], dtype=np.int64), "cell 1": np.array([1, 2], dtype=np.float32)}, index=[1, 2])
+    cache = ParsedInputCache(os.path.join(tmp_path, "cache"), size_limit=1)
+
+    # Act
+    cache.store("first", df)
+    loaded = cache.load("first")
+
+    # Assert
+    pd.testing.assert_frame_equal(loaded, df)
+
+def test_read_from_file_with_cache_and_empty_selection(tmp_path):
+    # Arrange
+    file_path = os.path.join(samples_path, "sample.csv")
+    cache = ParsedInputCache(os.path.join(tmp_path, "cache"))
+    read_from_file(file_path, cache=cache)
+
+    # Act / Assert
+    with pytest.raises(ValueError, match="DataFrame is empty"):
+        read_from_file(file_path, cache=cache, time_range=(1000, None))
@@ -0,0 +1,53 @@
+import os
+import bz2
+import gzip
+import lzma
+import zipfile
+import pytest
+import pandas as pd
+
+from app.file.tables import read_from_file, read_from_file_in_chunks, expand_zip_archives
+
+# get directory of this file
+dir_path = os.path.dirname(os.path.realpath(__file__))
+samples_path = os.path.join(dir_path, "..", ".." , "samples")
+
+@pytest.mark.parametrize("file_name", ["sample.csv", "sample.xlsx"])
+@pytest.mark.parametrize("extension, compress", [(".gz", gzip.compress), (".bz2", bz2.compress), (".xz", lzma.compress)])
+def test_read_compressed_file(tmp_path, file_name, extension, compress):
+    # Arrange
+    file_path = os.path.join(samples_path, file_name)
+    with open(file_path, "rb") as file:
+        content = file.read()
+    compressed_file_path = os.path.join(tmp_path, file_name + extension)
+    with open(compressed_file_path, "wb") as file:
+        file.write(compress(content))
+
+    # Act
+    result = read_from_file(compressed_file_path)
+    result_from_bytes = read_from_file(compressed_file_path, raw_bytes=compress(content))
+
+    # Assert
+    pd.testing.assert_frame_equal(result, read_from_file(file_path))
+    pd.testing.assert_frame_equal(result_from_bytes, read_from_file(file_path))
+
+def test_read_files_inside_zip_archive(tmp_path):
+    # Arrange
+    zip_path = os.path.join(tmp_path, "recordings.zip")
+    with zipfile.ZipFile(zip_path, "w") as archive:
+        archive.write(os.path.join(samples_path, "sample.csv"), "day1/sample.csv")
+        archive.write(os.path.join(samples_path, "sample.xlsx"), "sample.xlsx")
+        archive.writestr("notes.txt", "not a recording")
+    other_path = os.path.join(samples_path, "sample.csv")
+
+    # Act
+    file_paths = expand_zip_archives([zip_path, other_path])
+    chunks = list(read_from_file_in_chunks(file_paths[0], chunksize=8))
+
+    # Assert
+    assert file_paths == [f"{zip_path}/day1/sample.csv", f"{zip_path}/sample.xlsx", other_path]
+    pd.testing.assert_frame_equal(read_from_file(file_paths[0]), read_from_file(os.path.join(samples_path, "sample.csv")))
+    pd.testing.assert_frame_equal(read_from_file(file_paths[1]), read_from_file(os.path.join(samples_path, "sample.xlsx")))
+    assert [len(chunk) for chunk in chunks] == [9, 8, 4]
+    with pytest.raises(FileNotFoundError):
+        read_from_file(f"{zip_path}/missing.csv")
@@ -0,0 +1,65 @@
+import os
+import pytest
+import pandas as pd
+
+from app.file.tables import read_from_file
+from app.file.row_index import CsvRowIndex, load_or_build_csv_row_index, get_row_index_path
+
+# get directory of this file
+dir_path = os.path.dirname(os.path.realpath(__file__))
+samples_path = os.path.join(dir_path, "..", ".." , "samples")
+
+def test_read_time_range_with_row_index(tmp_path):
+    # Arrange
+    file_path = os.path.join(tmp_path, "sample.csv")
+    with open(os.path.join(samples_path, "sample.csv"), "rb") as file:
+        # blank and empty lines shift the offsets and labels of the rows after them
+        content = file.read().replace(b"\r\n7,3,", b"\r\n\r\n,,,,,,\r\n7,3,")
+    with open(file_path, "wb") as file:
+        file.write(content)
+
+    for time_range in [(1, 4), (None, 2.5), (2, None), (3, 3)]:
+        expected = read_from_file(file_path, time_range=time_range)
+        for every in [1, 3, 50]:
+            # Act
+            CsvRowIndex.build(file_path, every=every).save(file_path)
+            result = read_from_file(file_path, time_range=time_range)
+
+            # Assert
+            pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+        os.remove(get_row_index_path(file_path))
+
+def test_row_index_is_invalidated_when_file_changes(tmp_path):
+    # Arrange
+    file_path = os.path.join(tmp_path, "sample.csv")
+    with open(os.path.join(samples_path, "sample.csv"), "rb") as file:
+        content = file.read()
+    with open(file_path, "wb") as file:
+        file.write(content)
+
+    # Act
+    row_index = load_or_build_csv_row_index(file_path, every=5)
+    loaded = CsvRowIndex.load(file_path)
+    with open(file_path, "ab") as file:
+        file.write(b"22,10.5,1,1,,1,1\r\n")
+
+    # Assert
+    assert row_index.is_sorted
+    assert row_index.times.tolist() == [0.5, 3, 5.5, 8]
+    assert loaded.offsets.tolist() == row_index.offsets.tolist()
+    assert CsvRowIndex.load(file_path) is None
+
+def test_row_index_is_not_built_for_quoted_values(tmp_path):
+    # Arrange
+    file_path = os.path.join(tmp_path, "quoted.csv")
+    with open(file_path, "wb") as file:
+        file.write(b'Frames,Time (s),cell 1\n1,0.5,1\n2,"1,0",2\n3,1.5,3\n')
+
+    # Act
+    with pytest.raises(ValueError):
+        CsvRowIndex.build(file_path)
+    row_index = load_or_build_csv_row_index(file_path)
+
+    # Assert
+    assert row_index is None
+    assert not os.path.exists(get_row_index_path(file_path))
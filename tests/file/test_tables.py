@@ -1,6 +1,9 @@
 import os
+import pytest
+import numpy as np
+import pandas as pd
 
-from app.file.tables import read_from_file
+from app.file.tables import read_from_file, read_from_file_in_chunks, coerce_to_numeric, read_csv_with_header_sniffing, iter_excel_sheets, _read_from_file_as_text, HeaderNotFoundError, post_clean_df, to_precision
 
 # get directory of this file
 dir_path = os.path.dirname(os.path.realpath(__file__))
@@ -27,3 +30,193 @@ def test_read_df_from_excel():
     # Assert
     assert result.shape == (21, 4)
     assert result.columns.tolist() == ['FRAMES', 'Time (sec)', 'cell 1', 'cell 2']
+
+def test_read_df_from_csv_in_chunks():
+    # Arrange
+    file_path = os.path.join(samples_path, "sample.csv")
+
+    # Act
+    chunks = list(read_from_file_in_chunks(file_path, chunksize=8))
+    result, non_numeric_columns = coerce_to_numeric(pd.concat(chunks))
+
+    # Assert
+    assert [len(chunk) for chunk in chunks] == [9, 8, 4]
+    assert non_numeric_columns == ['typo']
+    expected = read_from_file(file_path)
+    assert result.drop(columns=non_numeric_columns).columns.tolist() == expected.columns.tolist()
+    np.testing.assert_array_equal(result.drop(columns=non_numeric_columns).to_numpy(dtype=float), expected.to_numpy(dtype=float))
+
+def test_read_df_from_csv_with_header_sniffing_same_as_reading_as_text():
+    # Arrange
+    file_path = os.path.join(samples_path, "sample.csv")
+
+    # Act
+    result = read_csv_with_header_sniffing(file_path)
+
+    # Assert
+    pd.testing.assert_frame_equal(result, _read_from_file_as_text(file_path))
+
+def test_read_df_from_csv_drops_frames_column():
+    # Arrange
+    file_path = os.path.join(samples_path, "sample.csv")
+
+    # Act
+    result = read_from_file(file_path, drop_frames_column=True)
+
+    # Assert
+    assert result.columns.tolist() == ['Time (sec)', 'cell 1', 'cell 2', 'cell 3', 'cell 4']
+    pd.testing.assert_frame_equal(result, read_from_file(file_path).drop(columns="FRAMES"))
+
+def test_read_df_from_csv_keeps_rows_with_values_only_in_skipped_columns():
+    # Arrange
+    raw_bytes = b"Experiment,,,\nFrames,Time (s),cell 0,cell 1\n1,0.5,1,2\n2,,,\n3,1.5,5,6\n"
+    expected = _read_from_file_as_text("preamble.csv", raw_bytes=raw_bytes)
+    expected = expected.drop(columns=[column for column in expected.columns if "frame" in column.lower()])
+
+    # Act
+    result = read_from_file("preamble.csv", raw_bytes=raw_bytes, drop_frames_column=True)
+    selected = read_from_file("preamble.csv", raw_bytes=raw_bytes, cells=["cell 1"])
+
+    # Assert
+    # the rows count toward the samples ignored at the start of the recording, so they are kept as NaN rows
+    assert result.index.tolist() == [0, 2, 3, 4]
+    pd.testing.assert_frame_equal(result, expected)
+    pd.testing.assert_frame_equal(selected, expected[["Time (s)", "cell 1"]])
+
+def test_read_df_from_csv_with_header_after_the_scanned_rows():
+    # Arrange
+    raw_bytes = b"1,2\n" * 5 + b"frame,time (sec)\n1,0.5\n2,1\n"
+
+    # Act
+    with pytest.raises(HeaderNotFoundError):
+        read_csv_with_header_sniffing("late.header.csv", raw_bytes=raw_bytes, max_header_rows=3)
+    result = read_from_file("late.header.csv", raw_bytes=raw_bytes)
+
+    # Assert
+    assert result.columns.tolist() == ['frame', 'time (sec)']
+    assert result.shape == (7, 2)
+
+def test_read_df_from_csv_with_rows_wider_than_the_header():
+    # Arrange
+    raw_bytes = b",,,,recorded\nFrames,Time (s),cell 0,cell 1\n1,0.5,1,2\n2,1.0,3,4\n3,1.5,5,6\n4,2.0,9,7,9\n"
+
+    # Act
+    result = read_from_file("wide.csv", raw_bytes=raw_bytes)
+
+    # Assert
+    pd.testing.assert_frame_equal(result, _read_from_file_as_text("wide.csv", raw_bytes=raw_bytes))
+    assert result.columns.tolist() == ['Frames', 'Time (s)', 'cell 0', 'cell 1']
+    assert result['cell 1'].dropna().tolist() == [2, 4, 6, 7]
+
+def test_read_df_from_csv_with_rows_without_values_keeps_integer_columns():
+    # Arrange
+    raw_bytes = b"Frames,Time (s),cell 0,cell 1\n1,0.5,1,2\n\n,,,\n2,1.0,3,4\n  \n3,1.5,5,6\n"
+
+    # Act
+    result = read_csv_with_header_sniffing("commas.csv", raw_bytes=raw_bytes)
+    in_time_range = read_csv_with_header_sniffing("commas.csv", raw_bytes=raw_bytes, time_range=(0.6, None))
+
+    # Assert
+    pd.testing.assert_frame_equal(result, _read_from_file_as_text("commas.csv", raw_bytes=raw_bytes))
+    assert result.dtypes.tolist() == [np.int64, np.float64, np.int64, np.int64]
+    pd.testing.assert_frame_equal(in_time_range, result.loc[[3, 4]])
+
+def test_read_df_from_csv_with_cells_and_time_range():
+    # Arrange
+    file_path = os.path.join(samples_path, "sample.csv")
+    expected = read_from_file(file_path)
+
+    # Act
+    by_regex = read_from_file(file_path, cells=r"cell [34]$", time_range=(1, 4))
+    by_list = read_from_file(file_path, cells=["cell 1"], time_range=(None, 0.5))
+
+    # Assert
+    assert by_regex.columns.tolist() == ['FRAMES', 'Time (sec)', 'cell 3', 'cell 4']
+    assert by_regex['Time (sec)'].tolist() == [1, 1.5, 2, 2.5, 3, 3.5, 4]
+    pd.testing.assert_frame_equal(by_regex, expected.loc[by_regex.index, by_regex.columns], check_dtype=False)
+    # the row before the header is kept when within the time range
+    assert by_list.index.tolist() == [0, 2]
+    pd.testing.assert_frame_equal(by_list, expected.loc[[0, 2], ['FRAMES', 'Time (sec)', 'cell 1']])
+
+def test_read_df_from_csv_with_time_range_of_unsorted_time():
+    # Arrange
+    raw_bytes = b"Frames,Time (s),cell 1\n1,0.5,1\n2,3.0,2\n3,1.5,3\n4,1.0,4\n5,4.0,5\n6,2.0,6\n"
+    expected = read_from_file("unsorted.csv", raw_bytes=raw_bytes)
+
+    # Act
+    result = read_from_file("unsorted.csv", raw_bytes=raw_bytes, time_range=(1.0, 2.0))
+
+    # Assert
+    assert result["Time (s)"].tolist() == [1.5, 1.0, 2.0]
+    pd.testing.assert_frame_equal(result, expected.loc[[3, 4, 6]])
+
+def test_read_df_from_excel_streaming_same_as_reading_as_text():
+    # Arrange
+    file_path = os.path.join(samples_path, "sample.xlsx")
+
+    # Act
+    result = read_from_file(file_path)
+    sheets = list(iter_excel_sheets(file_path))
+
+    # Assert
+    pd.testing.assert_frame_equal(result, _read_from_file_as_text(file_path))
+    assert [sheet_name for sheet_name, _ in sheets] == ['Sheet1']
+    pd.testing.assert_frame_equal(sheets[0][1], result)
+
+def test_post_clean_df_same_as_converting_each_column():
+    # Arrange
+    df = pd.DataFrame({
+        "Time (sec)": ["0.5", "1", "1.5"],
+        "frames": [1, 2, 3],
+        "cell 1": [1.5, None, "2"],
+        "cell 2": ["", 1, 2],
+        "typo": ["s", None, None],
+        "text nan": ["nan", "1", "2"],
+        "flag": [True, False, True],
+    }, dtype=object)
+
+    def to_numeric_each_column(df):
+        for col in df.columns:
+            try:
+                df[col] = pd.to_numeric(df[col])
+            except ValueError:
+                df = df.drop(columns=col)
+        return df
+
+    # Act
+    result = post_clean_df(df.copy(), block_size=3)
+
+    # Assert
+    pd.testing.assert_frame_equal(result, to_numeric_each_column(df.copy()))
+    assert result.columns.tolist() == ["Time (sec)", "frames", "cell 1", "cell 2", "flag"]
+
+def test_post_clean_df_keeps_bool_columns():
+    # Arrange
+    df = pd.DataFrame({"frames": [1, 2, 3], "flag": [True, False, True]}, dtype=object)
+
+    # Act
+    result = post_clean_df(df.copy())
+
+    # Assert
+    assert result.dtypes.tolist() == [np.int64, bool]
+    pd.testing.assert_frame_equal(result, df.apply(pd.to_numeric))
+    assert result["frames"].dtype == np.int64
+
+
+def test_read_df_with_float32_precision():
+    # Arrange
+    file_path = os.path.join(samples_path, "sample.csv")
+    df = pd.DataFrame({"FRAMES": [0, 1], "Time (sec)": [0.0, 0.1], "cell 1": [1, 2], "cell 2": [0.5, 0.25]})
+
+    # Act
+    result = read_from_file(file_path, precision="float32")
+    converted = to_precision(df, "float32")
+
+    # Assert
+    expected = read_from_file(file_path)
+    pd.testing.assert_frame_equal(result, to_precision(expected, "float32"))
+    assert converted.dtypes.tolist() == [np.int64, np.float64, np.int64, np.float32]
+    # the DataFrame converted is not changed
+    assert df["cell 2"].dtype == np.float64
+    with pytest.raises(ValueError):
+        to_precision(df, "float16")
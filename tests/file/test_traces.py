@@ -0,0 +1,44 @@
+import os
+import pytest
+import numpy as np
+import pandas as pd
+
+from app.file.tables import read_from_file
+from app.file.traces import TraceStore, convert_to_trace_store
+
+# get directory of this file
+dir_path = os.path.dirname(os.path.realpath(__file__))
+samples_path = os.path.join(dir_path, "..", ".." , "samples")
+
+@pytest.mark.parametrize("dtype", ["float32", "float64"])
+def test_convert_to_trace_store(tmp_path, dtype):
+    # Arrange
+    file_path = os.path.join(samples_path, "sample.csv")
+    expected = read_from_file(file_path, drop_frames_column=True)
+
+    # Act
+    trace_store_path = convert_to_trace_store(file_path, os.path.join(tmp_path, "sample.traces"), dtype=dtype)
+    result = read_from_file(trace_store_path)
+
+    # Assert
+    assert result.columns.tolist() == expected.columns.tolist()
+    np.testing.assert_array_equal(result.to_numpy(), expected.to_numpy(dtype=dtype).astype(float))
+
+def test_trace_store_is_memory_mapped(tmp_path):
+    # Arrange
+    trace_store_path = convert_to_trace_store(os.path.join(samples_path, "sample.csv"), os.path.join(tmp_path, "sample.traces"))
+
+    # Act
+    trace_store = TraceStore(trace_store_path)
+    df = trace_store.to_df()
+    blocks = list(trace_store.iter_cell_blocks(3))
+    selected = read_from_file(trace_store_path, cells=["cell 4"], time_range=(1, 2))
+    reordered = trace_store.to_df(["cell 3", "cell 1"])
+
+    # Assert
+    assert isinstance(trace_store.values, np.memmap)
+    assert np.shares_memory(df["cell 2"].to_numpy(), trace_store.values)
+    assert [block.columns.tolist() for block in blocks] == [["Time (sec)", "cell 1", "cell 2", "cell 3"], ["Time (sec)", "cell 4"]]
+    pd.testing.assert_frame_equal(selected, df.loc[2:4, ["Time (sec)", "cell 4"]])
+    assert all(np.shares_memory(block.iloc[:, 1].to_numpy(), trace_store.values) for block in blocks)
+    pd.testing.assert_frame_equal(reordered, df[["Time (sec)", "cell 3", "cell 1"]])
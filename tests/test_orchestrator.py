@@ -1,8 +1,16 @@
 import os
+import time
+import zipfile
+import threading
+from unittest.mock import patch
+import numpy as np
 import pandas as pd
 from pandas.testing import assert_frame_equal, assert_series_equal
-from app.orchestrator.pipeline import main
+from app.orchestrator.pipeline import main, get_cell_activity_features_of_each_population_in_file, get_cell_activity_features_from_file, get_cell_activity_features_from_file_or_df, get_peak_candidate_index_from_file_or_df, get_cell_activity_features_from_peak_candidate_index, get_cell_activity_features_from_file_in_chunks, process_files_in_bulk, get_cell_activity_features_from_trace_store, iter_process_files, iter_process_dataframes, process_dataframes_in_bulk, map_with_workers
 from app.config import AppConfig
+from app.file.tables import read_from_file, read_excel_sheet
+from app.file.traces import convert_to_trace_store
+from app.orchestrator.prefetch import Prefetcher
 
 def test_main_end_to_end():
     # set environment variables
@@ -29,3 +37,297 @@ def test_main_end_to_end():
     second_column = all_populations_summary.columns[1]
     assert all_populations_summary[first_column].equals(all_populations_summary[second_column])
 
+def test_features_from_peak_candidate_index_match_file():
+    samples_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "samples", "sample.csv")
+    peak_candidate_index = get_peak_candidate_index_from_file_or_df(samples_path, config=AppConfig(custom_filters=[]))
+
+    for threshold in [0.4, 5, 50]:
+        config = AppConfig(custom_filters=[], peak_threshold=threshold)
+        features, summary = get_cell_activity_features_from_file_or_df(samples_path, config=config)
+        features_from_index, summary_from_index = get_cell_activity_features_from_peak_candidate_index(peak_candidate_index, threshold, config=config)
+
+        assert_frame_equal(features, features_from_index)
+        assert_series_equal(summary, summary_from_index)
+
+def test_features_from_file_in_chunks_match_file():
+    samples_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "samples", "sample.csv")
+    config = AppConfig(custom_filters=[(0, "below"), (50, "above")])
+    features, summary = get_cell_activity_features_from_file_or_df(samples_path, config=config)
+
+    for chunksize in [1, 3, 100]:
+        features_in_chunks, summary_in_chunks = get_cell_activity_features_from_file_in_chunks(samples_path, config=config, chunksize=chunksize)
+
+        assert_frame_equal(features, features_in_chunks)
+        assert_series_equal(summary, summary_in_chunks)
+
+def test_features_from_file_in_chunks_with_rows_wider_than_the_header_match_file(tmp_path):
+    file_path = os.path.join(tmp_path, "wide.csv")
+    rows = [f"{frame},{frame * 0.5},{frame % 4},{(frame * 3) % 5}" + (",9" if frame == 7 else "") for frame in range(1, 30)]
+    with open(file_path, "w") as file:
+        file.write(",,,,recorded\nFrames,Time (s),cell 0,cell 1\n" + "\n".join(rows) + "\n")
+    config = AppConfig(custom_filters=[], peak_threshold=1)
+    features, summary = get_cell_activity_features_from_file_or_df(file_path, config=config)
+
+    for chunksize in [1, 4, 100]:
+        features_in_chunks, summary_in_chunks = get_cell_activity_features_from_file_in_chunks(file_path, config=config, chunksize=chunksize)
+
+        assert_frame_equal(features, features_in_chunks)
+        assert_series_equal(summary, summary_in_chunks)
+
+def test_process_files_in_bulk_with_workers():
+    samples_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "samples")
+    file_paths = [
+        os.path.join(samples_dir, "sample.xlsx"),
+        os.path.join(samples_dir, "missing.csv"),
+        os.path.join(samples_dir, "sample.csv"),
+    ]
+    config = AppConfig(custom_filters=[(0, "below"), (10, "above")])
+
+    result, all_populations_summary = process_files_in_bulk(file_paths, config=config, workers=1)
+    result_with_workers, all_populations_summary_with_workers = process_files_in_bulk(file_paths, config=config, workers=2)
+
+    # the missing file is skipped and the order of the files is kept
+    assert list(result_with_workers.keys()) == [file_paths[0], file_paths[2]]
+    for file_path in result:
+        assert_frame_equal(result[file_path][0], result_with_workers[file_path][0])
+        assert_series_equal(result[file_path][1], result_with_workers[file_path][1])
+    assert_frame_equal(all_populations_summary, all_populations_summary_with_workers)
+
+def test_features_from_file_with_cells_and_time_range_match_df():
+    samples_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "samples", "sample.csv")
+    config = AppConfig(custom_filters=[])
+    df = read_from_file(samples_path)
+
+    for cells, time_range in [("cell [12]$", None), (["cell 1", "cell 4"], (1, 8)), (None, (None, 4.5))]:
+        features, summary = get_cell_activity_features_from_file_or_df(samples_path, config=config, cells=cells, time_range=time_range)
+        features_from_df, summary_from_df = get_cell_activity_features_from_file_or_df(df=df.copy(), config=config, cells=cells, time_range=time_range)
+
+        assert_frame_equal(features.drop(index="typo", errors="ignore"), features_from_df)
+
+def test_process_files_in_bulk_with_each_sheet_as_population(tmp_path):
+    samples_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "samples")
+    df = read_from_file(os.path.join(samples_dir, "sample.csv")).drop(columns="typo", errors="ignore")
+    file_path = os.path.join(tmp_path, "workbook.xlsx")
+    with pd.ExcelWriter(file_path) as writer:
+        df.to_excel(writer, sheet_name="first", index=False)
+        pd.DataFrame({"notes": ["no header here"]}).to_excel(writer, sheet_name="notes", index=False)
+        df[["FRAMES", "Time (sec)", "cell 2"]].to_excel(writer, sheet_name="second", index=False, startrow=2)
+    config = AppConfig(custom_filters=[])
+
+    result, all_populations_summary = process_files_in_bulk([file_path], config=config)
+
+    first, second = os.path.join(tmp_path, "workbook_first.xlsx"), os.path.join(tmp_path, "workbook_second.xlsx")
+    assert list(result.keys()) == [first, second]
+    features, _ = get_cell_activity_features_from_file_or_df(df=df, config=config)
+    assert_frame_equal(result[first][0], features, check_names=False)
+    assert_frame_equal(result[second][0], features.loc[["cell 2"]], check_names=False)
+    assert all_populations_summary.columns.tolist() == [first, second]
+
+def test_sheets_of_workbook_are_read_from_the_cache(tmp_path):
+    samples_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "samples")
+    df = read_from_file(os.path.join(samples_dir, "sample.csv")).drop(columns="typo", errors="ignore")
+    file_path = os.path.join(tmp_path, "workbook.xlsx")
+    with pd.ExcelWriter(file_path) as writer:
+        df.to_excel(writer, sheet_name="first", index=False)
+        df[["FRAMES", "Time (sec)", "cell 2"]].to_excel(writer, sheet_name="second", index=False, startrow=2)
+    config = AppConfig(custom_filters=[], cache_directory=os.path.join(tmp_path, "cache"))
+
+    with patch("app.file.tables.read_excel_sheet", wraps=read_excel_sheet) as read_sheet:
+        first_run = get_cell_activity_features_of_each_population_in_file(file_path, config=config)
+        nr_sheets_read = read_sheet.call_count
+        second_run = get_cell_activity_features_of_each_population_in_file(file_path, config=config)
+
+    assert nr_sheets_read == 2
+    # the second run is a cache hit for every sheet
+    assert read_sheet.call_count == 2
+    assert len(os.listdir(config.cache_directory)) == 2
+    assert list(second_run.keys()) == list(first_run.keys())
+    for key, (features, summary) in first_run.items():
+        assert_frame_equal(second_run[key][0], features)
+        assert_series_equal(second_run[key][1], summary)
+
+def test_csv_file_in_the_cache_is_not_read_in_chunks(tmp_path):
+    samples_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "samples", "sample.csv")
+    cache_directory = os.path.join(tmp_path, "cache")
+    features, summary = get_cell_activity_features_from_file(samples_path, config=AppConfig(custom_filters=[], cache_directory=cache_directory))
+    config = AppConfig(custom_filters=[], cache_directory=cache_directory, chunk_size=5)
+
+    with patch("app.orchestrator.pipeline.get_cell_activity_features_from_file_in_chunks") as read_in_chunks:
+        features_from_cache, summary_from_cache = get_cell_activity_features_from_file(samples_path, config=config)
+
+    read_in_chunks.assert_not_called()
+    assert_frame_equal(features_from_cache, features)
+    assert_series_equal(summary_from_cache, summary)
+
+def test_features_from_trace_store_in_blocks_match_file(tmp_path):
+    samples_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "samples", "sample.csv")
+    trace_store_path = convert_to_trace_store(samples_path, os.path.join(tmp_path, "sample.traces"))
+    config = AppConfig(custom_filters=[(0, "below"), (50, "above")])
+    features, summary = get_cell_activity_features_from_file_or_df(samples_path, config=config)
+
+    for nr_cells_per_block in [1, 3, None]:
+        features_in_blocks, summary_in_blocks = get_cell_activity_features_from_trace_store(trace_store_path, config=config, nr_cells_per_block=nr_cells_per_block)
+
+        assert_frame_equal(features, features_in_blocks, check_names=False)
+        assert_series_equal(summary, summary_in_blocks)
+
+def test_process_files_in_bulk_with_zip_archive(tmp_path):
+    samples_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "samples")
+    zip_path = os.path.join(tmp_path, "recordings.zip")
+    with zipfile.ZipFile(zip_path, "w") as archive:
+        archive.write(os.path.join(samples_dir, "sample.csv"), "first.csv")
+        archive.write(os.path.join(samples_dir, "sample.csv"), "second.csv")
+    config = AppConfig(custom_filters=[])
+
+    result, all_populations_summary = process_files_in_bulk([zip_path], config=config)
+
+    features, summary = get_cell_activity_features_from_file_or_df(os.path.join(samples_dir, "sample.csv"), config=config)
+    assert list(result.keys()) == [f"{zip_path}/first.csv", f"{zip_path}/second.csv"]
+    for file_path in result:
+        assert_frame_equal(result[file_path][0], features)
+
+def _write_calcium_recording(file_path: str, nr_samples: int = 2000, nr_cells: int = 40, seed: int = 0):
+    # fluorescence of each cell: a baseline with noise and transients which rise at once and decay exponentially
+    rng = np.random.default_rng(seed)
+    time = np.arange(nr_samples) * 0.05
+    baseline = rng.uniform(200, 800, nr_cells)
+    spikes = rng.random((nr_samples, nr_cells)) < 0.005
+    kernel = np.exp(-np.arange(60) / 15)
+    transients = np.apply_along_axis(lambda column: np.convolve(column, kernel)[:nr_samples], 0, spikes * rng.uniform(50, 400, (nr_samples, nr_cells)))
+    values = (baseline + transients + rng.normal(0, 5, (nr_samples, nr_cells))).round(3)
+    df = pd.DataFrame(values, columns=[f"cell {i}" for i in range(nr_cells)])
+    df.insert(0, "Time (sec)", time)
+    df.insert(0, "FRAMES", np.arange(nr_samples))
+    df.to_csv(file_path, index=False)
+
+def test_features_with_float32_precision_match_float64(tmp_path):
+    file_path = os.path.join(tmp_path, "recording.csv")
+    _write_calcium_recording(file_path)
+
+    for threshold, detector in [(500, "argrelmax"), (650.5, "running_max"), (300, "argrelmax")]:
+        config = AppConfig(custom_filters=[(900, "above")], peak_threshold=threshold, peak_detector=detector)
+        float32_config = AppConfig(custom_filters=[(900, "above")], peak_threshold=threshold, peak_detector=detector, precision="float32")
+        features, summary = get_cell_activity_features_from_file_or_df(file_path, config=config)
+        float32_features, float32_summary = get_cell_activity_features_from_file_or_df(file_path, config=float32_config)
+
+        # the same peaks are found, and their values only differ by the rounding to float32
+        assert features["nr_peaks"].sum() > 0
+        assert_frame_equal(float32_features[["time_to_first_peak", "time_to_max_peak", "is_active", "nr_peaks"]], features[["time_to_first_peak", "time_to_max_peak", "is_active", "nr_peaks"]])
+        assert_frame_equal(float32_features, features, check_exact=False, rtol=1e-6)
+        assert_series_equal(float32_summary, summary, check_exact=False, rtol=1e-6)
+
+def test_iter_process_files_matches_process_files_in_bulk():
+    samples_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "samples")
+    file_paths = [
+        os.path.join(samples_dir, "sample.xlsx"),
+        os.path.join(samples_dir, "missing.csv"),
+        os.path.join(samples_dir, "sample.csv"),
+    ]
+    config = AppConfig(custom_filters=[(0, "below"), (10, "above")])
+    result, all_populations_summary = process_files_in_bulk(file_paths, config=config, workers=1)
+
+    for workers in [1, 2]:
+        # the file paths can be given by a generator
+        populations = list(iter_process_files((file_path for file_path in file_paths), config=config, workers=workers))
+
+        assert [population_name for population_name, _, _ in populations] == list(result.keys())
+        for population_name, features, summary in populations:
+            assert_frame_equal(features, result[population_name][0])
+            assert_series_equal(summary, result[population_name][1])
+
+    result_not_kept, all_populations_summary_not_kept = process_files_in_bulk(file_paths, config=config, keep_results=False)
+    assert result_not_kept == {}
+    assert_frame_equal(all_populations_summary_not_kept, all_populations_summary)
+
+def test_iter_process_dataframes_reads_dataframes_as_they_are_needed():
+    samples_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "samples", "sample.csv")
+    config = AppConfig(custom_filters=[(0, "below"), (10, "above")])
+    nr_read = []
+
+    def read_dataframes():
+        for _ in range(3):
+            nr_read.append(1)
+            yield read_from_file(samples_path)
+
+    populations = iter_process_dataframes(read_dataframes(), config=config, workers=1)
+    first_name, first_features, first_summary = next(populations)
+
+    # the next DataFrames are not read before the first one is processed
+    assert len(nr_read) <= 2
+    result, all_populations_summary = process_dataframes_in_bulk([read_from_file(samples_path)] * 3, config=config)
+    assert first_name == "0"
+    assert_frame_equal(first_features, result["0"][0])
+    assert [name for name, _, _ in populations] == ["1", "2"]
+    assert all_populations_summary.columns.tolist() == ["0", "1", "2"]
+
+def test_prefetcher_reads_items_ahead_up_to_depth():
+    # Arrange
+    started = []
+    lock = threading.Lock()
+
+    def read(item):
+        with lock:
+            started.append(item)
+        if item == 3:
+            raise ValueError("unreadable")
+        return item * 10
+
+    # Act
+    with Prefetcher(read, range(8), depth=2) as prefetcher:
+        items = iter(prefetcher)
+        first = next(items)
+        time.sleep(0.2)
+        nr_started_while_consuming_first = len(started)
+        rest = list(items)
+
+    # Assert
+    assert first == (0, 0, None)
+    # the first item, and at most depth items ahead of it
+    assert nr_started_while_consuming_first <= 3
+    assert [(item, result) for item, result, _ in rest] == [(1, 10), (2, 20), (3, None), (4, 40), (5, 50), (6, 60), (7, 70)]
+    assert isinstance(rest[2][2], ValueError)
+
+def test_prefetcher_stops_when_closed():
+    prefetcher = Prefetcher(lambda item: item, range(1000), depth=1)
+
+    with prefetcher:
+        assert next(iter(prefetcher)) == (0, 0, None)
+
+    assert not prefetcher._thread.is_alive()
+
+def test_process_files_in_bulk_with_prefetching_matches_without(tmp_path):
+    samples_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "samples")
+    file_paths = [
+        os.path.join(samples_dir, "sample.xlsx"),
+        os.path.join(samples_dir, "missing.csv"),
+        os.path.join(samples_dir, "sample.csv"),
+    ]
+    result, all_populations_summary = process_files_in_bulk(file_paths, config=AppConfig(custom_filters=[(0, "below"), (10, "above")]), workers=1)
+
+    for chunk_size in [None, 5]:
+        config = AppConfig(custom_filters=[(0, "below"), (10, "above")], prefetch_depth=2, chunk_size=chunk_size)
+        with patch("app.orchestrator.pipeline.create_output_directory", return_value=str(tmp_path)), \
+             patch("app.orchestrator.pipeline.write_population_to_files") as mock_write_population_to_files:
+            result_with_prefetching, all_populations_summary_with_prefetching = process_files_in_bulk(file_paths, save_to_file=True, config=config, workers=1)
+
+        assert list(result_with_prefetching.keys()) == [file_paths[0], file_paths[2]]
+        for file_path in result:
+            assert_frame_equal(result[file_path][0], result_with_prefetching[file_path][0], check_names=False)
+            assert_series_equal(result[file_path][1], result_with_prefetching[file_path][1])
+        assert_frame_equal(all_populations_summary, all_populations_summary_with_prefetching)
+        # each population is written, in the background, in the order of the files
+        assert [call.args[1] for call in mock_write_population_to_files.call_args_list] == [file_paths[0], file_paths[2]]
+
+def _times_ten_or_crash(item, config=None):
+    if item == 2:
+        # ends the worker process without raising, as a segmentation fault or the OOM killer would
+        os._exit(1)
+    return item * 10
+
+def test_map_with_workers_only_fails_the_item_which_crashed_its_worker():
+    # Act
+    outcomes = list(map_with_workers(_times_ten_or_crash, (item for item in range(8)), AppConfig(), workers=2))
+
+    # Assert
+    assert [(item, result) for item, result, _ in outcomes] == [(0, 0), (1, 10), (2, None), (3, 30), (4, 40), (5, 50), (6, 60), (7, 70)]
+    assert [item for item, _, error in outcomes if error is not None] == [2]